@@ -6,24 +6,46 @@ Sử dụng Pandas để xử lý file CSV
 import pandas as pd
 import glob
 import os
+from dataset_store import DATASET_DIR, read_dataset
+from field_normalizer import AREA_COLUMNS, parse_area, parse_price
 
-def analyze_data():
-    """Phân tích dữ liệu bất động sản đã crawl"""
+def load_data(source='chotot', dataset_root=DATASET_DIR):
+    """
+    Đọc dữ liệu của một nguồn
+    
+    Ưu tiên dataset Parquet (chỉ đọc phân vùng của nguồn cần phân tích, có kiểu sẵn);
+    nếu chưa có dataset thì đọc file CSV mới nhất như trước.
+    
+    Returns:
+        (df, tên dữ liệu) hoặc (None, None)
+    """
+    if os.path.isdir(dataset_root):
+        df = read_dataset(dataset_root, filters={'source': source})
+        if len(df) > 0:
+            print(f"📂 Đang đọc dataset: {dataset_root} (nguồn: {source})")
+            return df, f"{dataset_root}_{source}"
     
     # Tìm file CSV mới nhất
-    csv_files = glob.glob('chotot_hanoi_*.csv')
+    csv_files = glob.glob(f'{source}_hanoi_*.csv')
     
     if not csv_files:
-        print("❌ Không tìm thấy file CSV nào. Hãy chạy chotot_scraper.py trước.")
-        return
+        print(f"❌ Không tìm thấy file CSV nào. Hãy chạy {source}_scraper.py trước.")
+        return None, None
     
     # Lấy file mới nhất
     latest_file = max(csv_files, key=os.path.getctime)
     print(f"📂 Đang đọc file: {latest_file}")
-    print("-" * 60)
     
     # Đọc CSV
-    df = pd.read_csv(latest_file)
+    return pd.read_csv(latest_file), latest_file.replace('.csv', '')
+
+def analyze_data(source='chotot'):
+    """Phân tích dữ liệu bất động sản đã crawl"""
+    
+    df, name = load_data(source)
+    if df is None:
+        return
+    print("-" * 60)
     
     # Thông tin cơ bản
     print("\n📊 THÔNG TIN TỔNG QUAN")
@@ -64,9 +86,9 @@ def analyze_data():
         print(bedroom_counts)
     
     # Lưu thống kê ra file
-    stats_file = latest_file.replace('.csv', '_statistics.txt')
+    stats_file = f"{name}_statistics.txt"
     with open(stats_file, 'w', encoding='utf-8') as f:
-        f.write(f"THỐNG KÊ DỮ LIỆU: {latest_file}\n")
+        f.write(f"THỐNG KÊ DỮ LIỆU: {name}\n")
         f.write("=" * 60 + "\n\n")
         f.write(f"Tổng số bài đăng: {len(df)}\n")
         f.write(f"Số cột: {len(df.columns)}\n\n")
@@ -81,57 +103,36 @@ def analyze_data():
 def clean_price_data(df):
     """
     Làm sạch dữ liệu giá - chuyển về số (đơn vị: triệu VNĐ)
-    VD: "5 tỷ" -> 5000, "500 triệu" -> 500
-    """
-    def convert_price(price_str):
-        if pd.isna(price_str):
-            return None
-        
-        price_str = str(price_str).lower()
-        
-        # Thỏa thuận
-        if 'thỏa thuận' in price_str or 'thoa thuan' in price_str:
-            return None
-        
-        # Tỷ
-        if 'tỷ' in price_str:
-            import re
-            numbers = re.findall(r'[\d.,]+', price_str)
-            if numbers:
-                value = float(numbers[0].replace(',', '.'))
-                return value * 1000  # Chuyển về triệu
-        
-        # Triệu
-        if 'triệu' in price_str:
-            import re
-            numbers = re.findall(r'[\d.,]+', price_str)
-            if numbers:
-                value = float(numbers[0].replace(',', '.'))
-                return value
-        
-        return None
+    VD: "5 tỷ" -> 5000, "2 tỷ 950 triệu" -> 2950, "500 triệu" -> 500
     
-    df['price_million'] = df['price'].apply(convert_price)
+    Giá theo m² được nhân với area_m2 nên cần gọi sau clean_area_data.
+    Dataset Parquet đã có sẵn price_million (tính khi ghi) - chỉ parse các dòng còn thiếu
+    (file ghi trước khi có cột này).
+    """
+    if 'price_million' not in df.columns:
+        df['price_million'] = float('nan')
+    missing = df['price_million'].isna()
+    if missing.any():
+        area = df.loc[missing, 'area_m2'] if 'area_m2' in df.columns else None
+        df.loc[missing, 'price_million'] = parse_price(df.loc[missing, 'price'], area)
     return df
 
 
 def clean_area_data(df):
     """
-    Làm sạch dữ liệu diện tích - chuyển về số (đơn vị: m²)
-    VD: "50 m²" -> 50.0
+    Làm sạch dữ liệu diện tích - chuyển về số (đơn vị: m²) kèm mặt tiền / chiều sâu (m)
+    VD: "50 m²" -> 50.0, "88,7 m2 (4,05x21,9)" -> 88.7, 4.05, 21.9
+    
+    File _cleaned.csv / dataset đã có sẵn các cột này (clean_data.py) - chỉ parse các dòng còn thiếu.
     """
-    def convert_area(area_str):
-        if pd.isna(area_str):
-            return None
-        
-        import re
-        area_str = str(area_str)
-        match = re.search(r'([\d.,]+)', area_str)
-        if match:
-            return float(match.group(1).replace(',', '.'))
-        return None
-    
-    df['area_m2'] = df['area'].apply(convert_area)
+    for name in AREA_COLUMNS:
+        if name not in df.columns:
+            df[name] = float('nan')
+    missing = df['area_m2'].isna()
+    if missing.any():
+        parsed = parse_area(df.loc[missing, 'area'])
+        for name in AREA_COLUMNS:
+            df.loc[missing, name] = parsed[name]
     return df
 
 
@@ -149,8 +150,8 @@ def main():
     if df is not None:
         # Làm sạch dữ liệu
         print("\n🧹 ĐANG LÀM SẠCH DỮ LIỆU...")
-        df = clean_price_data(df)
         df = clean_area_data(df)
+        df = clean_price_data(df)
         
         # Thống kê sau khi làm sạch
         if 'price_million' in df.columns:
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Crawl - Đo tốc độ crawl đầu-cuối offline với server giả lập mogi.vn / nhatot.com
+
+Không thể đo tốc độ crawler trên site thật (kết quả phụ thuộc mạng và có thể bị chặn), nên
+không biết khi nào một thay đổi làm crawl chậm đi. Script này:
+- Chạy một HTTP server cục bộ phục vụ HTML trong fixtures/, cùng dạng URL với site thật:
+  /ha-noi/mua-can-ho?page=N, /quan-.../...-id123 (mogi), /mua-ban-bat-dong-san-ha-noi?page=N, /.../123.htm (nhatot).
+  ID bài được đổi theo danh mục và số trang để mỗi trang có bài mới; trang > --site-pages không còn bài.
+- Trỏ MogiScraper, MogiMultiCategoryScraper (tuần tự và async) và ChoTotScraper vào server đó
+- Đo số trang/giây, latency lấy trang p50/p95 và RSS đỉnh (gồm cả process con: browser, process parse)
+
+Mỗi scraper chạy trong một process riêng để RSS đỉnh không lẫn giữa các lần đo.
+Latency là thời gian từ lúc gửi request tới khi có HTML (HTTP) hoặc tới domcontentloaded (Playwright).
+
+Cách dùng:
+    python3 benchmark_crawl.py                                  # Mọi scraper, lưu benchmark_crawl_<thời gian>.json
+    python3 benchmark_crawl.py --scrapers mogi_multi_async --pages 10 --latency-ms 50
+    python3 benchmark_crawl.py --compare benchmark_crawl_20260205_222533.json
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+import threading
+import multiprocessing
+from contextlib import redirect_stdout
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+import resource
+
+from benchmark_parsers import FIXTURES_DIR, load_pages
+
+
+SCRAPER_NAMES = ['mogi', 'mogi_multi_sync', 'mogi_multi_async', 'nhatot']
+REAL_HOSTS = ['https://mogi.vn', 'https://www.nhatot.com', 'https://nhatot.com']
+
+_MOGI_ID = re.compile(r'-id(\d+)')
+_NHATOT_ID = re.compile(r'/(\d+)\.htm')
+_PAGE = re.compile(r'[?&]page=(\d+)')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Trả HTML fixture theo dạng URL của mogi.vn / nhatot.com"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive như site thật
+    disable_nagle_algorithm = True  # Header và body gửi riêng - không để Nagle + delayed ACK thêm ~40ms
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency_s:
+            time.sleep(server.latency_s)
+        body = server.render(self.path, f"http://{self.headers.get('Host')}")
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with server.lock:
+            server.requests += 1
+            server.bytes_sent += len(data)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Server giả lập: mỗi danh mục có site_pages trang danh sách, mỗi trang dùng một fixture"""
+
+    daemon_threads = True
+
+    def __init__(self, pages, site_pages=5, latency_ms=0, port=0):
+        """
+        Args:
+            pages: [(tên file, loại trang, html)] từ benchmark_parsers.load_pages
+            site_pages: Số trang danh sách có bài của mỗi danh mục
+            latency_ms: Độ trễ giả lập mỗi request (mạng / server chậm)
+        """
+        super().__init__(('127.0.0.1', port), StandInHandler)
+        self.fixtures = {}
+        for _, kind, html in pages:
+            self.fixtures.setdefault(kind, []).append(html)
+        self.site_pages = site_pages
+        self.latency_s = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def _pick(self, kind, key):
+        fixtures = self.fixtures[kind]
+        return fixtures[key % len(fixtures)]
+
+    def render(self, path, base_url):
+        route = path.split('?')[0]
+        page_match = _PAGE.search(path)
+        page = int(page_match.group(1)) if page_match else 1
+        # Tiền tố ID theo danh mục + trang: bài của mỗi trang / danh mục đều khác nhau
+        prefix = (zlib.crc32(route.encode('utf-8')) % 900 + 100) * 1000 + page
+
+        if route.endswith('.htm'):
+            html = self._pick('nhatot_detail', int(_NHATOT_ID.search(route).group(1)))
+        elif _MOGI_ID.search(route):
+            html = self._pick('mogi_detail', int(_MOGI_ID.search(route).group(1)))
+        elif route.startswith('/mua-ban-bat-dong-san'):
+            html = self._listing('nhatot_listing', page, lambda m: f"/{prefix}{m.group(1)}.htm", _NHATOT_ID)
+        else:
+            html = self._listing('mogi_listing', page, lambda m: f"-id{prefix}{m.group(1)}", _MOGI_ID)
+
+        for host in REAL_HOSTS:
+            html = html.replace(host, base_url)
+        return html
+
+    def _listing(self, kind, page, new_id, id_pattern):
+        if page > self.site_pages:
+            return '<html><body><p>Không có tin đăng nào</p></body></html>'
+        return id_pattern.sub(new_id, self._pick(kind, page - 1))
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _MemorySampler:
+    """Lấy mẫu RSS của process + mọi process con (browser, process parse) để tìm đỉnh"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss(self):
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if psutil is None:
+            # Không có psutil: chỉ biết RSS đỉnh của chính process (KB trên Linux)
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def _timed(obj, name, latencies):
+    """Bọc method của một object để ghi lại thời gian mỗi lần gọi (chỉ dùng khi đo)"""
+    original = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    setattr(obj, name, wrapper)
+
+
+def _make_scraper(name, base_url, options, latencies):
+    """Tạo scraper trỏ vào server giả lập; rate limiter được nới để đo chính crawler"""
+    from rate_limiter import AdaptiveRateLimiter
+    from http_fetcher import HttpFetcher
+
+    rate_limiter = AdaptiveRateLimiter(initial_rate=options['rate'], max_rate=options['rate'],
+                                       burst=max(2, options['concurrency']))
+    if name == 'nhatot':
+        from chotot_scraper import ChoTotScraper
+        scraper = ChoTotScraper(rate_limiter=rate_limiter)
+        scraper.base_url = base_url
+        scraper.hanoi_url = base_url + '/mua-ban-bat-dong-san-ha-noi'
+        _timed(scraper, 'goto', latencies)
+        return scraper
+
+    http_fetcher = HttpFetcher(pool_size=options['concurrency'] + 2, rate_limiter=rate_limiter)
+    _timed(http_fetcher, '_get', latencies)
+    if name == 'mogi':
+        from mogi_scraper import MogiScraper
+        scraper = MogiScraper(http_fetcher=http_fetcher, rate_limiter=rate_limiter)
+        scraper.base_url = base_url
+        scraper.hanoi_url = base_url + '/ha-noi/mua-mat-bang-cua-hang-shop'
+        return scraper
+
+    from mogi_multi_scraper import MogiMultiCategoryScraper
+    scraper = MogiMultiCategoryScraper(concurrency=options['concurrency'], http_fetcher=http_fetcher,
+                                       rate_limiter=rate_limiter, parse_processes=options['parse_processes'])
+    scraper.base_url = base_url
+    scraper.categories = scraper.categories[:options['categories']]
+    return scraper
+
+
+def _run_scraper(name, base_url, options):
+    """Chạy một scraper (trong process riêng), trả về số bản ghi, thời gian, latency, RSS đỉnh"""
+    import asyncio
+
+    latencies = []
+    scraper = _make_scraper(name, base_url, options, latencies)
+    output = io.StringIO()
+    error = None
+    with _MemorySampler() as memory:
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(sys.stdout if options['verbose'] else output):
+                if name == 'mogi':
+                    scraper.scrape(max_pages=options['pages'], max_items_per_page=options['items'], auto_save=False)
+                elif name == 'nhatot':
+                    scraper.scrape(max_pages=options['pages'], max_items_per_page=options['items'])
+                elif name == 'mogi_multi_sync':
+                    scraper.scrape_all(max_pages=options['pages'], max_items_per_page=options['items'])
+                else:
+                    asyncio.run(scraper.scrape_all_async(max_pages=options['pages'],
+                                                         max_items_per_page=options['items']))
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+        elapsed = time.perf_counter() - start
+        if hasattr(scraper, 'close'):
+            with redirect_stdout(output):
+                scraper.close()
+    return {
+        'records': scraper.record_count,
+        'elapsed_s': elapsed,
+        'latencies_s': latencies,
+        'peak_rss_bytes': memory.peak,
+        'error': error,
+    }
+
+
+def _worker(name, base_url, options, queue):
+    try:
+        queue.put(_run_scraper(name, base_url, options))
+    except BaseException as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def benchmark(server, names, options):
+    """Chạy lần lượt từng scraper với server, mỗi scraper một process (spawn)"""
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for name in names:
+        print(f"⏱️  {name} ...", flush=True)
+        server.reset_counters()
+        queue = ctx.Queue()
+        process = ctx.Process(target=_worker, args=(name, server.base_url, options, queue))
+        process.start()
+        run = queue.get()
+        process.join()
+
+        pages = server.requests
+        latencies = run.get('latencies_s', [])
+        elapsed = run.get('elapsed_s')
+        results.append({
+            'scraper': name,
+            'pages': pages,
+            'records': run.get('records', 0),
+            'bytes': server.bytes_sent,
+            'elapsed_s': round(elapsed, 3) if elapsed else None,
+            'pages_per_sec': round(pages / elapsed, 2) if elapsed else None,
+            'latency_p50_ms': round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            'latency_p95_ms': round(_percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            'peak_rss_mb': round(run['peak_rss_bytes'] / (1024 * 1024), 1) if run.get('peak_rss_bytes') else None,
+            'error': run.get('error'),
+        })
+    return results
+
+
+def _fmt(value, width, precision):
+    return f"{value:>{width}.{precision}f}" if value is not None else f"{'-':>{width}}"
+
+
+def print_results(results, previous=None):
+    """In bảng kết quả; có previous (kết quả lần trước) thì in thêm % thay đổi trang/giây"""
+    previous = {row['scraper']: row for row in (previous or [])}
+    print(f"\n{'Scraper':<18} {'Trang':>6} {'Bài':>5} {'Trang/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8}")
+    print('-' * 67)
+    for row in results:
+        line = (f"{row['scraper']:<18} {row['pages']:>6} {row['records']:>5} {_fmt(row['pages_per_sec'], 8, 2)} "
+                f"{_fmt(row['latency_p50_ms'], 8, 2)} {_fmt(row['latency_p95_ms'], 8, 2)} "
+                f"{_fmt(row['peak_rss_mb'], 8, 1)}")
+        old = previous.get(row['scraper'])
+        if old and old.get('pages_per_sec') and row['pages_per_sec']:
+            change = (row['pages_per_sec'] / old['pages_per_sec'] - 1) * 100
+            line += f"  ({change:+.1f}% trang/s)"
+        print(line)
+        if row['error']:
+            print(f"   ❌ {row['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Đo tốc độ crawl đầu-cuối với server giả lập mogi.vn / nhatot.com')
+    parser.add_argument('--html-dir', default=FIXTURES_DIR, help='Thư mục HTML mẫu (mặc định fixtures/)')
+    parser.add_argument('--scrapers', nargs='+', choices=SCRAPER_NAMES, default=SCRAPER_NAMES)
+    parser.add_argument('--pages', type=int, default=3, help='Số trang danh sách mỗi danh mục')
+    parser.add_argument('--items', type=int, default=20, help='Số bài mỗi trang')
+    parser.add_argument('--categories', type=int, default=2, help='Số danh mục của MogiMultiCategoryScraper')
+    parser.add_argument('--concurrency', type=int, default=4, help='Số tab / kết nối chi tiết song song (async)')
+    parser.add_argument('--parse-processes', type=int, default=None, help='Số process parse (async, 0 = trong event loop)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Độ trễ giả lập mỗi request của server')
+    parser.add_argument('--rate', type=float, default=1000.0, help='Giới hạn request/giây của rate limiter')
+    parser.add_argument('--output', help='File JSON kết quả (mặc định benchmark_crawl_<thời gian>.json)')
+    parser.add_argument('--compare', help='File JSON của lần chạy trước để so sánh')
+    parser.add_argument('--verbose', action='store_true', help='Hiện log của scraper')
+    args = parser.parse_args()
+
+    pages = load_pages(args.html_dir)
+    missing = {'mogi_listing', 'mogi_detail', 'nhatot_listing', 'nhatot_detail'} - {kind for _, kind, _ in pages}
+    if missing:
+        print(f"❌ Thiếu HTML mẫu cho: {', '.join(sorted(missing))} ({args.html_dir})")
+        sys.exit(1)
+
+    server = StandInServer(pages, site_pages=args.pages, latency_ms=args.latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🧪 Server giả lập: {server.base_url} ({len(pages)} trang mẫu từ {args.html_dir})")
+
+    options = {
+        'pages': args.pages,
+        'items': args.items,
+        'categories': args.categories,
+        'concurrency': args.concurrency,
+        'parse_processes': args.parse_processes,
+        'rate': args.rate,
+        'verbose': args.verbose,
+    }
+    try:
+        results = benchmark(server, args.scrapers, options)
+    finally:
+        server.shutdown()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)['results']
+    print_results(results, previous)
+
+    output = args.output or f"benchmark_crawl_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': dict(options, latency_ms=args.latency_ms, html_dir=args.html_dir, cpu_count=os.cpu_count()),
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Đã lưu kết quả: {output}")
+
+
+if __name__ == "__main__":
+    main()
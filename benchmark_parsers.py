@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Parser - So sánh parse_engine (lxml) với BeautifulSoup (html.parser)
+
+Đo trên cả ba scraper (MogiScraper, MogiMultiCategoryScraper, ChoTotScraper):
+- Thời gian parse mỗi trang và bộ nhớ cấp phát (tracemalloc: đỉnh và phần còn giữ lại sau parse)
+- Với --fields: thời gian của từng trường trong parse_detail_page, để biết lần duyệt cây nào
+  (ví dụ các soup.find(attrs={'class': regex}) của ChoTotScraper) tốn nhất
+
+Cách dùng:
+    python3 benchmark_parsers.py                  # Đo thời gian parse mỗi trang trên fixtures/
+    python3 benchmark_parsers.py --fields --scrapers nhatot
+    python3 benchmark_parsers.py --html-dir pages/ --repeat 50 --output bench.json
+
+Loại trang được xác định theo tên file: mogi_listing*, mogi_detail*, nhatot_listing*, nhatot_detail*.
+Có thể lưu HTML thật (page.content() / response.text) vào một thư mục theo cách đặt tên này để đo.
+Kiểm tra hai engine cho cùng kết quả: python3 -m pytest tests/test_parse_engine.py
+"""
+
+import io
+import os
+import ast
+import sys
+import json
+import time
+import inspect
+import argparse
+import textwrap
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+
+import parse_engine
+
+from mogi_scraper import MogiScraper
+from mogi_multi_scraper import MogiMultiCategoryScraper
+from chotot_scraper import ChoTotScraper
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PAGE_KINDS = ['mogi_listing', 'mogi_detail', 'nhatot_listing', 'nhatot_detail']
+ENGINES = ['html.parser', 'lxml']
+
+# Các scraper dùng chung parser cho từng site
+SCRAPERS = {
+    'mogi': MogiScraper,
+    'mogi_multi': MogiMultiCategoryScraper,
+    'nhatot': ChoTotScraper,
+}
+SITE_SCRAPERS = {'mogi': ['mogi', 'mogi_multi'], 'nhatot': ['nhatot']}
+DETAIL_URLS = {
+    'mogi': 'https://mogi.vn/quan-cau-giay/mua-nha-rieng/ban-nha-id22726008',
+    'nhatot': 'https://www.nhatot.com/mua-ban-nha-dat-quan-cau-giay-ha-noi/121000000.htm',
+}
+
+
+# Hàm thực sự parse trang chi tiết theo engine (bản lxml nằm trong parse_engine)
+LXML_DETAIL_PARSERS = {
+    'mogi': parse_engine.parse_mogi_detail,
+    'nhatot': parse_engine.parse_chotot_detail,
+}
+
+
+def page_kind(filename):
+    """Loại trang theo tiền tố tên file, None nếu không nhận ra"""
+    name = os.path.basename(filename)
+    for kind in PAGE_KINDS:
+        if name.startswith(kind):
+            return kind
+    return None
+
+
+def load_pages(html_dir):
+    """Đọc các file HTML -> [(tên file, loại trang, html)]"""
+    pages = []
+    for name in sorted(os.listdir(html_dir)):
+        kind = page_kind(name)
+        if kind is None or not name.endswith(('.html', '.htm')):
+            continue
+        with open(os.path.join(html_dir, name), encoding='utf-8') as f:
+            pages.append((name, kind, f.read()))
+    return pages
+
+
+def make_scraper(name, engine):
+    return SCRAPERS[name](parser=engine)
+
+
+def run_parse(scraper, kind, html):
+    """Parse một trang bằng scraper (ẩn các dòng print của parse_listing_page)"""
+    site = kind.split('_')[0]
+    with redirect_stdout(io.StringIO()):
+        if kind.endswith('listing'):
+            if hasattr(scraper, 'seen_urls'):
+                scraper.seen_urls.clear()  # MogiMultiCategoryScraper bỏ qua URL đã thấy ở lần parse trước
+            return scraper.parse_listing_page(html)
+        return scraper.parse_detail_page(html, DETAIL_URLS[site])
+
+
+def measure_allocations(scraper, kind, html):
+    """
+    Bộ nhớ Python cấp phát khi parse một trang (tracemalloc)
+
+    Returns:
+        (đỉnh KB trong lúc parse, KB còn giữ lại sau khi parse xong)
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+            tracemalloc.reset_peak()
+        result = run_parse(scraper, kind, html)
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return round((peak - before) / 1024, 1), round((current - before) / 1024, 1)
+
+
+def benchmark(pages, repeat, scraper_names=None):
+    """Đo thời gian parse (ms) và bộ nhớ cấp phát mỗi trang của từng scraper / engine"""
+    results = []
+    for name, kind, html in pages:
+        site = kind.split('_')[0]
+        for scraper_name in SITE_SCRAPERS[site]:
+            if scraper_names and scraper_name not in scraper_names:
+                continue
+            row = {'page': name, 'kind': kind, 'scraper': scraper_name, 'bytes': len(html.encode('utf-8'))}
+            for engine in ENGINES:
+                scraper = make_scraper(scraper_name, engine)
+                run_parse(scraper, kind, html)  # Khởi động (import lazy, cache regex...)
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run_parse(scraper, kind, html)
+                    times.append((time.perf_counter() - start) * 1000)
+                # Đo bộ nhớ ở lần chạy riêng - tracemalloc làm chậm mọi lần cấp phát
+                peak_kb, retained_kb = measure_allocations(scraper, kind, html)
+                row[engine] = {
+                    'mean_ms': round(statistics.mean(times), 3),
+                    'median_ms': round(statistics.median(times), 3),
+                    'min_ms': round(min(times), 3),
+                    'alloc_peak_kb': peak_kb,
+                    'alloc_retained_kb': retained_kb,
+                }
+            row['speedup'] = round(row['html.parser']['median_ms'] / row['lxml']['median_ms'], 1)
+            results.append(row)
+    return results
+
+
+def print_benchmark(results):
+    print(f"\n{'Trang':<24} {'Scraper':<11} {'KB':>6} {'html.parser':>12} {'lxml':>9} {'Nhanh hơn':>10} "
+          f"{'Cấp phát bs4/lxml (KB)':>23}")
+    print('-' * 101)
+    for row in results:
+        print(f"{row['page']:<24} {row['scraper']:<11} {row['bytes'] / 1024:>6.1f} "
+              f"{row['html.parser']['median_ms']:>10.2f}ms {row['lxml']['median_ms']:>7.2f}ms {row['speedup']:>9.1f}x "
+              f"{row['html.parser']['alloc_peak_kb']:>13.0f} / {row['lxml']['alloc_peak_kb']:<7.0f}")
+
+    total_bs4 = sum(r['html.parser']['median_ms'] for r in results)
+    total_lxml = sum(r['lxml']['median_ms'] for r in results)
+    print('-' * 101)
+    print(f"{'Tổng':<43} {total_bs4:>10.2f}ms {total_lxml:>7.2f}ms {total_bs4 / total_lxml:>9.1f}x")
+
+
+def _statement_fields(stmt):
+    """Các trường property_data['...'] được gán trong một câu lệnh"""
+    fields = set()
+    for node in ast.walk(stmt):
+        if not (isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store)):
+            continue
+        if not (isinstance(node.value, ast.Name) and node.value.id == 'property_data'):
+            continue
+        key = node.slice
+        if isinstance(key, getattr(ast, 'Index', ())):  # Python 3.8
+            key = key.value
+        if isinstance(key, ast.Constant) and isinstance(key.value, str):
+            fields.add(key.value)
+    return fields
+
+
+def _users(name, statements):
+    """Số câu lệnh dùng biến name trước khi nó bị gán lại"""
+    count = 0
+    for stmt in statements:
+        names = [n for n in ast.walk(stmt) if isinstance(n, ast.Name) and n.id == name]
+        if any(isinstance(n.ctx, ast.Load) for n in names):
+            count += 1
+        if any(isinstance(n.ctx, ast.Store) for n in names):
+            break
+    return count
+
+
+def field_sections(func):
+    """
+    Gán mỗi dòng của hàm parse cho trường mà câu lệnh cấp cao nhất chứa nó ghi vào
+
+    - Câu lệnh ghi một hay nhiều trường: nhãn là tên các trường ('bedrooms+bathrooms+property_type')
+    - Biến dùng chung cho nhiều trường (soup, root, index...): nhãn '[tên biến]'
+    - Câu lệnh chuẩn bị khác (danh sách selector...): tính vào câu lệnh có nhãn ngay sau nó
+
+    Returns:
+        {số dòng: nhãn}
+    """
+    source = textwrap.dedent(inspect.getsource(func))
+    offset = func.__code__.co_firstlineno - 1
+    body = ast.parse(source).body[0].body
+
+    statements = [(stmt, _statement_fields(stmt)) for stmt in body]
+    labels = []
+    for i, (stmt, fields) in enumerate(statements):
+        label = '+'.join(sorted(fields)) if fields else None
+        if label is None and isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 \
+                and isinstance(stmt.targets[0], ast.Name):
+            name = stmt.targets[0].id
+            if _users(name, [other for other, _ in statements[i + 1:]]) > 1:
+                label = f"[{name}]"
+        labels.append(label)
+
+    sections = {}
+    pending = []
+    for (stmt, _), label in zip(statements, labels):
+        pending.append(stmt)
+        if label is None:
+            continue
+        for item in pending:
+            for line in range(item.lineno, item.end_lineno + 1):
+                sections[line + offset] = label
+        pending = []
+    for item in pending:
+        for line in range(item.lineno, item.end_lineno + 1):
+            sections[line + offset] = 'khác'
+    return sections
+
+
+class FieldTimer:
+    """
+    Đo thời gian theo trường bằng sys.settrace trên đúng một hàm parse
+
+    Thời gian của mỗi dòng (kể cả các hàm nó gọi) được cộng vào nhãn của dòng đó.
+    Hàm trace làm mọi lời gọi hàm Python chậm đi, nên chỉ nên đọc tỉ lệ giữa các trường;
+    thời gian tuyệt đối lấy từ benchmark().
+    """
+
+    def __init__(self, func):
+        self.code = func.__code__
+        self.sections = field_sections(func)
+        self.totals = {}
+        self._label = None
+        self._last = 0.0
+
+    def _global_trace(self, frame, event, arg):
+        if frame.f_code is not self.code:
+            return None
+        self._label = None
+        self._last = time.perf_counter()
+        return self._local_trace
+
+    def _local_trace(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._label is not None:
+            self.totals[self._label] = self.totals.get(self._label, 0.0) + now - self._last
+        if event == 'line':
+            self._label = self.sections.get(frame.f_lineno, self._label)
+        elif event == 'return':
+            self._label = None
+        self._last = time.perf_counter()  # Không tính thời gian của chính hàm trace
+        return self._local_trace
+
+    def run(self, call):
+        sys.settrace(self._global_trace)
+        try:
+            return call()
+        finally:
+            sys.settrace(None)
+
+
+def detail_parser(scraper_name, engine, site):
+    """Hàm parse trang chi tiết thực sự chạy với engine đã chọn"""
+    if engine == 'lxml':
+        return LXML_DETAIL_PARSERS[site]
+    return SCRAPERS[scraper_name].parse_detail_page
+
+
+def field_profile(pages, repeat, scraper_names=None):
+    """
+    Thời gian trung bình (ms / trang) của từng trường khi parse các trang chi tiết
+
+    Returns:
+        [{'scraper', 'engine', 'pages', 'fields': {nhãn: ms}}]
+    """
+    results = []
+    for site, names in SITE_SCRAPERS.items():
+        details = [(kind, html) for _, kind, html in pages if kind == f"{site}_detail"]
+        if not details:
+            continue
+        for scraper_name in names:
+            if scraper_names and scraper_name not in scraper_names:
+                continue
+            for engine in ENGINES:
+                scraper = make_scraper(scraper_name, engine)
+                timer = FieldTimer(detail_parser(scraper_name, engine, site))
+                for kind, html in details:
+                    run_parse(scraper, kind, html)  # Khởi động
+                    for _ in range(repeat):
+                        timer.run(lambda: run_parse(scraper, kind, html))
+                runs = repeat * len(details)
+                fields = {label: round(total * 1000 / runs, 3)
+                          for label, total in sorted(timer.totals.items(), key=lambda item: -item[1])}
+                results.append({'scraper': scraper_name, 'engine': engine, 'pages': len(details), 'fields': fields})
+    return results
+
+
+def print_field_profile(results):
+    for row in results:
+        total = sum(row['fields'].values()) or 1
+        print(f"\n⏱️  {row['scraper']} / {row['engine']} - {row['pages']} trang chi tiết (ms / trang, có overhead trace)")
+        for label, ms in row['fields'].items():
+            print(f"   {label:<36} {ms:>8.3f}ms {ms / total * 100:>6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='So sánh parse_engine (lxml) với BeautifulSoup')
+    parser.add_argument('--html-dir', default=FIXTURES_DIR, help='Thư mục chứa HTML mẫu (mặc định fixtures/)')
+    parser.add_argument('--repeat', type=int, default=20, help='Số lần parse mỗi trang khi đo')
+    parser.add_argument('--scrapers', nargs='+', choices=list(SCRAPERS), help='Chỉ đo các scraper này')
+    parser.add_argument('--fields', action='store_true', help='Đo thêm thời gian từng trường của trang chi tiết')
+    parser.add_argument('--output', help='Lưu kết quả đo ra file JSON')
+    args = parser.parse_args()
+
+    pages = load_pages(args.html_dir)
+    if not pages:
+        print(f"❌ Không có file HTML nào trong: {args.html_dir}")
+        sys.exit(1)
+    print(f"📂 {len(pages)} trang từ: {args.html_dir}")
+
+    results = benchmark(pages, args.repeat, args.scrapers)
+    print_benchmark(results)
+
+    fields = None
+    if args.fields:
+        fields = field_profile(pages, args.repeat, args.scrapers)
+        print_field_profile(fields)
+
+    if args.output:
+        report = {'repeat': args.repeat, 'pages': results}
+        if fields is not None:
+            report['fields'] = fields
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Đã lưu kết quả: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
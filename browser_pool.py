@@ -0,0 +1,292 @@
+"""
+Browser Pool - Dùng chung một Chromium cho nhiều danh mục và nhiều lần crawl
+
+- Chỉ launch browser một lần, các scraper dùng chung qua pool
+- Mỗi page có context riêng; page/context được tạo lại (recycle) sau một số
+  lần điều hướng nhất định hoặc khi RSS của browser vượt ngưỡng
+- Báo cáo bộ nhớ (RSS) của từng browser để theo dõi các lượt crawl dài
+- Tùy chọn gắn RequestRouter để chặn ảnh/font/CSS/tracker trên mọi page
+"""
+
+import os
+import asyncio
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+
+try:
+    import psutil
+except ImportError:  # psutil là tùy chọn - không có thì không đo được RSS
+    psutil = None
+
+
+DEFAULT_LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+]
+
+DEFAULT_CONTEXT_OPTIONS = {
+    'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'viewport': {'width': 1920, 'height': 1080},
+    'locale': 'vi-VN',
+}
+
+
+def _child_pids():
+    """PID các process con trực tiếp của process hiện tại"""
+    if psutil is None:
+        return set()
+    return {child.pid for child in psutil.Process(os.getpid()).children()}
+
+
+class _BrowserPoolBase:
+    """Phần dùng chung của BrowserPool và AsyncBrowserPool: cấu hình, thống kê, đo RSS"""
+
+    def __init__(self, headless=True, max_navigations=100, max_rss_mb=1500,
+                 rss_check_every=10, launch_args=None, context_options=None, request_router=None):
+        """
+        Args:
+            headless: Chạy ngầm (True khi chạy thật, False để xem quá trình)
+            max_navigations: Số lần điều hướng tối đa trên một page trước khi tạo lại
+            max_rss_mb: Ngưỡng RSS (MB) của browser, vượt ngưỡng thì tạo lại page
+            rss_check_every: Đo RSS sau mỗi N lần điều hướng (đo RSS khá tốn)
+            launch_args: Tham số dòng lệnh cho Chromium
+            context_options: Tham số cho browser.new_context()
+            request_router: RequestRouter gắn lên mỗi page mới (None = không chặn gì)
+        """
+        self.headless = headless
+        self.max_navigations = max_navigations
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_every = rss_check_every
+        self.launch_args = launch_args if launch_args is not None else list(DEFAULT_LAUNCH_ARGS)
+        self.context_options = dict(DEFAULT_CONTEXT_OPTIONS)
+        if context_options:
+            self.context_options.update(context_options)
+        self.request_router = request_router
+
+        self._playwright = None
+        self.browser = None
+        self._driver_pids = set()
+        self._navigations = {}  # page -> số lần điều hướng kể từ khi tạo
+        self.stats = {
+            'launches': 0,
+            'pages_opened': 0,
+            'recycled_by_navigations': 0,
+            'recycled_by_rss': 0,
+            'navigations': 0,
+            'peak_rss_mb': 0.0,
+        }
+
+    @property
+    def started(self):
+        return self.browser is not None
+
+    def memory_mb(self):
+        """
+        RSS (MB) của browser thuộc pool này.
+
+        Mỗi pool có một process Playwright driver riêng; browser là con của driver
+        đó nên chỉ cộng RSS các process con của driver, không lẫn với pool khác.
+        """
+        if psutil is None or not self._driver_pids:
+            return None
+
+        total = 0
+        for pid in self._driver_pids:
+            try:
+                driver = psutil.Process(pid)
+                for proc in driver.children(recursive=True):
+                    try:
+                        total += proc.memory_info().rss
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        continue
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        rss_mb = total / (1024 * 1024)
+        self.stats['peak_rss_mb'] = max(self.stats['peak_rss_mb'], rss_mb)
+        return rss_mb
+
+    def _recycle_reason(self, page):
+        """Trả về lý do cần tạo lại page (hoặc None nếu chưa cần)"""
+        count = self._navigations.get(page, 0)
+        if count >= self.max_navigations:
+            return 'navigations'
+        if self.max_rss_mb and count and count % self.rss_check_every == 0:
+            rss_mb = self.memory_mb()
+            if rss_mb is not None and rss_mb > self.max_rss_mb:
+                return 'rss'
+        return None
+
+    def _count_recycle(self, reason):
+        self.stats[f'recycled_by_{reason}'] += 1
+        print(f"♻️  Tạo lại page/context ({'quá số lần điều hướng' if reason == 'navigations' else 'RSS vượt ngưỡng'})")
+
+    def print_stats(self):
+        """In thống kê pool và bộ nhớ hiện tại"""
+        rss_mb = self.memory_mb()
+        rss_text = f"{rss_mb:.0f} MB" if rss_mb is not None else "không đo được (chưa cài psutil)"
+        print(f"🧠 Browser pool: RSS {rss_text}, đỉnh {self.stats['peak_rss_mb']:.0f} MB")
+        print(f"   - Số lần launch: {self.stats['launches']}")
+        print(f"   - Page đã mở: {self.stats['pages_opened']}, đang mở: {len(self._navigations)}")
+        print(f"   - Điều hướng: {self.stats['navigations']}")
+        print(f"   - Tạo lại: {self.stats['recycled_by_navigations']} (điều hướng), "
+              f"{self.stats['recycled_by_rss']} (RSS)")
+        if self.request_router is not None:
+            self.request_router.print_stats()
+
+
+class BrowserPool(_BrowserPoolBase):
+    """
+    Pool browser dùng Playwright sync API
+
+    Cách dùng:
+        pool = BrowserPool(headless=True)
+        page = pool.acquire()
+        page = pool.checkout(page)  # có thể trả về page mới nếu vừa được tạo lại
+        page.goto(url, wait_until='domcontentloaded')
+        html = page.content()
+        pool.release(page)
+        pool.close()
+    """
+
+    def start(self):
+        """Launch browser (chỉ một lần)"""
+        if self.started:
+            return self
+
+        before = _child_pids()
+        self._playwright = sync_playwright().start()
+        self._driver_pids = _child_pids() - before
+        self.browser = self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        self.stats['launches'] += 1
+        print(f"🌐 Đã khởi động browser ({'headless' if self.headless else 'có giao diện'})")
+        return self
+
+    def close(self):
+        """Đóng browser và Playwright driver"""
+        if not self.started:
+            return
+        self.print_stats()
+        self.browser.close()
+        self._playwright.stop()
+        self.browser = None
+        self._playwright = None
+        self._driver_pids = set()
+        self._navigations.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def acquire(self):
+        """Mở một page mới trên context riêng"""
+        self.start()
+        context = self.browser.new_context(**self.context_options)
+        page = context.new_page()
+        if self.request_router is not None:
+            self.request_router.attach(page)
+        self._navigations[page] = 0
+        self.stats['pages_opened'] += 1
+        return page
+
+    def release(self, page):
+        """Trả page về pool (đóng context của page)"""
+        self._navigations.pop(page, None)
+        try:
+            page.context.close()
+        except Exception:
+            pass
+
+    def recycle(self, page):
+        """Đóng page/context cũ và mở page mới thay thế"""
+        self.release(page)
+        return self.acquire()
+
+    def checkout(self, page):
+        """
+        Gọi trước mỗi lần page.goto(): đếm một lần điều hướng, tạo lại page nếu đã hết ngân sách.
+
+        Returns:
+            Page dùng cho lần điều hướng này - có thể khác page truyền vào nếu vừa được tạo lại
+        """
+        reason = self._recycle_reason(page)
+        if reason:
+            self._count_recycle(reason)
+            page = self.recycle(page)
+
+        self._navigations[page] = self._navigations.get(page, 0) + 1
+        self.stats['navigations'] += 1
+        return page
+
+
+class AsyncBrowserPool(_BrowserPoolBase):
+    """Pool browser dùng Playwright async API - giao diện giống BrowserPool nhưng là coroutine"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nhiều worker có thể gọi acquire() cùng lúc - chỉ được launch một browser
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if not self.started:
+                await self._launch()
+        return self
+
+    async def _launch(self):
+        before = _child_pids()
+        self._playwright = await async_playwright().start()
+        self._driver_pids = _child_pids() - before
+        self.browser = await self._playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        self.stats['launches'] += 1
+        print(f"🌐 Đã khởi động browser ({'headless' if self.headless else 'có giao diện'})")
+
+    async def close(self):
+        if not self.started:
+            return
+        self.print_stats()
+        await self.browser.close()
+        await self._playwright.stop()
+        self.browser = None
+        self._playwright = None
+        self._driver_pids = set()
+        self._navigations.clear()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def acquire(self):
+        await self.start()
+        context = await self.browser.new_context(**self.context_options)
+        page = await context.new_page()
+        if self.request_router is not None:
+            await self.request_router.attach_async(page)
+        self._navigations[page] = 0
+        self.stats['pages_opened'] += 1
+        return page
+
+    async def release(self, page):
+        self._navigations.pop(page, None)
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    async def recycle(self, page):
+        await self.release(page)
+        return await self.acquire()
+
+    async def checkout(self, page):
+        reason = self._recycle_reason(page)
+        if reason:
+            self._count_recycle(reason)
+            page = await self.recycle(page)
+
+        self._navigations[page] = self._navigations.get(page, 0) + 1
+        self.stats['navigations'] += 1
+        return page
@@ -0,0 +1,102 @@
+"""
+Crawl Checkpoint - Lưu vị trí crawl định kỳ để chạy tiếp sau khi bị dừng
+
+Checkpoint gồm hai file:
+- <tên>.json: vị trí crawl (danh mục đã xong, danh mục/trang đang crawl, URL chi tiết chưa xử lý, seen_urls)
+- <tên>_rows.csv: các bản ghi đã thu thập, cùng định dạng cột với save_to_csv
+  (không dùng khi scraper ghi nối qua RecordSink - khi đó state chỉ lưu offset trong file kết quả)
+
+Cả hai đều được ghi ra file tạm rồi os.replace, nên process chết giữa chừng không làm hỏng checkpoint cũ.
+"""
+
+import os
+import csv
+import json
+import time
+from datetime import datetime
+
+
+class CrawlCheckpoint:
+    """Ghi/đọc checkpoint cho một lượt crawl dài"""
+
+    def __init__(self, path='mogi_checkpoint.json', interval=60):
+        """
+        Args:
+            path: File JSON lưu vị trí crawl (file CSV bản ghi nằm cạnh, hậu tố _rows.csv)
+            interval: Khoảng cách tối thiểu (giây) giữa hai lần checkpoint giữa trang
+        """
+        self.path = path
+        self.rows_path = os.path.splitext(path)[0] + '_rows.csv'
+        self.interval = interval
+        self._last_save = time.monotonic()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def due(self):
+        """Đã tới lúc checkpoint giữa trang chưa"""
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, state, rows=None, fieldnames=None):
+        """
+        Ghi checkpoint (atomic).
+
+        Args:
+            state: dict vị trí crawl (phải serialize được sang JSON)
+            rows: Danh sách bản ghi đã thu thập (None = không ghi file bản ghi)
+            fieldnames: Các cột CSV (giống save_to_csv)
+        """
+        state = dict(state)
+        if rows is not None:
+            self._save_rows(rows, fieldnames)
+            state['row_count'] = len(rows)
+            state['rows_file'] = self.rows_path
+        elif os.path.exists(self.rows_path):
+            os.remove(self.rows_path)
+        state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+
+        tmp_state = self.path + '.tmp'
+        with open(tmp_state, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_state, self.path)
+
+        self._last_save = time.monotonic()
+
+    def _save_rows(self, rows, fieldnames):
+        tmp_rows = self.rows_path + '.tmp'
+        with open(tmp_rows, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_rows, self.rows_path)
+
+    def load(self):
+        """
+        Đọc checkpoint.
+
+        Returns:
+            (state, rows) hoặc (None, []) nếu chưa có checkpoint
+        """
+        if not self.exists():
+            return None, []
+
+        with open(self.path, encoding='utf-8') as f:
+            state = json.load(f)
+
+        rows = []
+        if state.get('rows_file') and os.path.exists(self.rows_path):
+            with open(self.rows_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    # CSV không phân biệt None và chuỗi rỗng - đưa về None như lúc parse
+                    rows.append({k: (v if v != '' else None) for k, v in row.items()})
+        return state, rows
+
+    def clear(self):
+        """Xóa checkpoint sau khi crawl xong"""
+        for path in (self.path, self.rows_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -8,25 +8,63 @@ Phương pháp: Playwright (xử lý JavaScript) + BeautifulSoup (parse HTML)
 
 import csv
 import time
-import random
 from datetime import datetime, timedelta
-from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import re
 import json
+import parse_engine
+from browser_pool import BrowserPool
+from request_policy import RequestRouter
+from page_readiness import PROFILES, ReadinessTracker, wait_until_ready
+from rate_limiter import AdaptiveRateLimiter
+from record_sink import RecordSink
+from snapshot_cache import SnapshotCache
+from crawl_metrics import CrawlMetrics
+from hanoi_gazetteer import district_of
 
 class ChoTotScraper:
-    def __init__(self):
+    def __init__(self, browser_pool=None, rate_limiter=None, sink=None, parser='lxml', snapshots=None, metrics=None):
         # Chotot.com redirect sang nhatot.com cho bất động sản
         self.base_url = "https://www.nhatot.com"
         self.hanoi_url = "https://www.nhatot.com/mua-ban-bat-dong-san-ha-noi"
         self.data = []
+        # Có sink thì mỗi bản ghi được ghi nối ra file ngay, không giữ trong self.data
+        self.sink = sink
+        self.record_count = 0
+        # 'lxml': parse_engine (XPath biên dịch sẵn); 'html.parser': BeautifulSoup như trước
+        self.parser = parser
+        # Pool dùng chung có thể truyền vào; nếu không, scrape() tự tạo và tự đóng
+        self.browser_pool = browser_pool
+        # Thời gian trang thực sự sẵn sàng (thay cho networkidle + time.sleep)
+        self.readiness = ReadinessTracker()
+        # Điều tiết tốc độ theo phản hồi của server để tránh bị block (thay cho delay ngẫu nhiên)
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        # SnapshotCache lưu HTML mọi trang đã lấy để parse lại offline (None = không lưu)
+        self.snapshots = snapshots
+        # Thời gian từng bước (điều hướng, đợi sẵn sàng, page.content(), parse, ghi), lỗi, trường rỗng
+        self.metrics = metrics or CrawlMetrics('nhatot')
         
-    def random_delay(self, min_seconds=2, max_seconds=5):
-        """Tạo delay ngẫu nhiên giữa các request để tránh bị block"""
-        delay = random.uniform(min_seconds, max_seconds)
-        print(f"⏳ Đợi {delay:.2f} giây...")
-        time.sleep(delay)
+    def goto(self, page, url):
+        """Điều hướng page qua rate limiter và báo lại latency/status cho limiter"""
+        self.rate_limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            with self.metrics.timed('navigation'):
+                response = page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        except Exception as e:
+            self.rate_limiter.record(url, error=e)
+            raise
+        self.rate_limiter.record(url, latency=time.perf_counter() - start,
+                                 status=response.status if response else None)
+    
+    def _emit(self, property_data):
+        """Ghi một bản ghi ra sink (hoặc giữ trong self.data nếu không có sink)"""
+        self.record_count += 1
+        self.metrics.record_fields(property_data)
+        if self.sink is not None:
+            self.sink.write(property_data)
+        else:
+            self.data.append(property_data)
     
     def extract_price(self, text):
         """Trích xuất giá từ text"""
@@ -58,17 +96,18 @@ class ChoTotScraper:
     
     def parse_listing_page(self, html_content):
         """Parse trang danh sách để lấy links các bài đăng"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
         # Nhatot.com sử dụng links kết thúc bằng .htm cho detail pages
         # Pattern: /mua-ban-nha-dat-{district}/{id}.htm
         links = []
         
         # Tìm tất cả links có .htm (đây là detail pages)
-        all_links = soup.find_all('a', href=True)
-        for link in all_links:
-            href = link['href']
-            
+        if self.parser == 'lxml':
+            hrefs = parse_engine.chotot_listing_hrefs(html_content)
+        else:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            hrefs = [link['href'] for link in soup.find_all('a', href=True)]
+        
+        for href in hrefs:
             # Chỉ lấy links kết thúc bằng .htm (detail pages)
             if href.endswith('.htm'):
                 # Nếu là relative URL, thêm base_url
@@ -88,6 +127,9 @@ class ChoTotScraper:
     
     def parse_detail_page(self, html_content, url):
         """Parse trang chi tiết để lấy thông tin bất động sản"""
+        if self.parser == 'lxml':
+            return parse_engine.parse_chotot_detail(html_content, url, self)
+        
         soup = BeautifulSoup(html_content, 'html.parser')
         
         property_data = {
@@ -155,9 +197,7 @@ class ChoTotScraper:
                 property_data['address'] = elem.get_text(strip=True)
                 # Trích xuất quận/huyện từ địa chỉ
                 address_text = property_data['address']
-                district_match = re.search(r'(Quận|Huyện)\s+([^,]+)', address_text)
-                if district_match:
-                    property_data['district'] = f"{district_match.group(1)} {district_match.group(2).strip()}"
+                property_data['district'] = district_of(address_text)
                 break
         
         # Tìm các thông tin khác trong bảng thông số
@@ -229,25 +269,12 @@ class ChoTotScraper:
         print(f"📄 Số trang tối đa: {max_pages}")
         print("-" * 60)
         
-        with sync_playwright() as p:
-            # Khởi tạo browser với options để tránh bị phát hiện
-            browser = p.chromium.launch(
-                headless=False,  # Đặt True để chạy ngầm, False để xem quá trình
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                ]
-            )
-            
-            # Tạo context với user agent giống người dùng thật
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                locale='vi-VN',
-            )
-            
-            page = context.new_page()
-            
+        # Browser pool đã có sẵn options chống phát hiện và user agent giống người dùng thật
+        own_pool = self.browser_pool is None
+        pool = BrowserPool(request_router=RequestRouter()) if own_pool else self.browser_pool
+        page = pool.acquire()
+        
+        try:
             # Crawl từng trang danh sách
             for page_num in range(1, max_pages + 1):
                 print(f"\n📄 Đang crawl trang {page_num}/{max_pages}")
@@ -261,17 +288,23 @@ class ChoTotScraper:
                 try:
                     # Truy cập trang danh sách
                     print(f"🌐 Đang truy cập: {url}")
-                    page.goto(url, wait_until='networkidle', timeout=30000)
+                    page = pool.checkout(page)
+                    self.goto(page, url)
                     
-                    # Scroll để load lazy content
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(2)
+                    # Scroll để load lazy content, đợi tới khi có link bài đăng
+                    with self.metrics.timed('readiness'):
+                        wait_until_ready(page, PROFILES['nhatot_listing'], self.readiness)
                     
                     # Lấy HTML content
-                    html_content = page.content()
+                    with self.metrics.timed('content'):
+                        html_content = page.content()
+                    if self.snapshots is not None:
+                        self.snapshots.put(url, html_content, 'nhatot_listing')
                     
                     # Parse để lấy links
-                    listing_links = self.parse_listing_page(html_content)
+                    with self.metrics.timed('parse'):
+                        listing_links = self.parse_listing_page(html_content)
+                    self.metrics.success('listing')
                     
                     if not listing_links:
                         print("⚠️  Không tìm thấy bài đăng nào, có thể đã hết trang hoặc cần cập nhật selector")
@@ -285,35 +318,40 @@ class ChoTotScraper:
                         print(f"\n  📌 [{idx}/{len(listing_links)}] Đang crawl: {detail_url}")
                         
                         try:
-                            page.goto(detail_url, wait_until='networkidle', timeout=30000)
-                            time.sleep(1)
-                            
-                            # Scroll để load hết nội dung
-                            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            time.sleep(1)
+                            page = pool.checkout(page)
+                            self.goto(page, detail_url)
+                            with self.metrics.timed('readiness'):
+                                wait_until_ready(page, PROFILES['nhatot_detail'], self.readiness)
                             
-                            detail_html = page.content()
-                            property_data = self.parse_detail_page(detail_html, detail_url)
+                            with self.metrics.timed('content'):
+                                detail_html = page.content()
+                            if self.snapshots is not None:
+                                self.snapshots.put(detail_url, detail_html, 'nhatot_detail')
+                            with self.metrics.timed('parse'):
+                                property_data = self.parse_detail_page(detail_html, detail_url)
                             
-                            self.data.append(property_data)
+                            with self.metrics.timed('persist'):
+                                self._emit(property_data)
+                            self.metrics.success('detail')
                             print(f"  ✅ Đã lấy dữ liệu: {property_data['price']} - {property_data['area']}")
                             
                         except Exception as e:
+                            self.metrics.failure('detail', e)
                             print(f"  ❌ Lỗi khi crawl chi tiết: {e}")
-                        
-                        # Delay giữa các request
-                        self.random_delay(2, 4)
                     
                 except Exception as e:
+                    self.metrics.failure('listing', e)
                     print(f"❌ Lỗi khi crawl trang {page_num}: {e}")
-                
-                # Delay giữa các trang
-                self.random_delay(3, 6)
-            
-            browser.close()
+        finally:
+            pool.release(page)
+            if own_pool:
+                pool.close()
         
         print(f"\n{'='*60}")
-        print(f"✅ Hoàn thành! Đã crawl được {len(self.data)} bài đăng")
+        print(f"✅ Hoàn thành! Đã crawl được {self.record_count} bài đăng")
+        self.readiness.print_stats()
+        self.rate_limiter.print_stats()
+        self.metrics.print_stats()
         print(f"{'='*60}")
     
     def save_to_csv(self, filename='chotot_hanoi_data.csv'):
@@ -342,7 +380,19 @@ def main():
     ╚══════════════════════════════════════════════════════════╝
     """)
     
-    scraper = ChoTotScraper()
+    HEADLESS = True  # Đặt False để xem quá trình crawl
+    METRICS_PORT = 9109  # Xem số liệu trực tiếp: curl http://127.0.0.1:9109/metrics (None để tắt)
+    SNAPSHOT_DIR = 'snapshots'  # Lưu HTML đã lấy để parse lại offline: python3 snapshot_cache.py reparse (None để tắt)
+    
+    # Bản ghi được ghi nối vào file kết quả ngay trong lúc crawl
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"chotot_hanoi_{timestamp}.csv"
+    
+    scraper = ChoTotScraper(
+        browser_pool=BrowserPool(headless=HEADLESS, request_router=RequestRouter()),
+        sink=RecordSink(filename),
+        snapshots=SnapshotCache(SNAPSHOT_DIR) if SNAPSHOT_DIR else None,
+    )
     
     # Cấu hình crawl
     MAX_PAGES = 3          # Số trang cần crawl (bắt đầu với 3 trang để test)
@@ -354,14 +404,22 @@ def main():
     print(f"   - Tổng dự kiến: ~{MAX_PAGES * MAX_ITEMS_PER_PAGE} bài đăng")
     print()
     
-    # Bắt đầu crawl
-    scraper.scrape(max_pages=MAX_PAGES, max_items_per_page=MAX_ITEMS_PER_PAGE)
+    if METRICS_PORT:
+        scraper.metrics.serve(METRICS_PORT)
     
-    # Lưu dữ liệu
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"chotot_hanoi_{timestamp}.csv"
-    scraper.save_to_csv(filename)
+    # Bắt đầu crawl
+    try:
+        scraper.scrape(max_pages=MAX_PAGES, max_items_per_page=MAX_ITEMS_PER_PAGE)
+    finally:
+        scraper.metrics.write_summary(f"chotot_run_{timestamp}.json")
+        scraper.metrics.close()
+        scraper.sink.close()
+        scraper.browser_pool.close()
+        if scraper.snapshots is not None:
+            scraper.snapshots.print_stats()
+            scraper.snapshots.close()
     
+    print(f"\n💾 Đã lưu {scraper.record_count} bản ghi vào file: {filename}")
     print(f"\n✨ Hoàn tất! Kiểm tra file: {filename}")
 
 
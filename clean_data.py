@@ -4,9 +4,18 @@ Script làm sạch dữ liệu CSV - Loại bỏ trùng lặp và dữ liệu r
 
 import pandas as pd
 import sys
+from dataset_store import write_dataset, source_of, crawl_date_of
+from field_normalizer import add_normalized_columns
+from hanoi_gazetteer import add_location_columns
+from near_duplicates import add_dedup_column
 
-def clean_csv(input_file):
-    """Làm sạch file CSV"""
+def clean_csv(input_file, dataset_root=None):
+    """
+    Làm sạch file CSV
+    
+    Args:
+        dataset_root: Nếu có, ghi thêm kết quả vào dataset Parquet phân vùng (xem dataset_store.py)
+    """
     print(f"📂 Đang đọc file: {input_file}")
     
     # Đọc CSV
@@ -45,6 +54,25 @@ def clean_csv(input_file):
     # 5. Reset index
     df = df.reset_index(drop=True)
     
+    # 6. Chuẩn hóa giá / diện tích thành cột số (một lần, analyze_data.py và dataset dùng lại)
+    print("\n🔢 Chuẩn hóa giá và diện tích...")
+    df = add_normalized_columns(df)
+    print(f"   ✅ price_million: {df['price_million'].notna().sum()} dòng, "
+          f"area_m2: {df['area_m2'].notna().sum()} dòng, có mặt tiền x chiều sâu: {df['frontage_m'].notna().sum()} dòng")
+    
+    # 7. Xác định phường / quận theo danh mục hành chính Hà Nội (hanoi_gazetteer.py)
+    print("\n📍 Xác định phường và quận từ địa chỉ...")
+    df = add_location_columns(df)
+    print(f"   ✅ Quận: {df['district_id'].notna().sum()} dòng, phường: {df['ward_id'].notna().sum()} dòng")
+    
+    # 8. Gom tin đăng lại (URL khác, mô tả + địa chỉ gần giống) - giữ lại mọi dòng, chỉ gán cụm
+    print("\n🔍 Gom tin đăng lại (MinHash / LSH trên mô tả + địa chỉ)...")
+    df, dedup_stats = add_dedup_column(df)
+    if dedup_stats:
+        print(f"   ✅ {dedup_stats['clusters']} bất động sản khác nhau, "
+              f"{len(df) - dedup_stats['clusters']} dòng là tin đăng lại "
+              f"({dedup_stats['candidate_pairs']} cặp ứng viên, {dedup_stats['matched_pairs']} cặp khớp)")
+    
     print(f"\n{'='*60}")
     print(f"✅ Kết quả: {len(df)} bài đăng duy nhất và hợp lệ")
     print(f"{'='*60}")
@@ -54,6 +82,9 @@ def clean_csv(input_file):
     df.to_csv(output_file, index=False, encoding='utf-8-sig')
     print(f"\n💾 Đã lưu file sạch: {output_file}")
     
+    if dataset_root:
+        write_dataset(df, source_of(input_file), crawl_date_of(input_file), dataset_root)
+    
     # Hiển thị thống kê
     print(f"\n📊 THỐNG KÊ DỮ LIỆU SAU KHI LÀM SẠCH:")
     print(f"   - Tổng số bài đăng: {len(df)}")
@@ -96,7 +127,9 @@ if __name__ == "__main__":
     ╚══════════════════════════════════════════════════════════╝
     """)
     
-    cleaned_file = clean_csv(latest_file)
+    DATASET_ROOT = 'dataset'  # Ghi thêm vào dataset Parquet (None để tắt)
+    
+    cleaned_file = clean_csv(latest_file, dataset_root=DATASET_ROOT)
     
     # XÓA CÁC FILE THỪA
     print(f"\n🧹 Đang dọn dẹp các file thừa...")
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Crawl Coordinator - Chia việc crawl mogi.vn cho nhiều process / nhiều máy qua một file SQLite dùng chung
+
+Một MogiMultiCategoryScraper crawl lần lượt từng danh mục nên tốc độ bị giới hạn ở một browser.
+Coordinator chia việc thành các lease (danh mục x khoảng trang) lưu trong SQLite:
+- Worker nhận (claim) một lease, crawl khoảng trang đó rồi gửi bản ghi về cùng lúc đánh dấu lease xong
+  (trong một transaction - lease chỉ được tính một lần)
+- Lease có hạn; worker gia hạn trong lúc crawl. Worker chết thì lease hết hạn và được trả lại
+  cho worker khác, các bài nó đã nhận cũng được nhả ra. Trang danh sách lỗi thì cả lease được trả lại;
+  bài chi tiết lỗi được lease sau cùng danh mục crawl lại (tối đa max_attempts lần)
+- Mỗi bài đăng (-id123) chỉ được một worker nhận trong cả lượt crawl (loại trùng toàn cục),
+  kể cả khi cùng bài xuất hiện ở nhiều danh mục / nhiều trang
+
+Cách dùng:
+    python3 crawl_coordinator.py plan --pages 50 --pages-per-lease 5
+    python3 crawl_coordinator.py worker --processes 4      # chạy trên mỗi máy dùng chung file --db
+    python3 crawl_coordinator.py status
+    python3 crawl_coordinator.py export mogi_hanoi_sharded.csv
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+
+from url_frontier import UrlFrontier, listing_id
+from record_sink import RecordSink, FIELDNAMES
+
+
+COORDINATOR_DB = 'mogi_coordinator.sqlite3'
+
+# Trạng thái lease
+PENDING = 'pending'  # Chưa ai nhận (hoặc được trả lại sau khi hết hạn / lỗi)
+LEASED = 'leased'    # Đang có worker crawl
+DONE = 'done'        # Đã crawl xong và gửi bản ghi về
+FAILED = 'failed'    # Lỗi quá số lần thử
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    lease_id    INTEGER PRIMARY KEY,
+    category    TEXT NOT NULL,
+    start_page  INTEGER NOT NULL,
+    end_page    INTEGER NOT NULL,
+    state       TEXT NOT NULL,
+    worker      TEXT,
+    expires_at  REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    row_count   INTEGER,
+    last_error  TEXT,
+    updated_at  TEXT NOT NULL,
+    UNIQUE (category, start_page)
+);
+CREATE INDEX IF NOT EXISTS idx_leases_state ON leases(state, expires_at);
+CREATE TABLE IF NOT EXISTS claims (
+    listing_id  INTEGER PRIMARY KEY,
+    url         TEXT NOT NULL,
+    lease_id    INTEGER NOT NULL,
+    done        INTEGER NOT NULL DEFAULT 0,
+    attempts    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_claims_lease ON claims(lease_id, done);
+CREATE TABLE IF NOT EXISTS rows (
+    lease_id    INTEGER NOT NULL,
+    seq         INTEGER NOT NULL,
+    record      TEXT NOT NULL,
+    PRIMARY KEY (lease_id, seq)
+);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def worker_name():
+    """Tên worker duy nhất giữa các máy: hostname-pid"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class CrawlCoordinator:
+    """Bảng lease + loại trùng toàn cục trên một file SQLite dùng chung"""
+
+    def __init__(self, db_path=COORDINATOR_DB, lease_seconds=300, max_attempts=3):
+        """
+        Args:
+            db_path: File SQLite dùng chung giữa các worker
+            lease_seconds: Thời hạn lease; worker không gia hạn trong khoảng này coi như đã chết
+            max_attempts: Số lần một lease được giao lại trước khi bị đánh dấu lỗi
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Tự quản lý transaction (BEGIN IMMEDIATE) để claim giữa nhiều process không bị trùng
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        # File coordinator cũ: claims chưa có cột attempts
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(claims)')}
+        if 'attempts' not in columns:
+            self.conn.execute('ALTER TABLE claims ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT - giữ write lock của file trong suốt transaction"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def plan(self, categories, max_pages, pages_per_lease=5, reset=False):
+        """
+        Tạo lease cho mọi danh mục x khoảng trang (gọi lại không tạo trùng)
+
+        Returns:
+            Số lease mới
+        """
+        created = 0
+        with self._transaction() as conn:
+            if reset:
+                for table in ('leases', 'claims', 'rows'):
+                    conn.execute(f'DELETE FROM {table}')
+            for category in categories:
+                for start in range(1, max_pages + 1, pages_per_lease):
+                    end = min(start + pages_per_lease - 1, max_pages)
+                    cursor = conn.execute(
+                        'INSERT OR IGNORE INTO leases (category, start_page, end_page, state, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (category, start, end, PENDING, _now()),
+                    )
+                    created += cursor.rowcount
+        return created
+
+    def _reclaim_expired(self, conn):
+        """Trả lại các lease đã hết hạn và nhả mọi bài lease đó đã nhận (bản ghi của chúng chưa được lưu)"""
+        expired = conn.execute(
+            'SELECT lease_id, attempts FROM leases WHERE state = ? AND expires_at < ?', (LEASED, time.time())
+        ).fetchall()
+        for lease_id, attempts in expired:
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            conn.execute(
+                'UPDATE leases SET state = ?, worker = NULL, expires_at = NULL, last_error = ?, updated_at = ? '
+                'WHERE lease_id = ?',
+                (state, 'lease expired', _now(), lease_id),
+            )
+            self._release_claims(conn, lease_id)
+        return len(expired)
+
+    def _release_claims(self, conn, lease_id):
+        """
+        Nhả các bài lease đã nhận (bản ghi của chúng chưa được lưu) để lease khác nhận lại;
+        bài đang được thử lại (attempts > 0) vẫn giữ trong claims để claim_retries giao tiếp
+        """
+        conn.execute('DELETE FROM claims WHERE lease_id = ? AND attempts = 0', (lease_id,))
+
+    def claim(self, worker):
+        """
+        Nhận lease tiếp theo
+
+        Returns:
+            dict lease (lease_id, category, start_page, end_page) hoặc None nếu không còn lease trống
+        """
+        with self._transaction() as conn:
+            reclaimed = self._reclaim_expired(conn)
+            if reclaimed:
+                print(f"♻️  Trả lại {reclaimed} lease hết hạn")
+            row = conn.execute(
+                'SELECT lease_id, category, start_page, end_page FROM leases WHERE state = ? '
+                'ORDER BY start_page, lease_id LIMIT 1',
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE leases SET state = ?, worker = ?, expires_at = ?, attempts = attempts + 1, updated_at = ? '
+                'WHERE lease_id = ?',
+                (LEASED, worker, time.time() + self.lease_seconds, _now(), row[0]),
+            )
+        return dict(zip(('lease_id', 'category', 'start_page', 'end_page'), row))
+
+    def heartbeat(self, lease_id, worker):
+        """
+        Gia hạn lease
+
+        Returns:
+            False nếu lease không còn thuộc worker này (đã hết hạn và bị giao cho worker khác)
+        """
+        cursor = self.conn.execute(
+            'UPDATE leases SET expires_at = ? WHERE lease_id = ? AND worker = ? AND state = ?',
+            (time.time() + self.lease_seconds, lease_id, worker, LEASED),
+        )
+        return cursor.rowcount == 1
+
+    def claim_urls(self, lease_id, urls):
+        """
+        Loại trùng toàn cục: nhận các bài chưa worker nào nhận trong lượt crawl này
+
+        Returns:
+            Các URL (giữ thứ tự) mà lease này được crawl
+        """
+        result = []
+        with self._transaction() as conn:
+            for url in urls:
+                lid = listing_id(url)
+                if lid is None:
+                    continue
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO claims (listing_id, url, lease_id) VALUES (?, ?, ?)', (lid, url, lease_id)
+                )
+                if cursor.rowcount == 1:
+                    result.append(url)
+        return result
+
+    def claim_retries(self, lease_id, category):
+        """
+        Chuyển cho lease các bài cùng danh mục bị lỗi ở lease trước (chưa quá số lần thử)
+
+        Returns:
+            Các URL lease này cần crawl lại
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT c.listing_id, c.url FROM claims c JOIN leases l ON l.lease_id = c.lease_id '
+                'WHERE c.done = 0 AND c.attempts > 0 AND c.attempts < ? AND l.category = ? '
+                'AND (l.state != ? OR l.lease_id = ?) ORDER BY c.listing_id',
+                (self.max_attempts, category, LEASED, lease_id),
+            ).fetchall()
+            conn.executemany('UPDATE claims SET lease_id = ? WHERE listing_id = ?',
+                             [(lease_id, lid) for lid, _ in rows])
+        return [url for _, url in rows]
+
+    def complete(self, lease_id, worker, records, failed_urls=()):
+        """
+        Gửi bản ghi của lease và đánh dấu lease xong (atomic)
+
+        Args:
+            failed_urls: URL chi tiết lấy lỗi - vẫn thuộc lease nhưng chưa xong, lease sau cùng danh mục
+                         nhận lại qua claim_retries
+
+        Returns:
+            False nếu lease đã bị giao cho worker khác - bản ghi bị bỏ, worker mới sẽ crawl lại
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE leases SET state = ?, expires_at = NULL, row_count = ?, updated_at = ? '
+                'WHERE lease_id = ? AND worker = ? AND state = ?',
+                (DONE, len(records), _now(), lease_id, worker, LEASED),
+            )
+            if cursor.rowcount != 1:
+                return False
+            conn.executemany(
+                'INSERT OR REPLACE INTO rows (lease_id, seq, record) VALUES (?, ?, ?)',
+                [(lease_id, seq, json.dumps(record, ensure_ascii=False)) for seq, record in enumerate(records)],
+            )
+            # Bài chỉ được tính là xong cùng lúc bản ghi của nó được lưu
+            conn.execute('UPDATE claims SET done = 1 WHERE lease_id = ?', (lease_id,))
+            conn.executemany(
+                'UPDATE claims SET done = 0, attempts = attempts + 1 WHERE listing_id = ? AND lease_id = ?',
+                [(listing_id(url), lease_id) for url in failed_urls],
+            )
+        return True
+
+    def fail(self, lease_id, worker, error):
+        """Trả lease về hàng đợi sau lỗi (hoặc đánh dấu lỗi nếu đã thử quá số lần)"""
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE leases SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, '
+                'expires_at = NULL, last_error = ?, updated_at = ? WHERE lease_id = ? AND worker = ? AND state = ?',
+                (self.max_attempts, FAILED, PENDING, str(error), _now(), lease_id, worker, LEASED),
+            )
+            self._release_claims(conn, lease_id)
+
+    def remaining(self):
+        """Số lease chưa xong (đang chờ hoặc đang có worker crawl)"""
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM leases WHERE state IN (?, ?)', (PENDING, LEASED)
+        ).fetchone()[0]
+
+    def stats(self):
+        """Số lease theo trạng thái + số bản ghi đã gửi về"""
+        stats = dict(self.conn.execute('SELECT state, COUNT(*) FROM leases GROUP BY state').fetchall())
+        stats['rows'] = self.conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+        stats['claimed_urls'] = self.conn.execute('SELECT COUNT(*) FROM claims').fetchone()[0]
+        stats['failed_urls'] = self.conn.execute(
+            'SELECT COUNT(*) FROM claims WHERE done = 0 AND attempts > 0').fetchone()[0]
+        return stats
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🧩 Coordinator ({self.db_path}): " + ', '.join(f"{k}: {v}" for k, v in sorted(stats.items())))
+
+    def export(self, path):
+        """
+        Ghi mọi bản ghi đã gửi về ra một file CSV/JSONL (theo thứ tự lease, trong lease theo thứ tự crawl)
+
+        Returns:
+            Số bản ghi
+        """
+        with RecordSink(path, FIELDNAMES, encoding='utf-8') as sink:
+            for (record,) in self.conn.execute('SELECT record FROM rows ORDER BY lease_id, seq'):
+                sink.write(json.loads(record))
+            return sink.count
+
+    def close(self):
+        self.conn.close()
+
+
+class LeaseFrontier:
+    """
+    Frontier cho scraper trong một lease: loại trùng qua coordinator (toàn cục),
+    rồi qua UrlFrontier (các lượt crawl trước) nếu có; gia hạn lease mỗi lần có tiến triển.
+
+    Trạng thái fetch chỉ được ghi vào UrlFrontier dùng chung (commit) sau khi coordinator đã lưu
+    bản ghi của lease - lease hết hạn / lỗi thì bỏ, worker nhận lại lease sẽ crawl lại các bài đó.
+    """
+
+    def __init__(self, coordinator, lease, worker, frontier=None):
+        self.coordinator = coordinator
+        self.lease_id = lease['lease_id']
+        self.worker = worker
+        self.frontier = frontier
+        self.lost = False  # Lease đã bị giao cho worker khác
+        self._updates = []  # (tên hàm UrlFrontier, tham số) chờ ghi sau khi lease xong
+
+    def _heartbeat(self):
+        if not self.lost and not self.coordinator.heartbeat(self.lease_id, self.worker):
+            self.lost = True
+            print(f"⚠️  Lease {self.lease_id} đã hết hạn và bị giao cho worker khác")
+
+    def _defer(self, method, *args):
+        if self.frontier is not None:
+            self._updates.append((method, args))
+        self._heartbeat()
+
+    def filter_new(self, urls, category=None):
+        self._heartbeat()
+        claimed = self.coordinator.claim_urls(self.lease_id, urls)
+        if self.frontier is not None and claimed:
+            claimed = self.frontier.filter_new(claimed, category)
+        return claimed
+
+    def fetch_info(self, url):
+        return self.frontier.fetch_info(url) if self.frontier is not None else None
+
+    def mark_fetched(self, url, fingerprint=None, html_hash=None, validators=None):
+        # So với lần lấy trước nhưng chưa ghi gì (như UrlFrontier.mark_fetched)
+        known = self.fetch_info(url)
+        self._defer('mark_fetched', url, fingerprint, html_hash, validators)
+        return known is None or fingerprint is None or known['fingerprint'] != fingerprint
+
+    def mark_unchanged(self, url):
+        self._defer('mark_unchanged', url)
+
+    def mark_failed(self, url, error=None):
+        self._defer('mark_failed', url, error)
+
+    def commit(self):
+        """Ghi các cập nhật đã hoãn vào UrlFrontier dùng chung (gọi sau khi coordinator.complete thành công)"""
+        for method, args in self._updates:
+            getattr(self.frontier, method)(*args)
+        self._updates = []
+
+    def pending(self, category=None):
+        return []
+
+    def high_water_mark(self, category):
+        return None, None
+
+    def update_high_water_mark(self, category, max_listing_id, max_posted_date=None):
+        # Một lease chỉ thấy một khoảng trang - không đủ để nâng high-water mark của cả danh mục
+        pass
+
+
+def _crawl_lease(scraper, lease, async_resources, retry_urls=()):
+    """
+    Crawl khoảng trang của lease (retry_urls: bài lỗi ở lease trước, crawl trước các trang)
+
+    Returns:
+        (bản ghi, trang danh sách bị lỗi, URL chi tiết bị lỗi) - scraper tự bắt lỗi từng trang
+        nên lỗi không làm _crawl_lease raise
+    """
+    scraper.data = []
+    scraper.failed_pages = []
+    scraper.failed_urls = []
+    # seen_urls của lease trước không áp dụng: loại trùng toàn cục đã do claims của coordinator lo
+    scraper.seen_urls = set()
+    kwargs = {'max_pages': lease['end_page'], 'start_page': lease['start_page'], 'pending_urls': list(retry_urls)}
+    if async_resources is None:
+        scraper.scrape_category(lease['category'], **kwargs)
+    else:
+        loop, pool, executor = async_resources
+        loop.run_until_complete(scraper.scrape_category_async(lease['category'], browser_pool=pool,
+                                                              executor=executor, **kwargs))
+    return scraper.data, scraper.failed_pages, scraper.failed_urls
+
+
+def run_worker(db_path=COORDINATOR_DB, frontier_db=None, use_async=True, concurrency=4, use_http=True,
+               headless=True, lease_seconds=300, poll_interval=10):
+    """
+    Vòng lặp worker: nhận lease, crawl, gửi bản ghi về cho tới khi hết lease
+
+    Returns:
+        Số bản ghi đã gửi về
+    """
+    from mogi_multi_scraper import MogiMultiCategoryScraper
+    from http_fetcher import HttpFetcher
+    from browser_pool import AsyncBrowserPool
+    from request_policy import RequestRouter
+
+    worker = worker_name()
+    coordinator = CrawlCoordinator(db_path, lease_seconds=lease_seconds)
+    frontier = UrlFrontier(frontier_db) if frontier_db else None
+    # Không dùng sink: bản ghi của lease nằm trong scraper.data cho tới khi gửi về coordinator
+    scraper = MogiMultiCategoryScraper(
+        concurrency=concurrency,
+        headless=headless,
+        http_fetcher=HttpFetcher(pool_size=concurrency + 2) if use_http else None,
+    )
+
+    async_resources = None
+    if use_async:
+        loop = asyncio.new_event_loop()
+        async_resources = (loop, AsyncBrowserPool(headless=headless, request_router=RequestRouter()),
+                           scraper._new_parse_executor())
+
+    total = 0
+    print(f"👷 Worker {worker} bắt đầu ({db_path})")
+    try:
+        while True:
+            lease = coordinator.claim(worker)
+            if lease is None:
+                if coordinator.remaining() == 0:
+                    break
+                # Còn lease của worker khác đang chạy - đợi xem có lease nào hết hạn không
+                time.sleep(poll_interval)
+                continue
+
+            print(f"\n🧩 [{worker}] Lease {lease['lease_id']}: {lease['category']} "
+                  f"trang {lease['start_page']}-{lease['end_page']}")
+            scraper.frontier = LeaseFrontier(coordinator, lease, worker, frontier)
+            try:
+                retry_urls = coordinator.claim_retries(lease['lease_id'], lease['category'])
+                records, failed_pages, failed_urls = _crawl_lease(scraper, lease, async_resources, retry_urls)
+            except Exception as e:
+                print(f"❌ [{worker}] Lease {lease['lease_id']} lỗi: {e}")
+                coordinator.fail(lease['lease_id'], worker, e)
+                continue
+
+            # Trang danh sách lỗi thì các bài trên trang đó chưa được nhận - trả cả lease về để crawl lại
+            if failed_pages:
+                pages = ', '.join(str(page) for _, page in failed_pages)
+                print(f"❌ [{worker}] Lease {lease['lease_id']}: trang danh sách {pages} lỗi - trả lại lease")
+                coordinator.fail(lease['lease_id'], worker, f"listing pages failed: {pages}")
+                continue
+
+            if failed_urls:
+                print(f"↩️  [{worker}] Lease {lease['lease_id']}: {len(failed_urls)} bài lỗi sẽ được lease sau thử lại")
+            if coordinator.complete(lease['lease_id'], worker, records, failed_urls):
+                scraper.frontier.commit()
+                total += len(records)
+                print(f"📤 [{worker}] Lease {lease['lease_id']}: gửi về {len(records)} bài")
+            else:
+                print(f"⚠️  [{worker}] Lease {lease['lease_id']} đã bị giao lại - bỏ {len(records)} bài")
+    finally:
+        scraper.frontier = frontier
+        scraper.close()
+        if async_resources is not None:
+            loop, pool, executor = async_resources
+            loop.run_until_complete(pool.close())
+            loop.close()
+            if executor is not None:
+                executor.shutdown()
+        coordinator.close()
+
+    print(f"✅ Worker {worker} xong: {total} bài")
+    return total
+
+
+def main():
+    from mogi_multi_scraper import MogiMultiCategoryScraper
+
+    parser = argparse.ArgumentParser(description='Chia việc crawl mogi.vn cho nhiều process / nhiều máy')
+    parser.add_argument('--db', default=COORDINATOR_DB, help='File SQLite dùng chung giữa các worker')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_plan = sub.add_parser('plan', help='Tạo lease cho mọi danh mục x khoảng trang')
+    p_plan.add_argument('--pages', type=int, default=50, help='Số trang mỗi danh mục')
+    p_plan.add_argument('--pages-per-lease', type=int, default=5)
+    p_plan.add_argument('--reset', action='store_true', help='Xóa lease/bản ghi của lượt crawl trước')
+
+    p_worker = sub.add_parser('worker', help='Chạy worker nhận lease cho tới khi hết việc')
+    p_worker.add_argument('--processes', type=int, default=1, help='Số process worker trên máy này')
+    p_worker.add_argument('--concurrency', type=int, default=4, help='Số tab chi tiết song song mỗi worker')
+    p_worker.add_argument('--sync', action='store_true', help='Crawl tuần tự thay vì pipeline async')
+    p_worker.add_argument('--frontier', help='File frontier để bỏ qua bài đã crawl ở các lượt trước')
+    p_worker.add_argument('--lease-seconds', type=int, default=300)
+
+    sub.add_parser('status', help='Tiến độ các lease')
+
+    p_export = sub.add_parser('export', help='Gộp bản ghi của mọi worker ra một file')
+    p_export.add_argument('output', help='File .csv hoặc .jsonl')
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        coordinator = CrawlCoordinator(args.db)
+        created = coordinator.plan(MogiMultiCategoryScraper().categories, args.pages, args.pages_per_lease,
+                                   reset=args.reset)
+        print(f"🧩 Đã tạo {created} lease mới")
+        coordinator.print_stats()
+        coordinator.close()
+
+    elif args.command == 'worker':
+        kwargs = {
+            'db_path': args.db,
+            'frontier_db': args.frontier,
+            'use_async': not args.sync,
+            'concurrency': args.concurrency,
+            'lease_seconds': args.lease_seconds,
+        }
+        if args.processes <= 1:
+            run_worker(**kwargs)
+        else:
+            ctx = multiprocessing.get_context('spawn')
+            processes = [ctx.Process(target=run_worker, kwargs=kwargs) for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        CrawlCoordinator(args.db).print_stats()
+
+    elif args.command == 'status':
+        coordinator = CrawlCoordinator(args.db)
+        coordinator.print_stats()
+        coordinator.close()
+
+    else:
+        coordinator = CrawlCoordinator(args.db)
+        if coordinator.remaining():
+            print(f"⚠️  Còn {coordinator.remaining()} lease chưa xong")
+        count = coordinator.export(args.output)
+        coordinator.close()
+        print(f"💾 Đã ghi {count} bản ghi vào: {args.output}")
+        if count == 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
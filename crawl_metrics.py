@@ -0,0 +1,254 @@
+"""
+Crawl Metrics - Đo thời gian từng bước crawl, đếm kết quả / lỗi và tỉ lệ trường rỗng
+
+Dòng print của từng bài không cho biết giờ crawl thực sự tốn vào đâu. CrawlMetrics ghi lại:
+- Thời gian mỗi bước: http (GET tĩnh), navigation (page.goto), readiness (đợi trang sẵn sàng),
+  content (page.content()), parse, persist (frontier + ghi sink)
+- Số trang thành công / không đổi / lỗi theo loại trang, và số lỗi theo loại exception
+- Số bản ghi và số lần mỗi trường bị rỗng
+
+Dữ liệu được xem trực tiếp qua endpoint định dạng Prometheus (chỉ nghe trên localhost):
+    curl http://127.0.0.1:9108/metrics
+và được ghi thành file JSON tổng kết khi crawl xong (write_summary).
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from record_sink import FIELDNAMES
+
+
+STAGES = ['http', 'navigation', 'readiness', 'content', 'parse', 'persist']
+# Ngưỡng (giây) của histogram - từ parse vài ms tới điều hướng chậm hàng chục giây
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+METRICS_PORT = 9108
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _escape(value):
+    """Giá trị label theo định dạng text của Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        data = self.server.metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class CrawlMetrics:
+    """
+    Số liệu của một lần crawl, dùng chung cho mọi thread / worker async
+
+    Ví dụ:
+        with metrics.timed('navigation'):
+            page.goto(url)
+        metrics.success('detail')
+        metrics.failure('detail', e)
+        metrics.record_fields(property_data)
+    """
+
+    def __init__(self, source='mogi', fieldnames=FIELDNAMES):
+        """
+        Args:
+            source: Tên nguồn crawl (label `source` trong Prometheus)
+            fieldnames: Các trường tính tỉ lệ rỗng (url luôn có nên bỏ qua)
+        """
+        self.source = source
+        self.fieldnames = [name for name in fieldnames if name != 'url']
+        self._lock = threading.Lock()
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.durations = {}   # bước -> danh sách thời gian (giây)
+        self.buckets = {}     # bước -> số lần theo từng ngưỡng của BUCKETS
+        self.outcomes = {}    # (loại trang, kết quả) -> số lần
+        self.errors = {}      # (loại trang, tên exception) -> số lần
+        self.records = 0
+        self.empty_fields = {name: 0 for name in self.fieldnames}
+        self._server = None
+
+    def observe(self, stage, seconds):
+        """Ghi lại một lần chạy của bước stage"""
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            counts = self.buckets.setdefault(stage, [0] * len(BUCKETS))
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+
+    @contextmanager
+    def timed(self, stage):
+        """Đo thời gian khối lệnh (kể cả khi raise); dùng được quanh await"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def _count(self, kind, outcome):
+        with self._lock:
+            self.outcomes[(kind, outcome)] = self.outcomes.get((kind, outcome), 0) + 1
+
+    def success(self, kind):
+        """Một trang (kind: 'listing' / 'detail' / 'card') lấy và parse thành công"""
+        self._count(kind, 'success')
+
+    def unchanged(self, kind):
+        """Trang crawl lại không đổi so với lần trước (không parse / không ghi lại)"""
+        self._count(kind, 'unchanged')
+
+    def failure(self, kind, error):
+        """Một trang bị lỗi; lỗi được đếm theo tên lớp exception"""
+        self._count(kind, 'failure')
+        name = type(error).__name__
+        with self._lock:
+            self.errors[(kind, name)] = self.errors.get((kind, name), 0) + 1
+
+    def record_fields(self, record):
+        """Đếm một bản ghi được ghi ra và các trường rỗng của nó"""
+        with self._lock:
+            self.records += 1
+            for name in self.fieldnames:
+                if _is_empty(record.get(name)):
+                    self.empty_fields[name] += 1
+
+    def summary(self):
+        """Tổng kết dạng dict (để ghi JSON)"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            stages = {}
+            for stage in sorted(self.durations, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+                values = self.durations[stage]
+                stages[stage] = {
+                    'count': len(values),
+                    'total_s': round(sum(values), 3),
+                    'mean_s': round(sum(values) / len(values), 4),
+                    'p50_s': round(_percentile(values, 50), 4),
+                    'p95_s': round(_percentile(values, 95), 4),
+                    'max_s': round(max(values), 4),
+                }
+            outcomes = {}
+            for (kind, outcome), count in sorted(self.outcomes.items()):
+                outcomes.setdefault(kind, {})[outcome] = count
+            errors = {}
+            for (kind, name), count in sorted(self.errors.items()):
+                errors.setdefault(kind, {})[name] = count
+            return {
+                'source': self.source,
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'elapsed_s': round(elapsed, 1),
+                'records': self.records,
+                'records_per_min': round(self.records / elapsed * 60, 1) if elapsed else 0.0,
+                'stages': stages,
+                'outcomes': outcomes,
+                'errors': errors,
+                'empty_field_rates': {
+                    name: round(count / self.records, 4) if self.records else 0.0
+                    for name, count in self.empty_fields.items()
+                },
+            }
+
+    def render_prometheus(self):
+        """Toàn bộ số liệu theo định dạng text của Prometheus"""
+        source = _escape(self.source)
+        lines = []
+        with self._lock:
+            lines.append('# HELP crawl_stage_seconds Thoi gian moi buoc crawl')
+            lines.append('# TYPE crawl_stage_seconds histogram')
+            for stage, values in self.durations.items():
+                labels = f'source="{source}",stage="{_escape(stage)}"'
+                for bound, count in zip(BUCKETS, self.buckets[stage]):
+                    lines.append(f'crawl_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'crawl_stage_seconds_bucket{{{labels},le="+Inf"}} {len(values)}')
+                lines.append(f'crawl_stage_seconds_sum{{{labels}}} {sum(values):.6f}')
+                lines.append(f'crawl_stage_seconds_count{{{labels}}} {len(values)}')
+
+            lines.append('# HELP crawl_pages_total So trang theo loai trang va ket qua')
+            lines.append('# TYPE crawl_pages_total counter')
+            for (kind, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'crawl_pages_total{{source="{source}",kind="{_escape(kind)}",'
+                             f'outcome="{_escape(outcome)}"}} {count}')
+
+            lines.append('# HELP crawl_errors_total So loi theo loai exception')
+            lines.append('# TYPE crawl_errors_total counter')
+            for (kind, name), count in sorted(self.errors.items()):
+                lines.append(f'crawl_errors_total{{source="{source}",kind="{_escape(kind)}",'
+                             f'exception="{_escape(name)}"}} {count}')
+
+            lines.append('# HELP crawl_records_total So ban ghi da ghi ra')
+            lines.append('# TYPE crawl_records_total counter')
+            lines.append(f'crawl_records_total{{source="{source}"}} {self.records}')
+
+            lines.append('# HELP crawl_field_empty_total So ban ghi co truong rong')
+            lines.append('# TYPE crawl_field_empty_total counter')
+            for name, count in self.empty_fields.items():
+                lines.append(f'crawl_field_empty_total{{source="{source}",field="{_escape(name)}"}} {count}')
+
+            lines.append('# HELP crawl_elapsed_seconds Thoi gian tu luc bat dau crawl')
+            lines.append('# TYPE crawl_elapsed_seconds gauge')
+            lines.append(f'crawl_elapsed_seconds{{source="{source}"}} {time.perf_counter() - self._start:.1f}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=METRICS_PORT, host='127.0.0.1'):
+        """
+        Mở endpoint /metrics trong một thread nền
+
+        Returns:
+            Cổng thực sự đang nghe (port=0 để hệ điều hành chọn cổng trống)
+        """
+        self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        port = self._server.server_address[1]
+        print(f"📈 Metrics: http://{host}:{port}/metrics")
+        return port
+
+    def write_summary(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        print(f"📝 Đã ghi tổng kết lần chạy: {path}")
+
+    def print_stats(self):
+        """In thời gian từng bước, lỗi và các trường hay bị rỗng"""
+        summary = self.summary()
+        for stage, s in summary['stages'].items():
+            print(f"⏲️  Bước {stage}: {s['count']} lần, tổng {s['total_s']:.1f}s, "
+                  f"p50 {s['p50_s'] * 1000:.0f}ms, p95 {s['p95_s'] * 1000:.0f}ms")
+        for kind, names in summary['errors'].items():
+            print(f"❗ Lỗi [{kind}]: " + ', '.join(f"{name}: {count}" for name, count in names.items()))
+        if summary['records']:
+            rates = ', '.join(f"{name} {rate * 100:.0f}%"
+                              for name, rate in summary['empty_field_rates'].items() if rate)
+            print(f"🕳️  Trường rỗng ({summary['records']} bản ghi): {rates or 'không có'}")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
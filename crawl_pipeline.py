@@ -0,0 +1,238 @@
+"""
+Crawl Pipeline - Tách crawl chi tiết thành các stage fetch -> parse -> write chạy chồng lên nhau
+
+Trước đây mỗi worker fetch xong mới parse, parse xong mới lấy URL tiếp: tab browser đứng
+chờ trong lúc parse, còn parse phải đợi điều hướng. Pipeline gồm:
+- fetch: N worker async lấy HTML (HTTP hoặc Playwright), đẩy vào html_queue
+- parse: M worker đưa HTML sang ProcessPoolExecutor (dùng mọi core), đẩy bản ghi vào row_queue
+- write: một worker nhận kết quả theo thứ tự hoàn thành và gọi on_result (ghi sink, frontier...)
+
+Các queue đều có giới hạn nên stage chậm tự kìm stage trước nó (backpressure).
+Độ sâu từng queue được lấy mẫu định kỳ để biết stage nào đang là nút thắt.
+"""
+
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+STAGES = ['fetch', 'parse', 'write']
+
+
+def make_parse_executor(max_workers=None):
+    """
+    Process pool cho stage parse (mặc định một process mỗi core)
+
+    Dùng 'spawn' thay vì fork: process chính đang chạy thread của Playwright/requests,
+    fork lúc đó có thể làm process con bị treo ở lock đang giữ dở.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+class StageStats:
+    """Thống kê một stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.busy_s = 0.0      # Thời gian thực sự làm việc
+        self.starved_s = 0.0   # Thời gian đợi input (stage trước chậm)
+        self.blocked_s = 0.0   # Thời gian đợi đẩy output vì queue sau đầy (backpressure)
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def sample_depth(self, depth):
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+    def summary(self):
+        return {
+            'processed': self.processed,
+            'errors': self.errors,
+            'busy_s': round(self.busy_s, 2),
+            'starved_s': round(self.starved_s, 2),
+            'blocked_s': round(self.blocked_s, 2),
+            'queue_depth_mean': round(self.depth_total / self.depth_samples, 2) if self.depth_samples else 0.0,
+            'queue_depth_max': self.depth_max,
+        }
+
+
+class PipelineMetrics:
+    """Thống kê các stage, có thể dùng chung cho nhiều lần chạy pipeline (nhiều danh mục)"""
+
+    def __init__(self):
+        self.stages = {name: StageStats(name) for name in STAGES}
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.stages.items()}
+
+    def print_stats(self):
+        """In số việc đã xử lý và độ sâu queue đầu vào của từng stage"""
+        for name, s in self.summary().items():
+            print(f"🔀 Stage {name}: {s['processed']} việc, {s['errors']} lỗi, bận {s['busy_s']}s, "
+                  f"đợi input {s['starved_s']}s, bị chặn {s['blocked_s']}s, "
+                  f"queue TB {s['queue_depth_mean']} / max {s['queue_depth_max']}")
+
+
+class CrawlPipeline:
+    """
+    Pipeline async fetch -> parse (process pool) -> write cho các URL chi tiết
+
+    Ví dụ:
+        pipeline = CrawlPipeline(fetcher_factory, parse_detail_html, on_result, executor=executor)
+        pipeline.start()
+        for seq, url in enumerate(urls):
+            await pipeline.put(seq, url)   # đợi nếu queue đầy
+        await pipeline.join()
+    """
+
+    def __init__(self, fetcher_factory, parse_fn, on_result, fetch_workers=4, parse_workers=None,
+                 queue_size=None, executor=None, metrics=None, sample_interval=0.5, crawl_metrics=None):
+        """
+        Args:
+            fetcher_factory: Hàm tạo fetcher cho mỗi fetch worker; fetcher có
+                             `async fetch(url) -> html` và `async close()`.
+                             fetch trả None khi không cần parse (vd trang không đổi) - on_result nhận record None
+            parse_fn: Hàm cấp module parse_fn(html, url) -> bản ghi (phải pickle được để chạy trong process con)
+            on_result: on_result(seq, url, record, error) - gọi ở stage write, error là Exception hoặc None
+            fetch_workers: Số worker fetch song song (số tab / kết nối)
+            parse_workers: Số parse song song (mặc định = số process của executor hoặc số core)
+            queue_size: Kích thước mỗi queue (mặc định 2 x số worker của stage nhận)
+            executor: ProcessPoolExecutor dùng chung; None = parse ngay trong event loop
+            metrics: PipelineMetrics dùng chung (None = tạo mới)
+            sample_interval: Chu kỳ (giây) lấy mẫu độ sâu queue
+            crawl_metrics: CrawlMetrics ghi thời gian từng lần parse / persist (None = không ghi)
+        """
+        self.fetcher_factory = fetcher_factory
+        self.parse_fn = parse_fn
+        self.on_result = on_result
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+        self.executor = executor
+        self.metrics = metrics or PipelineMetrics()
+        self.sample_interval = sample_interval
+        self.crawl_metrics = crawl_metrics
+
+        self.url_queue = asyncio.Queue(maxsize=queue_size or self.fetch_workers * 2)
+        self.html_queue = asyncio.Queue(maxsize=queue_size or self.parse_workers * 2)
+        self.row_queue = asyncio.Queue(maxsize=queue_size or self.parse_workers * 2)
+        self._fetch_tasks = []
+        self._parse_tasks = []
+        self._write_task = None
+        self._monitor_task = None
+
+    def start(self):
+        """Khởi động các worker (gọi trong event loop)"""
+        self._fetch_tasks = [asyncio.create_task(self._fetch_worker()) for _ in range(self.fetch_workers)]
+        self._parse_tasks = [asyncio.create_task(self._parse_worker()) for _ in range(self.parse_workers)]
+        self._write_task = asyncio.create_task(self._write_worker())
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def put(self, seq, url):
+        """Đưa URL vào stage fetch - đợi nếu pipeline đang đầy (backpressure tới trang danh sách)"""
+        await self.url_queue.put((seq, url))
+
+    async def join(self):
+        """Đợi xử lý hết các URL đã đưa vào rồi dừng từng stage theo thứ tự"""
+        for _ in self._fetch_tasks:
+            await self.url_queue.put(None)
+        await asyncio.gather(*self._fetch_tasks)
+
+        for _ in self._parse_tasks:
+            await self.html_queue.put(None)
+        await asyncio.gather(*self._parse_tasks)
+
+        await self.row_queue.put(None)
+        await self._write_task
+
+        self._monitor_task.cancel()
+
+    async def _get(self, queue, stats):
+        start = time.perf_counter()
+        item = await queue.get()
+        stats.starved_s += time.perf_counter() - start
+        return item
+
+    async def _put(self, queue, item, stats):
+        start = time.perf_counter()
+        await queue.put(item)
+        stats.blocked_s += time.perf_counter() - start
+
+    async def _fetch_worker(self):
+        stats = self.metrics.stages['fetch']
+        fetcher = self.fetcher_factory()
+        try:
+            while True:
+                item = await self._get(self.url_queue, stats)
+                if item is None:
+                    break
+                seq, url = item
+                start = time.perf_counter()
+                try:
+                    html, error = await fetcher.fetch(url), None
+                except Exception as e:
+                    html, error = None, e
+                    stats.errors += 1
+                stats.busy_s += time.perf_counter() - start
+                stats.processed += 1
+                await self._put(self.html_queue, (seq, url, html, error), stats)
+        finally:
+            await fetcher.close()
+
+    async def _parse_worker(self):
+        stats = self.metrics.stages['parse']
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._get(self.html_queue, stats)
+            if item is None:
+                break
+            seq, url, html, error = item
+            record = None
+            if error is None and html is not None:
+                start = time.perf_counter()
+                try:
+                    if self.executor is not None:
+                        record = await loop.run_in_executor(self.executor, self.parse_fn, html, url)
+                    else:
+                        record = self.parse_fn(html, url)
+                except Exception as e:
+                    error = e
+                    stats.errors += 1
+                elapsed = time.perf_counter() - start
+                stats.busy_s += elapsed
+                stats.processed += 1
+                if self.crawl_metrics is not None:
+                    self.crawl_metrics.observe('parse', elapsed)
+            await self._put(self.row_queue, (seq, url, record, error), stats)
+
+    async def _write_worker(self):
+        stats = self.metrics.stages['write']
+        while True:
+            item = await self._get(self.row_queue, stats)
+            if item is None:
+                break
+            start = time.perf_counter()
+            try:
+                self.on_result(*item)
+            except Exception as e:
+                stats.errors += 1
+                print(f"  ❌ Lỗi khi ghi: {item[1]}: {e}")
+            elapsed = time.perf_counter() - start
+            stats.busy_s += elapsed
+            stats.processed += 1
+            if self.crawl_metrics is not None:
+                self.crawl_metrics.observe('persist', elapsed)
+
+    async def _monitor(self):
+        """Lấy mẫu độ sâu queue đầu vào của mỗi stage"""
+        queues = {'fetch': self.url_queue, 'parse': self.html_queue, 'write': self.row_queue}
+        while True:
+            for name, queue in queues.items():
+                self.metrics.stages[name].sample_depth(queue.qsize())
+            await asyncio.sleep(self.sample_interval)
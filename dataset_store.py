@@ -0,0 +1,249 @@
+"""
+Dataset Store - Lưu dữ liệu crawl dạng cột (Parquet), phân vùng theo nguồn, ngày crawl và quận
+
+Các file CSV như mogi_hanoi_multicategory_*_cleaned.csv lưu mọi cột dưới dạng chuỗi,
+và mỗi lần phân tích phải đọc lại toàn bộ file. Dataset Parquet:
+- Có kiểu dữ liệu (số phòng là số nguyên, ngày đăng là date...)
+- Phân vùng theo thư mục: dataset/source=mogi/crawl_date=2026-02-05/district=Quận Cầu Giấy/...
+- Khi đọc chỉ lấy các cột và phân vùng cần thiết (filter được đẩy xuống mức file),
+  file được memory-map nên đọc dữ liệu của nhiều tháng crawl vẫn nhanh
+
+Cách dùng:
+    python3 dataset_store.py import mogi_hanoi_multicategory_20260205_222533_cleaned.csv
+    python3 dataset_store.py info
+"""
+
+import os
+import re
+import sys
+import argparse
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from record_sink import FIELDNAMES
+from field_normalizer import NORMALIZED_COLUMNS, add_normalized_columns
+from hanoi_gazetteer import LOCATION_COLUMNS, add_location_columns
+
+
+DATASET_DIR = 'dataset'
+UNKNOWN_DISTRICT = 'unknown'
+
+# Kiểu của các cột dữ liệu (cột phân vùng nằm trong đường dẫn thư mục, không lưu trong file)
+SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('price', pa.string()),
+    ('area', pa.string()),
+    ('address', pa.string()),
+    ('bedrooms', pa.int16()),
+    ('bathrooms', pa.int16()),
+    ('property_type', pa.string()),
+    ('posted_date', pa.date32()),
+    ('description', pa.string()),
+    # Cột chuẩn hóa, tính một lần khi ghi (field_normalizer.py)
+    ('price_million', pa.float64()),
+    ('area_m2', pa.float64()),
+    ('frontage_m', pa.float64()),
+    ('depth_m', pa.float64()),
+    # Phường / mã chuẩn theo hanoi_gazetteer.py (dictionary: ít giá trị khác nhau)
+    ('ward', pa.dictionary(pa.int32(), pa.string())),
+    ('ward_id', pa.dictionary(pa.int32(), pa.string())),
+    ('district_id', pa.dictionary(pa.int32(), pa.string())),
+    # Cụm tin đăng lại (near_duplicates.py) - chỉ duy nhất trong cùng source + crawl_date
+    ('dedup_cluster_id', pa.int64()),
+])
+
+PARTITION_SCHEMA = pa.schema([('source', pa.string()), ('crawl_date', pa.string()), ('district', pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+
+def source_of(filename):
+    """Nguồn dữ liệu theo tên file CSV (chotot_hanoi_* hoặc mogi_hanoi_*)"""
+    return 'chotot' if os.path.basename(filename).startswith('chotot') else 'mogi'
+
+
+def crawl_date_of(filename):
+    """Ngày crawl theo timestamp trong tên file (..._20260205_222533...), mặc định là ngày sửa file"""
+    match = re.search(r'_(\d{8})_\d{6}', os.path.basename(filename))
+    if match:
+        return datetime.strptime(match.group(1), '%Y%m%d').date().isoformat()
+    return date.fromtimestamp(os.path.getmtime(filename)).isoformat()
+
+
+def _to_int(series):
+    """'3', '3.0', '3 PN' -> 3; còn lại -> <NA>"""
+    digits = series.astype('string').str.extract(r'(\d+)', expand=False)
+    return pd.to_numeric(digits, errors='coerce').astype('Int16')
+
+
+def to_typed_frame(df, source, crawl_date):
+    """
+    Chuyển DataFrame cột chuỗi (như đọc từ CSV) sang đúng kiểu của SCHEMA + các cột phân vùng
+
+    Các cột chuẩn hóa (price_million, area_m2...), phường / quận và dedup_cluster_id có sẵn trong df
+    (file _cleaned.csv) thì dùng lại; quận được ghi theo tên chuẩn của gazetteer.
+    """
+    derived = [name for name in NORMALIZED_COLUMNS + LOCATION_COLUMNS if name in df.columns]
+    # File chưa qua near_duplicates.py: dedup_cluster_id rỗng
+    df = add_normalized_columns(df.reindex(columns=FIELDNAMES + derived + ['dedup_cluster_id']))
+    df = add_location_columns(df)
+    typed = pd.DataFrame({
+        'url': df['url'].astype('string'),
+        'price': df['price'].astype('string'),
+        'area': df['area'].astype('string'),
+        'address': df['address'].astype('string'),
+        'bedrooms': _to_int(df['bedrooms']),
+        'bathrooms': _to_int(df['bathrooms']),
+        'property_type': df['property_type'].astype('string'),
+        # mogi.vn: dd/mm/yyyy; chuỗi khác (như "Hôm nay") -> NaT
+        'posted_date': pd.to_datetime(df['posted_date'], format='%d/%m/%Y', errors='coerce').dt.date,
+        'description': df['description'].astype('string'),
+    })
+    for name in NORMALIZED_COLUMNS:
+        typed[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+    for name in LOCATION_COLUMNS:
+        typed[name] = df[name].astype('category')
+    typed['dedup_cluster_id'] = pd.to_numeric(df['dedup_cluster_id'], errors='coerce').astype('Int64')
+    typed['source'] = source
+    typed['crawl_date'] = crawl_date
+    typed['district'] = df['district'].fillna(UNKNOWN_DISTRICT).astype(str)
+    return typed
+
+
+def write_dataset(df, source, crawl_date=None, root=DATASET_DIR):
+    """
+    Ghi một lượt crawl vào dataset (thêm file mới, không ghi đè các lượt khác)
+
+    Args:
+        df: DataFrame theo FIELDNAMES (ví dụ đọc từ file _cleaned.csv)
+        source: 'mogi' hoặc 'chotot'
+        crawl_date: 'YYYY-MM-DD' (mặc định hôm nay)
+        root: Thư mục gốc của dataset
+
+    Returns:
+        Số dòng đã ghi
+    """
+    crawl_date = crawl_date or date.today().isoformat()
+    typed = to_typed_frame(df, source, crawl_date)
+    # dedup_cluster_id của mỗi file đánh số từ 0: lượt ghi sau cùng source + crawl_date được đánh số tiếp
+    if typed['dedup_cluster_id'].notna().any():
+        typed['dedup_cluster_id'] += _next_cluster_id(root, source, crawl_date)
+    schema = pa.schema(list(SCHEMA) + list(PARTITION_SCHEMA))
+    table = pa.Table.from_pandas(typed, schema=schema, preserve_index=False)
+
+    # Tên file theo thời điểm ghi để lượt import sau không đè lên lượt trước cùng phân vùng
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    ds.write_dataset(
+        table, root, format='parquet', partitioning=PARTITIONING,
+        basename_template=f'part-{stamp}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    print(f"🗃️  Đã ghi {len(typed)} dòng ({source}, {crawl_date}) vào dataset: {root}")
+    return len(typed)
+
+
+def _next_cluster_id(root, source, crawl_date):
+    """dedup_cluster_id lớn nhất đã có trong phân vùng source + crawl_date, cộng 1 (0 nếu chưa có)"""
+    if not os.path.isdir(root):
+        return 0
+    table = read_dataset(root, columns=['dedup_cluster_id'], filters={'source': source, 'crawl_date': crawl_date},
+                         as_pandas=False)
+    largest = pc.max(table['dedup_cluster_id']).as_py()
+    return 0 if largest is None else largest + 1
+
+
+def _filter_expression(filters):
+    """
+    dict {cột: giá trị | list giá trị | (toán tử, giá trị)} -> biểu thức pyarrow
+
+    VD: {'source': 'mogi', 'district': ['Quận Cầu Giấy', 'Quận Đống Đa'], 'crawl_date': ('>=', '2026-02-01')}
+    """
+    expr = None
+    for column, value in filters.items():
+        field = ds.field(column)
+        if isinstance(value, tuple):
+            op, operand = value
+            cond = {
+                '==': field == operand, '!=': field != operand,
+                '>': field > operand, '>=': field >= operand,
+                '<': field < operand, '<=': field <= operand,
+            }[op]
+        elif isinstance(value, (list, set)):
+            cond = field.isin(list(value))
+        else:
+            cond = field == value
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def read_dataset(root=DATASET_DIR, columns=None, filters=None, as_pandas=True):
+    """
+    Đọc dataset, chỉ lấy các cột / phân vùng cần thiết
+
+    Args:
+        columns: Danh sách cột (None = tất cả, gồm cả cột phân vùng)
+        filters: dict lọc (xem _filter_expression) - filter trên cột phân vùng
+                 loại bỏ cả thư mục mà không cần mở file
+        as_pandas: False để nhận pyarrow.Table (không copy sang pandas)
+    """
+    expr = _filter_expression(filters) if filters else None
+    # Schema đầy đủ: file ghi trước khi có cột chuẩn hóa nào đó vẫn đọc được (cột đó là null)
+    schema = pa.schema(list(SCHEMA) + list(PARTITION_SCHEMA))
+    table = pq.read_table(root, columns=columns, filters=expr, partitioning=PARTITIONING, memory_map=True,
+                          schema=schema)
+    if not as_pandas:
+        return table
+    # Cột chuỗi giữ dạng Arrow, tránh tạo hàng nghìn object Python
+    return table.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True, self_destruct=True)
+
+
+def import_csv(csv_file, root=DATASET_DIR, source=None, crawl_date=None):
+    """Import một file CSV đã crawl (hoặc đã làm sạch) vào dataset"""
+    df = pd.read_csv(csv_file, dtype=str)
+    return write_dataset(df, source or source_of(csv_file), crawl_date or crawl_date_of(csv_file), root)
+
+
+def print_info(root=DATASET_DIR):
+    """In số dòng theo nguồn và ngày crawl (chỉ đọc metadata + cột phân vùng)"""
+    if not os.path.isdir(root):
+        print(f"❌ Chưa có dataset: {root}")
+        return
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    counts = (dataset.to_table(columns=['source', 'crawl_date'])
+              .group_by(['source', 'crawl_date']).aggregate([([], 'count_all')])
+              .sort_by([('source', 'ascending'), ('crawl_date', 'ascending')]))
+    print(f"🗃️  Dataset {root}: {len(dataset.files)} file")
+    for row in counts.to_pylist():
+        print(f"   - {row['source']} {row['crawl_date']}: {row['count_all']} dòng")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dataset Parquet phân vùng cho dữ liệu BĐS đã crawl')
+    parser.add_argument('--root', default=DATASET_DIR, help='Thư mục dataset')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_import = sub.add_parser('import', help='Import file CSV vào dataset')
+    p_import.add_argument('files', nargs='+')
+    p_import.add_argument('--source', choices=['mogi', 'chotot'], help='Mặc định đoán theo tên file')
+    p_import.add_argument('--crawl-date', help='YYYY-MM-DD, mặc định lấy theo tên file')
+
+    sub.add_parser('info', help='Thống kê dataset')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        total = 0
+        for csv_file in args.files:
+            if not os.path.exists(csv_file):
+                print(f"❌ Không tìm thấy file: {csv_file}")
+                sys.exit(1)
+            total += import_csv(csv_file, args.root, args.source, args.crawl_date)
+        print(f"\n✅ Đã import {total} dòng từ {len(args.files)} file")
+    else:
+        print_info(args.root)
+
+
+if __name__ == "__main__":
+    main()
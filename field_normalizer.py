@@ -0,0 +1,167 @@
+"""
+Field Normalizer - Chuẩn hóa các trường dạng chữ (giá, diện tích) thành cột số, xử lý theo cột
+
+Giá và diện tích crawl về giữ nguyên dạng chữ của site ("2 tỷ 950 triệu", "5,5 tỷ", "120 triệu/m²",
+"Thỏa thuận", "88,7 m2 (4,05x21,9)"). Trước đây mỗi dòng được parse bằng một hàm Python qua
+Series.apply và chỉ lấy số đầu tiên ("2 tỷ 950 triệu" -> 2000, mất mặt tiền / chiều sâu). Ở đây:
+- Mỗi chuỗi khác nhau chỉ được parse một lần (pd.factorize), kết quả được trải lại theo mã
+- Các chuỗi khác nhau được parse bằng str.extract / str.contains với regex biên dịch sẵn của pandas,
+  không có vòng lặp Python theo từng dòng
+Số kiểu Việt Nam: dấu phẩy là phần thập phân ("5,5 tỷ"), dấu chấm theo nhóm 3 chữ số là phân cách nghìn ("1.500 triệu").
+
+clean_data.py tính các cột này một lần (add_normalized_columns) và ghi vào file _cleaned.csv / dataset,
+analyze_data.py chỉ parse các dòng còn thiếu.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Một số: 2 / 2,5 / 2.5 / 1.500
+_NUMBER = r'(\d+(?:[.,]\d+)*)'
+# Đơn vị không được là đầu của một từ dài hơn ("tr" không khớp "trăm")
+_END = r'(?![a-zà-ỹ])'
+_BILLION = _NUMBER + r'\s*(?:tỷ|tỉ|ty)' + _END
+# Số trơn ở cuối sau "tỷ" là phần lẻ của tỷ: "3 tỷ 5" = 3,5 tỷ, "2 tỷ 25" = 2,25 tỷ
+_BILLION_REMAINDER = r'(?:tỷ|tỉ|ty)\s*(\d{1,3})\s*$'
+_MILLION = _NUMBER + r'\s*(?:triệu|trieu|tr)' + _END
+# Hàng trăm triệu viết bằng chữ: "2 trăm triệu" = 200, "2 trăm 50 triệu" = 250 (phần 50 do _MILLION lấy),
+# "trăm" ở cuối cũng là trăm triệu: "2 tỷ 5 trăm" = 2500
+_HUNDRED_MILLION = _NUMBER + r'\s*(?:trăm|tram)(?=\s*(?:\d+\s*)?(?:triệu|trieu|tr)' + _END + r'|\s*$)'
+_THOUSAND = _NUMBER + r'\s*(?:nghìn|ngàn|nghin|ngan)' + _END
+_PER_M2 = r'/\s*m\s*(?:2|²)'
+_NEGOTIABLE = r'thỏa thuận|thoả thuận|thoa thuan|liên hệ|lien he'
+_THOUSANDS_GROUPED = r'\d{1,3}(?:\.\d{3})+'
+# Giá số thuần theo VNĐ: offers.price trong JSON-LD của nhatot.com, hoặc "1.200.000.000 đ"
+_RAW_VND = r'(' + _THOUSANDS_GROUPED + r'|\d+(?:\.0+)?)\s*(?:đ|đồng|vnđ|vnd|₫)?'
+# Diện tích: "88,7 m2", "45 m²"; kích thước mặt tiền x chiều sâu: "(4,05x21,9)", "5 x 20m"
+_AREA = _NUMBER + r'\s*(?:m2|m²|㎡|met vuong|mét vuông)'
+_DIMENSIONS = r'(\d+(?:[.,]\d+)?)\s*m?\s*[x×*]\s*(\d+(?:[.,]\d+)?)'
+
+AREA_COLUMNS = ['area_m2', 'frontage_m', 'depth_m']
+NORMALIZED_COLUMNS = ['price_million'] + AREA_COLUMNS
+
+
+def _floats(series):
+    """Series số (có thể nullable) -> mảng float64, NA -> NaN"""
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _to_number(texts):
+    """'1.500' -> 1500, '2,5' / '2.5' -> 2.5 (chuỗi đã tách ra từ str.extract)"""
+    grouped = texts.str.fullmatch(_THOUSANDS_GROUPED).fillna(False).astype(bool)
+    texts = texts.where(~grouped, texts.str.replace('.', '', regex=False))
+    return _floats(texts.str.replace(',', '.', regex=False))
+
+
+def _unique_texts(values):
+    """
+    Mã của từng dòng và các chuỗi khác nhau (chữ thường, Unicode dạng NFC)
+
+    Returns:
+        (codes, texts) - codes[i] là vị trí trong texts, -1 nếu dòng trống
+    """
+    codes, uniques = pd.factorize(pd.Series(values).astype('string'))
+    texts = pd.Series(uniques, dtype='string').str.normalize('NFC').str.lower().str.strip()
+    return codes, texts
+
+
+def _spread(codes, values):
+    """Trải kết quả của các chuỗi khác nhau về đúng từng dòng"""
+    values = np.append(np.asarray(values, dtype='float64'), np.nan)  # mã -1 -> NaN
+    return values[codes]
+
+
+def parse_price(prices, area_m2=None):
+    """
+    Giá dạng chữ -> triệu VNĐ
+
+    VD: "2 tỷ 950 triệu" -> 2950, "5,5 tỷ" -> 5500, "3 tỷ 5" -> 3500, "850 triệu" -> 850,
+        "5800000000" -> 5800, "1.200.000.000" -> 1200, "5.800.000.000 đ" -> 5800,
+        "1 tỷ 2 trăm triệu" -> 1200, "120 triệu/m²" -> 120 x area_m2, "Thỏa thuận" -> NaN
+
+    Args:
+        prices: Series cột price
+        area_m2: Series diện tích (m²) cùng index, dùng cho giá theo m² (None = giá theo m² thành NaN)
+
+    Returns:
+        Series float64 'price_million' cùng index với prices
+    """
+    prices = pd.Series(prices)
+    codes, texts = _unique_texts(prices)
+
+    billion = _to_number(texts.str.extract(_BILLION, expand=False))
+    million = _to_number(texts.str.extract(_MILLION, expand=False))
+    hundred = _to_number(texts.str.extract(_HUNDRED_MILLION, expand=False))
+    million = np.where(np.isnan(hundred), million, hundred * 100 + np.nan_to_num(million))
+    thousand = _to_number(texts.str.extract(_THOUSAND, expand=False))
+    # "3 tỷ 5": phần lẻ chỉ tính khi sau tỷ không có triệu / nghìn
+    remainder = texts.str.extract(_BILLION_REMAINDER, expand=False)
+    fraction = _floats(remainder) / 10.0 ** _floats(remainder.str.len())
+    billion = np.where(np.isnan(million) & np.isnan(thousand), billion + np.nan_to_num(fraction), billion)
+    has_unit = ~(np.isnan(billion) & np.isnan(million) & np.isnan(thousand))
+    value = np.nan_to_num(billion) * 1000 + np.nan_to_num(million) + np.nan_to_num(thousand) / 1000
+    value = np.where(has_unit, value, np.nan)
+
+    # Không có đơn vị: số VNĐ thuần (chỉ nhận từ 100.000 VNĐ trở lên để không nhầm với số trang, ID...)
+    raw = _to_number(texts.str.extract('^' + _RAW_VND + '$', expand=False))
+    value = np.where(np.isnan(value) & (raw >= 1e5), raw / 1e6, value)
+
+    negotiable = texts.str.contains(_NEGOTIABLE).fillna(False).to_numpy(dtype=bool)
+    value[negotiable] = np.nan
+    per_m2 = texts.str.contains(_PER_M2).fillna(False).to_numpy(dtype=float)
+
+    result = _spread(codes, value)
+    row_per_m2 = _spread(codes, per_m2) == 1
+    if row_per_m2.any():
+        area = _floats(area_m2) if area_m2 is not None else np.full(len(result), np.nan)
+        result = np.where(row_per_m2, result * area, result)
+    return pd.Series(result, index=prices.index, name='price_million')
+
+
+def parse_area(areas):
+    """
+    Diện tích dạng chữ -> diện tích, mặt tiền và chiều sâu (m)
+
+    VD: "88,7 m2 (4,05x21,9)" -> 88.7, 4.05, 21.9; "45 m²" -> 45, NaN, NaN;
+        chỉ có kích thước "5x20m" -> diện tích 100
+
+    Returns:
+        DataFrame float64 các cột AREA_COLUMNS, cùng index với areas
+    """
+    areas = pd.Series(areas)
+    codes, texts = _unique_texts(areas)
+
+    area = _to_number(texts.str.extract(_AREA, expand=False))
+    dims = texts.str.extract(_DIMENSIONS)
+    frontage = _to_number(dims[0])
+    depth = _to_number(dims[1])
+    # Không ghi m² nhưng là số thuần ("50") - coi là m²
+    bare = _to_number(texts.where(texts.str.fullmatch(_NUMBER).fillna(False).astype(bool)))
+    area = np.where(np.isnan(area), bare, area)
+    area = np.where(np.isnan(area), frontage * depth, area)
+
+    return pd.DataFrame({
+        'area_m2': _spread(codes, area),
+        'frontage_m': _spread(codes, frontage),
+        'depth_m': _spread(codes, depth),
+    }, index=areas.index)
+
+
+def add_normalized_columns(df):
+    """
+    Thêm price_million, area_m2, frontage_m, depth_m từ hai cột price / area
+
+    Cột đã có (vd đọc lại từ file _cleaned.csv) được giữ nguyên, không parse lại.
+
+    Returns:
+        DataFrame mới (df không bị sửa)
+    """
+    columns = {}
+    if not all(name in df.columns for name in AREA_COLUMNS):
+        parsed = parse_area(df['area'])
+        columns.update({name: parsed[name] for name in AREA_COLUMNS if name not in df.columns})
+    if 'price_million' not in df.columns:
+        area_m2 = columns['area_m2'] if 'area_m2' in columns else df['area_m2']
+        columns['price_million'] = parse_price(df['price'], area_m2)
+    return df.assign(**columns)
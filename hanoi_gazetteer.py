@@ -0,0 +1,333 @@
+"""
+Hanoi Gazetteer - Xác định phường/xã và quận/huyện Hà Nội từ địa chỉ
+
+Trước đây mỗi scraper tự tách quận theo cách riêng (mogi: tách dấu phẩy và tìm 'quận';
+nhatot: regex (Quận|Huyện)), không lấy phường và bỏ sót "Thị xã Sơn Tây", "Q. Cầu Giấy",
+địa chỉ không dấu... Module này:
+- Giữ danh mục quận/huyện/thị xã và phường/xã/thị trấn của Hà Nội (DISTRICTS)
+- Biên dịch mọi cách viết (có/không dấu, "Quận"/"Q."/không tiền tố...) thành một trie theo từ
+  trên chữ đã bỏ dấu, nên mỗi địa chỉ chỉ cần quét một lần (khớp dài nhất từ trái sang)
+- Phường chỉ được nhận khi có tiền tố (Phường/P./Xã/Thị trấn) vì nhiều tên phường trùng tên đường
+  ("Nguyễn Trãi", "Quang Trung"); tên phường trùng ở nhiều quận được xác định theo quận trong cùng địa chỉ
+- resolve_column xử lý cả cột: mỗi địa chỉ khác nhau chỉ quét một lần, kết quả là cột category
+
+Mã chuẩn: district_id là slug không dấu ("cau-giay"), ward_id là "<district_id>/<slug phường>".
+
+Cách dùng:
+    from hanoi_gazetteer import resolve_column, district_of
+    df = df.join(resolve_column(df['address']))
+    district_of("Xuân Thủy, P. Dịch Vọng, Q. Cầu Giấy, Hà Nội")  # 'Quận Cầu Giấy'
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# (loại, tên quận/huyện) -> {loại đơn vị cấp phường: [tên]}
+# Quận và thị xã Sơn Tây có đủ phường; huyện có thị trấn, và đủ xã với các huyện hay có tin đăng
+# (giáp nội thành, Thạch Thất / Quốc Oai). Thêm xã của huyện khác chỉ cần bổ sung vào danh sách.
+DISTRICTS = {
+    ('Quận', 'Ba Đình'): {'Phường': [
+        'Cống Vị', 'Điện Biên', 'Đội Cấn', 'Giảng Võ', 'Kim Mã', 'Liễu Giai', 'Ngọc Hà', 'Ngọc Khánh',
+        'Nguyễn Trung Trực', 'Phúc Xá', 'Quán Thánh', 'Thành Công', 'Trúc Bạch', 'Vĩnh Phúc']},
+    ('Quận', 'Hoàn Kiếm'): {'Phường': [
+        'Chương Dương', 'Cửa Đông', 'Cửa Nam', 'Đồng Xuân', 'Hàng Bạc', 'Hàng Bài', 'Hàng Bồ', 'Hàng Bông',
+        'Hàng Buồm', 'Hàng Đào', 'Hàng Gai', 'Hàng Mã', 'Hàng Trống', 'Lý Thái Tổ', 'Phan Chu Trinh',
+        'Phúc Tân', 'Trần Hưng Đạo', 'Tràng Tiền']},
+    ('Quận', 'Tây Hồ'): {'Phường': [
+        'Bưởi', 'Nhật Tân', 'Phú Thượng', 'Quảng An', 'Thụy Khuê', 'Tứ Liên', 'Xuân La', 'Yên Phụ']},
+    ('Quận', 'Long Biên'): {'Phường': [
+        'Bồ Đề', 'Cự Khối', 'Đức Giang', 'Gia Thụy', 'Giang Biên', 'Long Biên', 'Ngọc Lâm', 'Ngọc Thụy',
+        'Phúc Đồng', 'Phúc Lợi', 'Sài Đồng', 'Thạch Bàn', 'Thượng Thanh', 'Việt Hưng']},
+    ('Quận', 'Cầu Giấy'): {'Phường': [
+        'Dịch Vọng', 'Dịch Vọng Hậu', 'Mai Dịch', 'Nghĩa Đô', 'Nghĩa Tân', 'Quan Hoa', 'Trung Hòa', 'Yên Hòa']},
+    ('Quận', 'Đống Đa'): {'Phường': [
+        'Cát Linh', 'Hàng Bột', 'Khâm Thiên', 'Khương Thượng', 'Kim Liên', 'Láng Hạ', 'Láng Thượng',
+        'Nam Đồng', 'Ngã Tư Sở', 'Ô Chợ Dừa', 'Phương Liên', 'Phương Mai', 'Quang Trung', 'Quốc Tử Giám',
+        'Thịnh Quang', 'Thổ Quan', 'Trung Liệt', 'Trung Phụng', 'Trung Tự', 'Văn Chương', 'Văn Miếu']},
+    ('Quận', 'Hai Bà Trưng'): {'Phường': [
+        'Bách Khoa', 'Bạch Đằng', 'Bạch Mai', 'Cầu Dền', 'Đống Mác', 'Đồng Nhân', 'Đồng Tâm', 'Lê Đại Hành',
+        'Minh Khai', 'Ngô Thì Nhậm', 'Nguyễn Du', 'Phạm Đình Hổ', 'Phố Huế', 'Quỳnh Lôi', 'Quỳnh Mai',
+        'Thanh Lương', 'Thanh Nhàn', 'Trương Định', 'Vĩnh Tuy']},
+    ('Quận', 'Hoàng Mai'): {'Phường': [
+        'Đại Kim', 'Định Công', 'Giáp Bát', 'Hoàng Liệt', 'Hoàng Văn Thụ', 'Lĩnh Nam', 'Mai Động', 'Tân Mai',
+        'Thanh Trì', 'Thịnh Liệt', 'Trần Phú', 'Tương Mai', 'Vĩnh Hưng', 'Yên Sở']},
+    ('Quận', 'Thanh Xuân'): {'Phường': [
+        'Hạ Đình', 'Khương Đình', 'Khương Mai', 'Khương Trung', 'Kim Giang', 'Nhân Chính', 'Phương Liệt',
+        'Thanh Xuân Bắc', 'Thanh Xuân Nam', 'Thanh Xuân Trung', 'Thượng Đình']},
+    ('Quận', 'Nam Từ Liêm'): {'Phường': [
+        'Cầu Diễn', 'Đại Mỗ', 'Mễ Trì', 'Mỹ Đình 1', 'Mỹ Đình 2', 'Phú Đô', 'Phương Canh', 'Tây Mỗ',
+        'Trung Văn', 'Xuân Phương']},
+    ('Quận', 'Bắc Từ Liêm'): {'Phường': [
+        'Cổ Nhuế 1', 'Cổ Nhuế 2', 'Đông Ngạc', 'Đức Thắng', 'Liên Mạc', 'Minh Khai', 'Phú Diễn', 'Phúc Diễn',
+        'Tây Tựu', 'Thượng Cát', 'Thụy Phương', 'Xuân Đỉnh', 'Xuân Tảo']},
+    ('Quận', 'Hà Đông'): {'Phường': [
+        'Biên Giang', 'Đồng Mai', 'Dương Nội', 'Hà Cầu', 'Kiến Hưng', 'La Khê', 'Mộ Lao', 'Nguyễn Trãi',
+        'Phú La', 'Phú Lãm', 'Phú Lương', 'Phúc La', 'Quang Trung', 'Vạn Phúc', 'Văn Quán', 'Yên Nghĩa',
+        'Yết Kiêu']},
+    ('Thị xã', 'Sơn Tây'): {
+        'Phường': ['Lê Lợi', 'Ngô Quyền', 'Phú Thịnh', 'Quang Trung', 'Sơn Lộc', 'Trung Hưng', 'Trung Sơn Trầm',
+                   'Viên Sơn', 'Xuân Khanh'],
+        'Xã': ['Cổ Đông', 'Đường Lâm', 'Kim Sơn', 'Sơn Đông', 'Thanh Mỹ', 'Xuân Sơn']},
+    ('Huyện', 'Thanh Trì'): {
+        'Thị trấn': ['Văn Điển'],
+        'Xã': ['Đại Áng', 'Đông Mỹ', 'Duyên Hà', 'Hữu Hòa', 'Liên Ninh', 'Ngọc Hồi', 'Ngũ Hiệp', 'Tả Thanh Oai',
+               'Tam Hiệp', 'Tân Triều', 'Thanh Liệt', 'Tứ Hiệp', 'Vạn Phúc', 'Vĩnh Quỳnh', 'Yên Mỹ']},
+    ('Huyện', 'Hoài Đức'): {
+        'Thị trấn': ['Trạm Trôi'],
+        'Xã': ['An Khánh', 'An Thượng', 'Cát Quế', 'Đắc Sở', 'Di Trạch', 'Đông La', 'Đức Giang', 'Đức Thượng',
+               'Dương Liễu', 'Kim Chung', 'La Phù', 'Lại Yên', 'Minh Khai', 'Song Phương', 'Sơn Đồng',
+               'Tiền Yên', 'Vân Canh', 'Vân Côn', 'Yên Sở']},
+    ('Huyện', 'Gia Lâm'): {
+        'Thị trấn': ['Trâu Quỳ', 'Yên Viên'],
+        'Xã': ['Bát Tràng', 'Cổ Bi', 'Đa Tốn', 'Đặng Xá', 'Đình Xuyên', 'Đông Dư', 'Dương Hà', 'Dương Quang',
+               'Dương Xá', 'Kiêu Kỵ', 'Kim Lan', 'Kim Sơn', 'Lệ Chi', 'Ninh Hiệp', 'Phù Đổng', 'Phú Thị',
+               'Trung Mầu', 'Văn Đức', 'Yên Thường', 'Yên Viên']},
+    ('Huyện', 'Đông Anh'): {
+        'Thị trấn': ['Đông Anh'],
+        'Xã': ['Bắc Hồng', 'Cổ Loa', 'Đại Mạch', 'Đông Hội', 'Dục Tú', 'Hải Bối', 'Kim Chung', 'Kim Nỗ',
+               'Liên Hà', 'Mai Lâm', 'Nam Hồng', 'Nguyên Khê', 'Tàm Xá', 'Thụy Lâm', 'Tiên Dương', 'Uy Nỗ',
+               'Vân Hà', 'Vân Nội', 'Việt Hùng', 'Vĩnh Ngọc', 'Võng La', 'Xuân Canh', 'Xuân Nộn']},
+    ('Huyện', 'Ba Vì'): {'Thị trấn': ['Tây Đằng']},
+    ('Huyện', 'Chương Mỹ'): {'Thị trấn': ['Chúc Sơn', 'Xuân Mai']},
+    ('Huyện', 'Đan Phượng'): {'Thị trấn': ['Phùng']},
+    ('Huyện', 'Mê Linh'): {'Thị trấn': ['Chi Đông', 'Quang Minh']},
+    ('Huyện', 'Mỹ Đức'): {'Thị trấn': ['Đại Nghĩa']},
+    ('Huyện', 'Phú Xuyên'): {'Thị trấn': ['Phú Minh', 'Phú Xuyên']},
+    ('Huyện', 'Phúc Thọ'): {'Thị trấn': ['Phúc Thọ']},
+    ('Huyện', 'Quốc Oai'): {
+        'Thị trấn': ['Quốc Oai'],
+        'Xã': ['Cấn Hữu', 'Cộng Hòa', 'Đại Thành', 'Đồng Quang', 'Đông Xuân', 'Đông Yên', 'Hòa Thạch',
+               'Liệp Tuyết', 'Nghĩa Hương', 'Ngọc Liệp', 'Ngọc Mỹ', 'Phú Cát', 'Phú Mãn', 'Phượng Cách',
+               'Sài Sơn', 'Tân Hòa', 'Tân Phú', 'Thạch Thán', 'Tuyết Nghĩa', 'Yên Sơn']},
+    ('Huyện', 'Sóc Sơn'): {'Thị trấn': ['Sóc Sơn']},
+    ('Huyện', 'Thạch Thất'): {
+        'Thị trấn': ['Liên Quan'],
+        'Xã': ['Bình Phú', 'Bình Yên', 'Canh Nậu', 'Cẩm Yên', 'Cần Kiệm', 'Chàng Sơn', 'Đại Đồng', 'Dị Nậu',
+               'Đồng Trúc', 'Hạ Bằng', 'Hương Ngải', 'Hữu Bằng', 'Kim Quan', 'Lại Thượng', 'Phú Kim',
+               'Phùng Xá', 'Tân Xã', 'Thạch Hòa', 'Thạch Xá', 'Tiến Xuân', 'Yên Bình', 'Yên Trung']},
+    ('Huyện', 'Thanh Oai'): {'Thị trấn': ['Kim Bài']},
+    ('Huyện', 'Thường Tín'): {'Thị trấn': ['Thường Tín']},
+    ('Huyện', 'Ứng Hòa'): {'Thị trấn': ['Vân Đình']},
+}
+
+# Các cách viết tiền tố (đã bỏ dấu, chữ thường)
+DISTRICT_PREFIXES = {
+    'Quận': ['quan', 'q'],
+    'Huyện': ['huyen', 'h'],
+    'Thị xã': ['thi xa', 'tx'],
+}
+WARD_PREFIXES = {
+    'Phường': ['phuong', 'p'],
+    'Xã': ['xa'],
+    'Thị trấn': ['thi tran', 'tt'],
+}
+
+RESOLVED_COLUMNS = ['ward', 'district', 'ward_id', 'district_id']
+# Cột thêm vào dữ liệu đã làm sạch (district đã có sẵn)
+LOCATION_COLUMNS = ['ward', 'ward_id', 'district_id']
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+# Dấu thanh / dấu mũ sau khi tách NFD
+_COMBINING = re.compile('[\u0300-\u036f]+')
+
+
+def fold(text):
+    """Bỏ dấu, chữ thường, bỏ dấu câu: 'P. Dịch Vọng Hậu' -> 'p dich vong hau'"""
+    text = unicodedata.normalize('NFD', str(text).lower().replace('đ', 'd'))
+    return _NON_WORD.sub(' ', _COMBINING.sub('', text)).strip()
+
+
+def slug(name):
+    return fold(name).replace(' ', '-')
+
+
+def _variants(name):
+    """'Mỹ Đình 1' cũng được viết 'Mỹ Đình I'; 'Thụy'/'Thuỵ' giống nhau sau khi bỏ dấu"""
+    folded = fold(name)
+    variants = {folded}
+    for digit, roman in (('1', 'i'), ('2', 'ii')):
+        if folded.endswith(' ' + digit):
+            variants.add(folded[:-len(digit)] + roman)
+    return variants
+
+
+class Gazetteer:
+    """Trie theo từ của mọi cách viết tên quận/huyện và phường/xã"""
+
+    # Loại khớp: quận có tiền tố, quận không tiền tố, phường (luôn có tiền tố)
+    DISTRICT, BARE_DISTRICT, WARD = 'district', 'bare_district', 'ward'
+
+    def __init__(self, districts=DISTRICTS):
+        self.districts = {}  # district_id -> tên đầy đủ ('Quận Cầu Giấy')
+        self.wards = {}      # ward_id -> (tên đầy đủ, district_id)
+        self.trie = {}
+        for (district_kind, district_name), units in districts.items():
+            district_id = slug(district_name)
+            self.districts[district_id] = f"{district_kind} {district_name}"
+            for variant in _variants(district_name):
+                self._add(variant, self.BARE_DISTRICT, district_id)
+                for prefix in DISTRICT_PREFIXES[district_kind]:
+                    self._add(f"{prefix} {variant}", self.DISTRICT, district_id)
+            for ward_kind, names in units.items():
+                for ward_name in names:
+                    ward_id = f"{district_id}/{slug(ward_name)}"
+                    self.wards[ward_id] = (f"{ward_kind} {ward_name}", district_id)
+                    for variant in _variants(ward_name):
+                        for prefix in WARD_PREFIXES[ward_kind]:
+                            self._add(f"{prefix} {variant}", self.WARD, ward_id)
+
+    def _add(self, key, kind, entity_id):
+        node = self.trie
+        for token in key.split():
+            node = node.setdefault(token, {})
+        # Một cách viết có thể ứng với nhiều nơi (phường cùng tên ở nhiều quận)
+        node.setdefault(None, {}).setdefault(kind, set()).add(entity_id)
+
+    def scan(self, address):
+        """
+        Quét địa chỉ một lần, khớp dài nhất từ trái sang phải
+
+        Returns:
+            [(loại, {id})] theo thứ tự xuất hiện
+        """
+        tokens = fold(address).split()
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node = self.trie
+            found, end = None, i
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if None in node:
+                    found, end = node[None], j + 1
+            if found is None:
+                i += 1
+                continue
+            for kind, ids in found.items():
+                matches.append((kind, ids))
+            i = end
+        return matches
+
+    def resolve(self, address):
+        """
+        Returns:
+            (ward_id, district_id) - None nếu không xác định được
+        """
+        if address is None or (isinstance(address, float) and np.isnan(address)):
+            return None, None
+        prefixed, bare, ward_candidates = [], [], []
+        for kind, ids in self.scan(address):
+            if kind == self.DISTRICT:
+                prefixed.append(ids)
+            elif kind == self.BARE_DISTRICT:
+                bare.append(ids)
+            else:
+                ward_candidates.append(ids)
+
+        # Địa chỉ viết từ nhỏ tới lớn: lấy quận có tiền tố cuối cùng, không có thì tên quận trần cuối cùng
+        district_id = None
+        for group in (prefixed, bare):
+            if group and len(group[-1]) == 1:
+                district_id = next(iter(group[-1]))
+                break
+
+        ward_id = None
+        for ids in reversed(ward_candidates):
+            if district_id is not None:
+                in_district = [w for w in ids if self.wards[w][1] == district_id]
+                if in_district:
+                    ward_id = in_district[0]
+                    break
+            elif len(ids) == 1:
+                ward_id = next(iter(ids))
+                district_id = self.wards[ward_id][1]
+                break
+        return ward_id, district_id
+
+    def district_of(self, address):
+        """Tên đầy đủ của quận/huyện ('Quận Cầu Giấy'), None nếu không xác định được"""
+        district_id = self.resolve(address)[1]
+        return self.districts[district_id] if district_id is not None else None
+
+    def resolve_column(self, addresses):
+        """
+        Xác định phường / quận cho cả cột địa chỉ
+
+        Returns:
+            DataFrame các cột RESOLVED_COLUMNS (kiểu category, danh mục cố định theo gazetteer)
+            cùng index với addresses
+        """
+        addresses = pd.Series(addresses)
+        codes, uniques = pd.factorize(addresses)
+        ward_ids, district_ids = [], []
+        for address in uniques:
+            ward_id, district_id = self.resolve(address)
+            ward_ids.append(ward_id)
+            district_ids.append(district_id)
+
+        ward_cat = pd.CategoricalDtype(sorted(self.wards))
+        district_cat = pd.CategoricalDtype(sorted(self.districts))
+        ward_codes = pd.Categorical(ward_ids + [None], dtype=ward_cat).codes[codes]
+        district_codes = pd.Categorical(district_ids + [None], dtype=district_cat).codes[codes]
+
+        # Tên phường có thể trùng giữa các quận ('Phường Quang Trung') nên cột tên có danh mục riêng
+        ward_names = pd.CategoricalDtype(sorted({name for name, _ in self.wards.values()}))
+        name_codes = pd.Categorical([self.wards[w][0] for w in ward_cat.categories], dtype=ward_names).codes
+        ward_name_codes = np.where(ward_codes >= 0, name_codes[ward_codes], -1)
+
+        return pd.DataFrame({
+            'ward': pd.Categorical.from_codes(ward_name_codes, dtype=ward_names),
+            'district': pd.Categorical.from_codes(district_codes, categories=[
+                self.districts[d] for d in district_cat.categories]),
+            'ward_id': pd.Categorical.from_codes(ward_codes, dtype=ward_cat),
+            'district_id': pd.Categorical.from_codes(district_codes, dtype=district_cat),
+        }, index=addresses.index)
+
+
+_DEFAULT = None
+
+
+def default_gazetteer():
+    """Gazetteer dùng chung (biên dịch một lần mỗi process)"""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = Gazetteer()
+    return _DEFAULT
+
+
+def resolve(address):
+    return default_gazetteer().resolve(address)
+
+
+def district_of(address):
+    return default_gazetteer().district_of(address)
+
+
+def resolve_column(addresses):
+    return default_gazetteer().resolve_column(addresses)
+
+
+def add_location_columns(df):
+    """
+    Thêm ward, ward_id, district_id theo cột address; district được thay bằng tên chuẩn khi xác định được
+
+    Cột đã có (vd đọc lại từ file _cleaned.csv) được giữ nguyên, không quét lại.
+
+    Returns:
+        DataFrame mới (df không bị sửa)
+    """
+    if all(name in df.columns for name in LOCATION_COLUMNS):
+        return df
+    resolved = resolve_column(df['address'])
+    columns = {name: resolved[name] for name in LOCATION_COLUMNS if name not in df.columns}
+    district = resolved['district'].astype(object)
+    if 'district' in df.columns:
+        district = district.where(district.notna(), df['district'])
+    columns['district'] = district
+    return df.assign(**columns)
@@ -0,0 +1,202 @@
+"""
+HTTP Fetcher - Lấy HTML qua HTTP thuần, không cần mở browser
+
+Mogi.vn không có Cloudflare và render HTML phía server, nên phần lớn trang danh sách
+và trang chi tiết có thể lấy trực tiếp bằng requests với kết nối keep-alive dùng lại.
+Nếu HTML tĩnh (response 200) thiếu các class mà parser cần thì scraper quay lại dùng Playwright cho URL đó;
+404/429/5xx hay lỗi mạng thì raise requests.HTTPError - mở browser cũng không giúp được, và rate limiter
+đã ghi nhận status để tự giảm tốc trước lần thử lại.
+"""
+
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from browser_pool import DEFAULT_CONTEXT_OPTIONS
+
+
+# Các class mà parse_listing_page / parse_detail_page cần có trong HTML
+MOGI_LISTING_MARKUP = ['link-overlay']
+MOGI_DETAIL_MARKUP = ['price', 'info-attr']
+
+
+def _class_pattern(class_name):
+    """Regex tìm class_name là một token trong thuộc tính class="..." """
+    return re.compile(
+        r'class\s*=\s*["\'][^"\']*(?<![\w-])' + re.escape(class_name) + r'(?![\w-])',
+        re.I,
+    )
+
+
+_CLASS_PATTERNS = {}
+
+
+def has_markup(html, class_names):
+    """
+    Kiểm tra nhanh HTML có chứa đủ các class cần thiết hay không.
+
+    Dùng regex thay vì dựng cây DOM để việc kiểm tra gần như không tốn chi phí.
+    """
+    if not html:
+        return False
+    for name in class_names:
+        pattern = _CLASS_PATTERNS.get(name)
+        if pattern is None:
+            pattern = _CLASS_PATTERNS[name] = _class_pattern(name)
+        if not pattern.search(html):
+            return False
+    return True
+
+
+class HttpFetcher:
+    """
+    Lấy HTML qua một requests.Session dùng chung.
+
+    Session giữ kết nối HTTP/1.1 keep-alive trong connection pool nên các request
+    liên tiếp tới cùng host không phải bắt tay TCP/TLS lại.
+    """
+
+    def __init__(self, pool_size=10, timeout=30, max_retries=2, headers=None, rate_limiter=None):
+        """
+        Args:
+            pool_size: Số kết nối giữ sẵn cho mỗi host (nên >= số worker song song)
+            timeout: Timeout (giây) cho mỗi request
+            max_retries: Số lần thử lại khi không kết nối được
+            headers: Header bổ sung
+            rate_limiter: AdaptiveRateLimiter dùng chung (None = không điều tiết)
+        """
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': DEFAULT_CONTEXT_OPTIONS['user_agent'],
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'vi-VN,vi;q=0.9,en;q=0.8',
+            'Connection': 'keep-alive',
+        })
+        if headers:
+            self.session.headers.update(headers)
+
+        # Chỉ thử lại lỗi kết nối; timeout/429/5xx để rate limiter thấy và tự giảm tốc
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset(['GET']),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'bytes': 0, 'fallbacks': 0, 'not_modified': 0}
+
+    def fetch(self, url):
+        """
+        GET một URL.
+
+        Returns:
+            (status, html) - status là None nếu lỗi mạng; html là None nếu không phải 200
+        """
+        status, html, _ = self._get(url)
+        return status, html
+
+    def _get(self, url, headers=None):
+        """GET -> (status, html, response); response None nếu lỗi mạng"""
+        self.stats['requests'] += 1
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.stats['errors'] += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.record(url, error=e)
+            print(f"  ⚠️  HTTP lỗi: {url}: {e}")
+            return None, None, None
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.record(url, latency=time.perf_counter() - start, status=response.status_code,
+                                     retry_after=response.headers.get('Retry-After'))
+
+        self.stats['bytes'] += len(response.content)
+        if response.status_code == 304:
+            self.stats['not_modified'] += 1
+            return 304, None, response
+        if response.status_code != 200:
+            self.stats['errors'] += 1
+            return response.status_code, None, response
+
+        # requests mặc định ISO-8859-1 khi header thiếu charset - mogi.vn luôn là UTF-8
+        if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = 'utf-8'
+
+        self.stats['ok'] += 1
+        return response.status_code, response.text, response
+
+    def _check_status(self, url, status):
+        """Response không phải 200 (hoặc lỗi mạng) -> requests.HTTPError, không fallback sang Playwright"""
+        if status != 200:
+            raise requests.HTTPError(f"HTTP {status if status is not None else 'lỗi mạng'}: {url}")
+
+    def fetch_with_markup(self, url, class_names):
+        """
+        Lấy HTML và kiểm tra có đủ class cần thiết.
+
+        Returns:
+            html nếu dùng được, None nếu response 200 thiếu class (cần fallback sang Playwright)
+
+        Raises:
+            requests.HTTPError: Response 4xx/5xx hoặc lỗi mạng
+        """
+        status, html = self.fetch(url)
+        self._check_status(url, status)
+        if has_markup(html, class_names):
+            return html
+        self.stats['fallbacks'] += 1
+        return None
+
+    def fetch_conditional(self, url, class_names, known=None):
+        """
+        GET có điều kiện (If-None-Match / If-Modified-Since) cho bài đã crawl trước đó
+
+        Args:
+            known: dict etag / last_modified của lần lấy trước (UrlFrontier.fetch_info)
+
+        Returns:
+            (status, html, validators) - status 304 nghĩa là trang không đổi;
+            html None (status 200) nếu thiếu class, cần fallback sang Playwright;
+            validators là {'etag', 'last_modified'} của response mới
+
+        Raises:
+            requests.HTTPError: Response 4xx/5xx hoặc lỗi mạng
+        """
+        headers = {}
+        if known and known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known and known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+
+        status, html, response = self._get(url, headers)
+        if status == 304:
+            return status, None, None
+        self._check_status(url, status)
+        validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        if not has_markup(html, class_names):
+            self.stats['fallbacks'] += 1
+            return status, None, validators
+        return status, html, validators
+
+    def close(self):
+        self.session.close()
+
+    def print_stats(self):
+        """In thống kê fetch HTTP"""
+        print(f"📡 HTTP fetcher: {self.stats['ok']}/{self.stats['requests']} thành công, "
+              f"{self.stats['errors']} lỗi, {self.stats['not_modified']} không đổi (304), "
+              f"{self.stats['fallbacks']} lần fallback Playwright, "
+              f"{self.stats['bytes'] / (1024 * 1024):.1f} MB")
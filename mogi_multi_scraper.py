@@ -5,15 +5,73 @@ Mogi.vn Multi-Category Scraper - Tránh trùng lặp bằng cách crawl nhiều
 """
 
 import time
-import random
 import re
+import asyncio
+import argparse
+import functools
 from datetime import datetime
-from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import csv
+import parse_engine
+from browser_pool import BrowserPool, AsyncBrowserPool
+from request_policy import RequestRouter
+from page_readiness import PROFILES, ReadinessTracker, wait_until_ready, async_wait_until_ready
+from rate_limiter import AdaptiveRateLimiter
+from url_frontier import UrlFrontier, listing_id, html_fingerprint, record_fingerprint
+from checkpoint import CrawlCheckpoint
+from http_fetcher import HttpFetcher, MOGI_LISTING_MARKUP, MOGI_DETAIL_MARKUP
+from record_sink import RecordSink, FIELDNAMES
+from snapshot_cache import SnapshotCache
+from crawl_pipeline import CrawlPipeline, PipelineMetrics, make_parse_executor
+from crawl_metrics import CrawlMetrics
+from hanoi_gazetteer import district_of
+
+_PARSERS = {}
+
+
+def _iso_date(posted_date):
+    """Ngày đăng dd/mm/yyyy -> ISO (để so sánh với high-water mark), None nếu không đọc được"""
+    try:
+        return datetime.strptime(posted_date or '', '%d/%m/%Y').date().isoformat()
+    except ValueError:
+        return None
+
+
+def parse_detail_html(html_content, url, parser='lxml'):
+    """
+    Parse trang chi tiết trong process con của pipeline
+
+    Hàm cấp module để pickle được; mỗi process giữ một scraper (chỉ dùng để parse) cho mỗi loại parser.
+    """
+    scraper = _PARSERS.get(parser)
+    if scraper is None:
+        scraper = _PARSERS[parser] = MogiMultiCategoryScraper(parser=parser)
+    return scraper.parse_detail_page(html_content, url)
+
+
+class _DetailFetcher:
+    """Fetcher của một worker fetch trong pipeline: giữ tab riêng, chỉ mở khi cần fallback Playwright"""
+    
+    def __init__(self, scraper, pool):
+        self.scraper = scraper
+        self.pool = pool
+        self.page = None
+    
+    async def fetch(self, url):
+        """HTML trang chi tiết, None nếu bài crawl lại không đổi (pipeline bỏ qua bước parse)"""
+        html, self.page = await self.scraper._fetch_detail_async(self.pool, self.page, url)
+        return html
+    
+    async def close(self):
+        if self.page is not None:
+            await self.pool.release(self.page)
+            self.page = None
+
 
 class MogiMultiCategoryScraper:
-    def __init__(self):
+    def __init__(self, concurrency=4, browser_pool=None, headless=True, http_fetcher=None, rate_limiter=None,
+                 frontier=None, checkpoint=None, sink=None, parser='lxml', parse_processes=None, sort_query=None,
+                 required_fields=None, snapshots=None, metrics=None):
         self.base_url = "https://mogi.vn"
         
         # CHIẾN LƯỢC: Crawl nhiều loại hình BĐS khác nhau
@@ -27,13 +85,57 @@ class MogiMultiCategoryScraper:
         ]
         
         self.data = []
+        # Có sink thì mỗi bản ghi được ghi nối ra file ngay, không giữ trong self.data
+        self.sink = sink
+        self.record_count = 0
+        # 'lxml': parse_engine (XPath biên dịch sẵn); 'html.parser': BeautifulSoup như trước
+        self.parser = parser
         self.seen_urls = set()  # Track URLs đã crawl để tránh trùng
+        # Frontier SQLite nhớ các bài đã crawl ở những lần chạy trước (None = chỉ nhớ trong lần chạy này)
+        self.frontier = frontier
+        self.skipped_known = 0  # Số bài trên trang danh sách gần nhất bị bỏ qua vì đã crawl lần trước
+        # Chế độ tăng dần: query sắp xếp tin mới nhất trước (vd 'sort=...'), None = thứ tự mặc định của site
+        self.sort_query = sort_query
+        self.page_listing_ids = []  # ID (-id123) của mọi bài trên trang danh sách gần nhất, kể cả bài đã thấy
+        self._run_mark = [None, None]  # ID lớn nhất / ngày đăng mới nhất gặp trong danh mục đang crawl
+        # Chỉ đọc thẻ trên trang danh sách; mở trang chi tiết khi thẻ thiếu một trong các trường này
+        # (None = luôn mở trang chi tiết như trước)
+        self.required_fields = required_fields
+        self.card_records = 0  # Số bài lấy thẳng từ thẻ, không mở trang chi tiết
+        self._cards = {}  # URL -> bản ghi từ thẻ của bài đang chờ trang chi tiết (bổ sung trường thiếu)
+        # Crawl lại bài đã có: hỏi server có điều kiện, bài không đổi thì không parse / ghi lại
+        self.unchanged_count = 0
+        self._fetched = {}  # URL -> (hash HTML, ETag/Last-Modified) chờ lưu vào frontier sau khi parse
+        self._unsaved = []  # (URL, fingerprint, hash HTML, validators) của bài đã ghi ra nhưng chưa bền vững
+        # URL chờ từ checkpoint: dòng của chúng có thể đã bị cắt khỏi file kết quả nên luôn lấy lại và ghi ra
+        self._resumed = set()
+        # SnapshotCache lưu HTML mọi trang đã lấy để parse lại offline (None = không lưu)
+        self.snapshots = snapshots
+        # Checkpoint định kỳ để chạy tiếp (--resume) nếu process bị dừng giữa chừng
+        self.checkpoint = checkpoint
+        self.categories_done = []
+        # Trang danh sách (danh mục, số trang) / URL chi tiết bị lỗi - crawl_coordinator.py dùng để trả lại việc
+        self.failed_pages = []
+        self.failed_urls = []
+        self.concurrency = concurrency  # Số tab crawl chi tiết song song (chế độ async)
+        # Số process parse trong pipeline async (None = mọi core, 0 = parse ngay trong event loop)
+        self.parse_processes = parse_processes
+        self.pipeline_metrics = PipelineMetrics()
+        # Thời gian từng bước (điều hướng, đợi sẵn sàng, page.content(), parse, ghi), lỗi, trường rỗng
+        self.metrics = metrics or CrawlMetrics('mogi')
+        self.headless = headless
+        # Browser pool dùng chung cho mọi danh mục - chỉ launch một lần
+        self.browser_pool = browser_pool
+        self._page = None
+        # Có http_fetcher thì lấy HTML qua HTTP trước, chỉ dùng browser khi thiếu dữ liệu
+        self.http_fetcher = http_fetcher
+        # Thời gian trang thực sự sẵn sàng (thay cho time.sleep cố định)
+        self.readiness = ReadinessTracker()
+        # Một limiter cho mọi worker: tốc độ theo phản hồi của server, không phải delay ngẫu nhiên
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        if self.http_fetcher is not None and self.http_fetcher.rate_limiter is None:
+            self.http_fetcher.rate_limiter = self.rate_limiter
         
-    def random_delay(self, min_seconds=2, max_seconds=4):
-        delay = random.uniform(min_seconds, max_seconds)
-        print(f"⏳ Đợi {delay:.2f} giây...")
-        time.sleep(delay)
-    
     def clean_text(self, text):
         if not text:
             return None
@@ -51,29 +153,181 @@ class MogiMultiCategoryScraper:
         area_text = self.clean_text(area_text)
         return area_text
     
-    def parse_listing_page(self, html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
+    def parse_listing_page(self, html_content, category=None):
         links = []
-        link_elements = soup.select('a.link-overlay')
-        
-        for elem in link_elements:
-            href = elem.get('href', '')
-            if href:
-                if href.startswith('/'):
-                    full_url = self.base_url + href
-                elif href.startswith('http'):
-                    full_url = href
-                else:
-                    continue
-                
-                # Chỉ lấy URLs hợp lệ và chưa crawl
-                if re.search(r'-id\d+$', full_url) and full_url not in self.seen_urls:
+        self.page_listing_ids = []
+        if self.parser == 'lxml':
+            hrefs = parse_engine.mogi_listing_hrefs(html_content)
+        else:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            hrefs = [elem.get('href', '') for elem in soup.select('a.link-overlay')]
+        
+        for href in hrefs:
+            full_url = self._full_url(href)
+            # Chỉ lấy URLs hợp lệ và chưa crawl
+            if full_url and re.search(r'-id\d+$', full_url):
+                self.page_listing_ids.append(listing_id(full_url))
+                if full_url not in self.seen_urls:
                     links.append(full_url)
                     self.seen_urls.add(full_url)  # Đánh dấu đã thấy
         
+        if self.page_listing_ids:
+            self._run_mark[0] = max(self.page_listing_ids + [self._run_mark[0] or 0])
+        
+        # Bỏ các bài đã crawl ở lần chạy trước
+        self.skipped_known = 0
+        if self.frontier is not None and links:
+            new_links = self.frontier.filter_new(links, category)
+            self.skipped_known = len(links) - len(new_links)
+            links = new_links
+        
         return links
     
+    def _full_url(self, href):
+        """URL tuyệt đối của href trên trang danh sách, None nếu không phải link bài"""
+        if not href:
+            return None
+        if href.startswith('/'):
+            return self.base_url + href
+        if href.startswith('http'):
+            return href
+        return None
+    
+    def parse_listing_cards(self, html_content):
+        """
+        Đọc thông tin hiển thị trên các thẻ bài của trang danh sách (giá, diện tích, địa chỉ, số phòng, ngày đăng)
+        
+        Returns:
+            dict URL chi tiết -> bản ghi (chưa có mô tả, loại hình)
+        """
+        if self.parser == 'lxml':
+            cards = parse_engine.mogi_listing_cards(html_content)
+        else:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            cards = []
+            for link in soup.select('a.link-overlay'):
+                parent = link.parent
+                price = parent.select_one('.price')
+                address = parent.select_one('.prop-addr')
+                created = parent.select_one('.prop-created')
+                cards.append({
+                    'href': link.get('href', ''),
+                    'price': price.get_text() if price else None,
+                    'address': address.get_text() if address else None,
+                    'attrs': [li.get_text() for li in parent.select('.prop-attr li')],
+                    'created': created.get_text() if created else None,
+                })
+        
+        records = {}
+        for card in cards:
+            full_url = self._full_url(card['href'])
+            if full_url and full_url not in records:
+                records[full_url] = parse_engine.mogi_card_record(full_url, card, self)
+        return records
+    
+    def _emit_cards(self, html_content, links):
+        """
+        Chế độ chỉ đọc thẻ: ghi luôn các bài có đủ required_fields trên thẻ
+        
+        Returns:
+            Các URL vẫn cần mở trang chi tiết
+        """
+        cards = self.parse_listing_cards(html_content)
+        need_detail = []
+        for url in links:
+            card = cards.get(url)
+            if card is not None and all(card.get(field) for field in self.required_fields):
+                self.card_records += 1
+                with self.metrics.timed('persist'):
+                    if self._record_changed(card, 'card'):
+                        self._emit(card)
+            else:
+                if card is not None:
+                    self._cards[url] = card
+                need_detail.append(url)
+        print(f"🃏 {len(links) - len(need_detail)} bài lấy từ thẻ danh sách, {len(need_detail)} bài cần mở trang chi tiết")
+        return need_detail
+    
+    def _with_card(self, property_data):
+        """Bổ sung trường trang chi tiết không có bằng thông tin trên thẻ (nếu bài đã đọc thẻ)"""
+        card = self._cards.pop(property_data['url'], None)
+        if card is not None:
+            for field, value in card.items():
+                if property_data.get(field) is None:
+                    property_data[field] = value
+        return property_data
+    
+    def _no_new_links(self):
+        """
+        Xử lý trang danh sách không có bài nào cần crawl.
+        
+        Returns:
+            True nếu nên dừng danh mục (trang thật sự hết bài mới),
+            False nếu chỉ là các bài đã crawl ở lần trước (sang trang tiếp)
+        """
+        if self.skipped_known:
+            print(f"⏭️  {self.skipped_known} bài đã crawl ở lần trước, sang trang tiếp")
+            return False
+        print("⚠️  Không có bài mới")
+        return True
+    
+    def _listing_url(self, category_url, page_num):
+        """URL trang danh sách thứ page_num (kèm query sắp xếp nếu có)"""
+        params = [] if page_num == 1 else [f"page={page_num}"]
+        if self.sort_query:
+            params.append(self.sort_query)
+        url = self.base_url + category_url
+        return f"{url}?{'&'.join(params)}" if params else url
+    
+    def _start_incremental(self, category_url, incremental):
+        """
+        Chuẩn bị crawl tăng dần cho danh mục
+        
+        Returns:
+            ((ID, ngày đăng ISO) của high-water mark hoặc None nếu crawl toàn bộ,
+             URL còn dở trong frontier cần lấy lại)
+        """
+        self._run_mark = [None, None]
+        if not incremental:
+            return None, []
+        mark_id, mark_date = self.frontier.high_water_mark(category_url)
+        if mark_id is None:
+            print("🆕 Danh mục chưa có high-water mark - crawl toàn bộ lần đầu")
+            return None, []
+        retry = [url for url in self.frontier.pending(category_url) if url not in self.seen_urls]
+        self.seen_urls.update(retry)
+        print(f"⏩ Crawl tăng dần: dừng khi gặp trang toàn bài ID <= {mark_id} và đăng trước {mark_date}")
+        return (mark_id, mark_date), retry
+    
+    def _reached_high_water_mark(self, mark, html_content, page_num):
+        """
+        Trang danh sách vừa parse chỉ toàn bài cũ thì dừng danh mục: mọi ID <= high-water mark
+        và (nếu mark có ngày đăng) mọi thẻ có ngày đăng trước ngày đó - tin VIP/ghim cũ ở đầu trang
+        hay bài bị đẩy lại không làm dừng sớm
+        """
+        if mark is None or not self.page_listing_ids:
+            return False
+        mark_id, mark_date = mark
+        if max(self.page_listing_ids) > mark_id:
+            return False
+        if mark_date is not None:
+            # Thẻ không đọc được ngày đăng thì coi như chưa chắc cũ
+            dates = [_iso_date(card.get('posted_date')) for card in self.parse_listing_cards(html_content).values()]
+            if not dates or any(posted is None or posted >= mark_date for posted in dates):
+                return False
+        print(f"🛑 Trang {page_num} chỉ có bài đã crawl (ID <= {mark_id}, đăng trước {mark_date}) - dừng danh mục")
+        return True
+    
+    def _finish_incremental(self, category_url):
+        """Ghi high-water mark mới sau khi danh mục xong (bị dừng giữa chừng thì mark không đổi)"""
+        if self.frontier is None:
+            return
+        self.frontier.update_high_water_mark(category_url, *self._run_mark)
+    
     def parse_detail_page(self, html_content, url):
+        if self.parser == 'lxml':
+            return parse_engine.parse_mogi_detail(html_content, url, self)
+        
         soup = BeautifulSoup(html_content, 'html.parser')
         
         property_data = {
@@ -100,13 +354,8 @@ class MogiMultiCategoryScraper:
             address_text = self.clean_text(address_elem.get_text())
             property_data['address'] = address_text
             
-            # Trích xuất quận
-            parts = address_text.split(',')
-            for part in parts:
-                part = part.strip()
-                if 'quận' in part.lower() or 'huyện' in part.lower():
-                    property_data['district'] = part
-                    break
+            # Trích xuất quận (cả "Q. Cầu Giấy", "Thị xã Sơn Tây", địa chỉ không dấu)
+            property_data['district'] = district_of(address_text)
         
         # Thông tin từ info-attr
         info_attrs = soup.select('.info-attr')
@@ -141,78 +390,638 @@ class MogiMultiCategoryScraper:
         
         return property_data
     
-    def scrape_category(self, category_url, max_pages=5, max_items_per_page=20):
-        """Crawl một danh mục cụ thể"""
+    def fetch_with_browser(self, url, profile):
+        """Render URL bằng Playwright (browser chỉ được mở khi cần) và trả về HTML"""
+        if self.browser_pool is None:
+            self.browser_pool = BrowserPool(headless=self.headless, request_router=RequestRouter())
+        if self._page is None:
+            self._page = self.browser_pool.acquire()
+        self._page = self.browser_pool.checkout(self._page)
+        
+        page = self._page
+        
+        self.rate_limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            with self.metrics.timed('navigation'):
+                response = page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        except Exception as e:
+            self.rate_limiter.record(url, error=e)
+            raise
+        self.rate_limiter.record(url, latency=time.perf_counter() - start,
+                                 status=response.status if response else None)
+        
+        with self.metrics.timed('readiness'):
+            wait_until_ready(page, profile, self.readiness)
+        with self.metrics.timed('content'):
+            return page.content()
+    
+    def fetch_html(self, url, required_markup, profile):
+        """
+        Lấy HTML qua HTTP trước, fallback Playwright khi HTML tĩnh (200) thiếu required_markup
+        (404/429/5xx, lỗi mạng: http_fetcher raise, bài / trang được tính là lỗi thay vì mở browser)
+        """
+        html = None
+        if self.http_fetcher is not None:
+            with self.metrics.timed('http'):
+                html = self.http_fetcher.fetch_with_markup(url, required_markup)
+            if html is None:
+                print("  ↩️  HTML tĩnh thiếu dữ liệu, chuyển sang Playwright")
+        if html is None:
+            html = self.fetch_with_browser(url, profile)
+        return self._snapshot(url, html, required_markup)
+    
+    def _snapshot(self, url, html, required_markup):
+        """Lưu HTML vừa lấy vào snapshot cache (nếu có), trả lại chính html"""
+        if self.snapshots is not None:
+            kind = 'mogi_detail' if required_markup is MOGI_DETAIL_MARKUP else 'mogi_listing'
+            self.snapshots.put(url, html, kind)
+        return html
+    
+    def _fetch_detail(self, url):
+        """
+        Lấy HTML trang chi tiết; với bài đã crawl trước đó thì gửi request có điều kiện (ETag/Last-Modified)
+        (lấy qua HTTP thì luôn giữ lại ETag/Last-Modified của response cho lần crawl lại sau)
+        
+        Returns:
+            HTML, hoặc None nếu trang không đổi so với lần trước (không cần parse lại)
+        """
+        known = self._fetch_info(url)
+        if self.http_fetcher is None:
+            return self._check_unchanged(url, self.fetch_html(url, MOGI_DETAIL_MARKUP, PROFILES['mogi_detail']), known)
+        
+        with self.metrics.timed('http'):
+            status, html, validators = self.http_fetcher.fetch_conditional(url, MOGI_DETAIL_MARKUP, known)
+        if status == 304:
+            return self._unchanged(url)
+        if html is None:
+            print("  ↩️  HTML tĩnh thiếu dữ liệu, chuyển sang Playwright")
+            html = self.fetch_with_browser(url, PROFILES['mogi_detail'])
+        self._snapshot(url, html, MOGI_DETAIL_MARKUP)
+        return self._check_unchanged(url, html, known, validators)
+    
+    def _fetch_info(self, url):
+        """Thông tin lần lấy trước trong frontier (None nếu không có frontier hoặc URL chờ từ checkpoint)"""
+        if self.frontier is None or url in self._resumed:
+            return None
+        return self.frontier.fetch_info(url)
+    
+    def _check_unchanged(self, url, html, known, validators=None):
+        """So hash HTML với lần lấy trước; giữ lại hash + validators để lưu vào frontier sau khi parse"""
+        if self.frontier is None:
+            return html
+        html_hash = html_fingerprint(html)
+        if known is not None and known['html_hash'] == html_hash:
+            return self._unchanged(url)
+        self._fetched[url] = (html_hash, validators)
+        return html
+    
+    def _unchanged(self, url):
+        """Bài crawl lại không đổi: chỉ cập nhật frontier, không parse và không ghi ra"""
+        self.unchanged_count += 1
+        self.metrics.unchanged('detail')
+        self._cards.pop(url, None)
+        self.frontier.mark_unchanged(url)
+        print("  ⏸️  Không đổi từ lần crawl trước")
+        return None
+    
+    def _record_changed(self, property_data, kind='detail'):
+        """
+        So fingerprint của bản ghi với lần crawl trước trong frontier
+        
+        Bài mới / đã đổi chưa được đánh dấu fetched ngay: frontier chỉ được cập nhật sau khi bản ghi
+        đã ghi bền vững (xem _commit_frontier), để bài bị mất do process dừng vẫn được crawl lại.
+        
+        Args:
+            kind: Loại trang của bản ghi ('detail' / 'card') - dùng trong metrics
+        
+        Returns:
+            True nếu là bài mới hoặc nội dung đã đổi (cần ghi ra), False nếu giống lần crawl trước
+        """
+        if self.frontier is None:
+            self.metrics.success(kind)
+            return True
+        url = property_data['url']
+        html_hash, validators = self._fetched.pop(url, (None, None))
+        fingerprint = record_fingerprint(property_data)
+        known = self._fetch_info(url)
+        if known is None or known['fingerprint'] != fingerprint:
+            self._unsaved.append((url, fingerprint, html_hash, validators))
+            self.metrics.success(kind)
+            return True
+        # Không ghi ra gì nên cập nhật frontier luôn
+        self.frontier.mark_fetched(url, fingerprint, html_hash, validators)
+        self.unchanged_count += 1
+        self.metrics.unchanged(kind)
+        print("  ⏸️  Nội dung không đổi từ lần crawl trước")
+        return False
+    
+    def _detail_failed(self, url, error):
+        """Bài chi tiết bị lỗi (lấy, parse hoặc ghi ra): bỏ trạng thái tạm, đánh dấu lỗi để lần sau thử lại"""
+        self.metrics.failure('detail', error)
+        self.failed_urls.append(url)
+        self._cards.pop(url, None)
+        self._fetched.pop(url, None)
+        # Bài đã qua _record_changed nhưng ghi ra lỗi thì không được đánh dấu fetched
+        self._unsaved = [entry for entry in self._unsaved if entry[0] != url]
+        if self.frontier is not None:
+            try:
+                self.frontier.mark_failed(url, error)
+            except Exception as e:
+                print(f"  ⚠️  Không ghi được lỗi vào frontier: {e}")
+        print(f"  ❌ Lỗi: {url}: {error}")
+    
+    def _commit_frontier(self):
+        """Đánh dấu fetched trong frontier các bài đã ghi ra bền vững (sau checkpoint / sink flush)"""
+        for url, fingerprint, html_hash, validators in self._unsaved:
+            self.frontier.mark_fetched(url, fingerprint, html_hash, validators)
+        self._unsaved = []
+    
+    def _emit(self, property_data):
+        """Ghi một bản ghi ra sink (hoặc giữ trong self.data nếu không có sink)"""
+        if self.sink is not None:
+            flushed = self.sink.write(property_data)
+        else:
+            self.data.append(property_data)
+            flushed = False
+        # Chỉ tính bản ghi đã ghi được (sink lỗi thì bài bị đánh dấu lỗi, không vào high-water mark)
+        self.record_count += 1
+        self.metrics.record_fields(property_data)
+        posted = _iso_date(property_data.get('posted_date'))
+        if posted is not None and (self._run_mark[1] is None or posted > self._run_mark[1]):
+            self._run_mark[1] = posted
+        # Có checkpoint thì --resume cắt file về offset của checkpoint: chỉ cập nhật frontier khi save_checkpoint.
+        # Không có thì bản ghi đã flush (hoặc đã nằm trong self.data của người gọi) là đủ
+        if self.checkpoint is None and (flushed or self.sink is None):
+            self._commit_frontier()
+    
+    def _scrape_details(self, detail_urls, category_url, next_page):
+        """
+        Crawl tuần tự các trang chi tiết, checkpoint định kỳ phần URL còn lại
+        
+        Returns:
+            Số bài lấy được
+        """
+        count = 0
+        for idx, detail_url in enumerate(detail_urls, 1):
+            print(f"  📌 [{idx}/{len(detail_urls)}] {detail_url}")
+            
+            try:
+                detail_html = self._fetch_detail(detail_url)
+                if detail_html is not None:
+                    with self.metrics.timed('parse'):
+                        property_data = self._with_card(self.parse_detail_page(detail_html, detail_url))
+                    with self.metrics.timed('persist'):
+                        changed = self._record_changed(property_data)
+                        if changed:
+                            self._emit(property_data)
+                    if changed:
+                        count += 1
+                        print(f"  ✅ {property_data['price']} - {property_data['area']}")
+                
+            except Exception as e:
+                self._detail_failed(detail_url, e)
+            
+            if self.checkpoint is not None and self.checkpoint.due():
+                self.save_checkpoint(category_url, next_page, detail_urls[idx:])
+        return count
+    
+    def scrape_category(self, category_url, max_pages=5, max_items_per_page=20, start_page=1, pending_urls=None,
+                        incremental=False):
+        """
+        Crawl một danh mục cụ thể
+        
+        Args:
+            start_page: Trang danh sách bắt đầu (khi chạy tiếp từ checkpoint)
+            pending_urls: URL chi tiết còn dở từ checkpoint, được crawl trước
+            incremental: Dừng ở trang đầu tiên chỉ toàn bài cũ hơn high-water mark (cần frontier)
+        
+        Returns:
+            Số bài lấy được trong danh mục
+        """
         print(f"\n{'='*60}")
         print(f"📂 Đang crawl danh mục: {category_url}")
         print(f"{'='*60}")
         
-        category_data = []
+        category_count = 0
+        self._resumed = set(pending_urls or [])
+        mark, retry_urls = self._start_incremental(category_url, incremental)
+        pending_urls = list(pending_urls or []) + retry_urls
         
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                locale='vi-VN',
-            )
-            page = context.new_page()
+        try:
+            if pending_urls:
+                print(f"\n♻️  Chạy tiếp {len(pending_urls)} bài còn dở")
+                category_count += self._scrape_details(list(pending_urls), category_url, start_page)
             
-            for page_num in range(1, max_pages + 1):
+            for page_num in range(start_page, max_pages + 1):
                 print(f"\n📄 Trang {page_num}/{max_pages}")
                 
-                if page_num == 1:
-                    url = self.base_url + category_url
-                else:
-                    url = f"{self.base_url}{category_url}?page={page_num}"
+                url = self._listing_url(category_url, page_num)
                 
                 try:
-                    page.goto(url, wait_until='domcontentloaded', timeout=30000)
-                    time.sleep(2)
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(1)
+                    html_content = self.fetch_html(url, MOGI_LISTING_MARKUP, PROFILES['mogi_listing'])
+                    with self.metrics.timed('parse'):
+                        listing_links = self.parse_listing_page(html_content, category_url)
+                    self.metrics.success('listing')
                     
-                    html_content = page.content()
-                    listing_links = self.parse_listing_page(html_content)
+                    if self._reached_high_water_mark(mark, html_content, page_num):
+                        break
                     
                     if not listing_links:
-                        print("⚠️  Không có bài mới")
+                        if self._no_new_links():
+                            break
+                        continue
+                    
+                    print(f"✅ Tìm thấy {len(listing_links)} bài MỚI (chưa crawl)")
+                    
+                    listing_links = listing_links[:max_items_per_page]
+                    if self.required_fields is not None:
+                        detail_links = self._emit_cards(html_content, listing_links)
+                        category_count += len(listing_links) - len(detail_links)
+                        listing_links = detail_links
+                    category_count += self._scrape_details(listing_links, category_url, page_num + 1)
+                    
+                except Exception as e:
+                    self.metrics.failure('listing', e)
+                    self.failed_pages.append((category_url, page_num))
+                    print(f"❌ Lỗi trang {page_num}: {e}")
+                
+                # Trang này xong - checkpoint để lần sau chạy tiếp từ trang kế
+                if self.checkpoint is not None:
+                    self.save_checkpoint(category_url, page_num + 1, [])
+        finally:
+            # Trả page sau mỗi danh mục, browser vẫn giữ cho danh mục sau
+            if self._page is not None:
+                self.browser_pool.release(self._page)
+                self._page = None
+        
+        self._finish_incremental(category_url)
+        self.categories_done.append(category_url)
+        if self.checkpoint is not None:
+            self.save_checkpoint(None, 1, [])
+        
+        print(f"\n✅ Danh mục này: {category_count} bài")
+        return category_count
+    
+    def save_checkpoint(self, category_url, next_page, pending_urls):
+        """
+        Ghi checkpoint vị trí crawl hiện tại
+        
+        Args:
+            category_url: Danh mục đang crawl (None nếu vừa xong một danh mục)
+            next_page: Trang danh sách sẽ crawl tiếp
+            pending_urls: URL chi tiết đã lấy từ trang danh sách nhưng chưa ghi ra kết quả
+        
+        Khi có sink, checkpoint chỉ ghi vị trí (offset) trong file kết quả thay vì ghi lại mọi bản ghi.
+        """
+        state = {
+            'categories_done': self.categories_done,
+            'category': category_url,
+            'next_page': next_page,
+            'pending_urls': list(pending_urls),
+            'seen_urls': sorted(self.seen_urls),
+            'record_count': self.record_count,
+        }
+        if self.sink is not None:
+            state['sink_path'] = self.sink.path
+            state['sink_offset'] = self.sink.offset()
+            self.checkpoint.save(state)
+        else:
+            self.checkpoint.save(state, self.data, FIELDNAMES)
+        # Mọi bản ghi đã ghi ra đều nằm trong checkpoint - giờ mới đánh dấu fetched trong frontier
+        self._commit_frontier()
+    
+    def load_checkpoint(self):
+        """
+        Khôi phục dữ liệu và vị trí crawl từ checkpoint
+        
+        Returns:
+            dict vị trí crawl hoặc None nếu không có checkpoint
+        """
+        if self.checkpoint is None:
+            return None
+        state, rows = self.checkpoint.load()
+        if state is None:
+            print("⚠️  Không có checkpoint - crawl từ đầu")
+            return None
+        
+        if self.sink is not None and state.get('sink_path'):
+            # Ghi tiếp vào file của lần chạy trước, bỏ các dòng ghi sau checkpoint (sẽ crawl lại)
+            self.sink.resume_at(state['sink_path'], state['sink_offset'], state['record_count'])
+        else:
+            # Checkpoint cũ lưu bản ghi trong file _rows.csv
+            for row in rows:
+                self._emit(row)
+        self.record_count = state.get('record_count', len(rows))
+        self.seen_urls = set(state['seen_urls'])
+        self.categories_done = list(state['categories_done'])
+        print(f"♻️  Chạy tiếp từ checkpoint {state['updated_at']}: {self.record_count} bài, "
+              f"{len(self.categories_done)} danh mục đã xong")
+        if self.sink is not None:
+            print(f"   - Ghi tiếp vào: {self.sink.path}")
+        if state['category']:
+            print(f"   - Danh mục dở: {state['category']} từ trang {state['next_page']}, "
+                  f"{len(state['pending_urls'])} bài chờ")
+        return state
+    
+    def _resume_args(self, category_url, state):
+        """Tham số start_page/pending_urls cho danh mục, dựa theo checkpoint"""
+        if state and state['category'] == category_url:
+            return {'start_page': state['next_page'], 'pending_urls': state['pending_urls']}
+        return {}
+    
+    def _check_incremental(self, incremental):
+        """
+        Chế độ tăng dần cần frontier để biết high-water mark, và cần trang danh sách xếp tin mới nhất trước
+        (thứ tự mặc định đưa tin VIP/ghim lên đầu nên dừng ở high-water mark sẽ bỏ sót bài mới)
+        """
+        if incremental and self.frontier is None:
+            print("⚠️  Crawl tăng dần cần frontier - crawl toàn bộ")
+            return False
+        if incremental and not self.sort_query:
+            print("⚠️  Crawl tăng dần cần sort_query sắp xếp tin mới nhất trước (NEWEST_FIRST_QUERY) - crawl toàn bộ")
+            return False
+        return incremental
+    
+    def scrape_all(self, max_pages=5, max_items_per_page=20, resume=False, incremental=False):
+        """Crawl lần lượt tất cả danh mục (tuần tự), có thể chạy tiếp từ checkpoint"""
+        state = self.load_checkpoint() if resume else None
+        incremental = self._check_incremental(incremental)
+        for category in self.categories:
+            if category in self.categories_done:
+                continue
+            self.scrape_category(category, max_pages=max_pages, max_items_per_page=max_items_per_page,
+                                 incremental=incremental, **self._resume_args(category, state))
+    
+    def close(self):
+        """Đóng sink, browser pool và HTTP session (gọi một lần sau khi crawl xong mọi danh mục)"""
+        if self.sink is not None:
+            self.sink.close()
+        self.readiness.print_stats()
+        self.rate_limiter.print_stats()
+        self.pipeline_metrics.print_stats()
+        self.metrics.print_stats()
+        self.metrics.close()
+        if self.required_fields is not None:
+            print(f"🃏 Chỉ đọc thẻ danh sách: {self.card_records} bài không cần mở trang chi tiết")
+        if self.unchanged_count:
+            print(f"⏸️  {self.unchanged_count} bài crawl lại không đổi - không ghi ra lần nữa")
+        if self.frontier is not None:
+            # Có checkpoint thì các bài ghi sau checkpoint cuối sẽ bị cắt khi --resume - để chúng được crawl lại
+            if self.checkpoint is None:
+                self._commit_frontier()
+            self.frontier.print_stats()
+            self.frontier.close()
+        if self.snapshots is not None:
+            self.snapshots.print_stats()
+            self.snapshots.close()
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+        if self.http_fetcher is not None:
+            self.http_fetcher.print_stats()
+            self.http_fetcher.close()
+    
+    async def _fetch_html_async(self, pool, page, url, required_markup, profile):
+        """
+        Phiên bản async của fetch_html cho các worker
+        
+        Returns:
+            (html, page) - page có thể được mở mới hoặc tạo lại trong pool
+        """
+        html = None
+        if self.http_fetcher is not None:
+            # requests là blocking nên chạy trong thread để không chặn event loop
+            with self.metrics.timed('http'):
+                html = await asyncio.to_thread(self.http_fetcher.fetch_with_markup, url, required_markup)
+            if html is None:
+                print("  ↩️  HTML tĩnh thiếu dữ liệu, chuyển sang Playwright")
+        if html is None:
+            html, page = await self._fetch_with_browser_async(pool, page, url, profile)
+        if self.snapshots is not None:
+            await asyncio.to_thread(self._snapshot, url, html, required_markup)
+        return html, page
+    
+    async def _fetch_with_browser_async(self, pool, page, url, profile):
+        """Render URL bằng một tab của pool (mở tab khi cần) -> (html, page)"""
+        if page is None:
+            page = await pool.acquire()
+        page = await pool.checkout(page)
+        
+        await self.rate_limiter.acquire_async(url)
+        start = time.perf_counter()
+        try:
+            with self.metrics.timed('navigation'):
+                response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        except Exception as e:
+            self.rate_limiter.record(url, error=e)
+            raise
+        self.rate_limiter.record(url, latency=time.perf_counter() - start,
+                                 status=response.status if response else None)
+        
+        with self.metrics.timed('readiness'):
+            await async_wait_until_ready(page, profile, self.readiness)
+        with self.metrics.timed('content'):
+            html = await page.content()
+        return html, page
+    
+    async def _fetch_detail_async(self, pool, page, url):
+        """
+        Phiên bản async của _fetch_detail
+        
+        Returns:
+            (html hoặc None nếu trang không đổi, page)
+        """
+        known = self._fetch_info(url)
+        if self.http_fetcher is None:
+            html, page = await self._fetch_html_async(pool, page, url, MOGI_DETAIL_MARKUP, PROFILES['mogi_detail'])
+            return self._check_unchanged(url, html, known), page
+        
+        with self.metrics.timed('http'):
+            status, html, validators = await asyncio.to_thread(self.http_fetcher.fetch_conditional, url,
+                                                               MOGI_DETAIL_MARKUP, known)
+        if status == 304:
+            return self._unchanged(url), page
+        if html is None:
+            print("  ↩️  HTML tĩnh thiếu dữ liệu, chuyển sang Playwright")
+            html, page = await self._fetch_with_browser_async(pool, page, url, PROFILES['mogi_detail'])
+        if self.snapshots is not None:
+            await asyncio.to_thread(self._snapshot, url, html, MOGI_DETAIL_MARKUP)
+        return self._check_unchanged(url, html, known, validators), page
+    
+    def _emit_ready(self, results, pending, next_seq):
+        """
+        Ghi các kết quả async theo đúng thứ tự seq, dừng ở bài đầu tiên chưa xong
+        
+        Returns:
+            seq tiếp theo cần ghi
+        """
+        while next_seq in results:
+            property_data = results.pop(next_seq)
+            pending.pop(next_seq, None)
+            next_seq += 1
+            if property_data is None:
+                continue
+            # So fingerprint ngay lúc ghi ra: bài còn nằm chờ thứ tự vẫn ở trong pending của checkpoint.
+            # Lỗi ghi một bài (sink, frontier) chỉ bỏ bài đó - các bài sau vẫn được ghi tiếp
+            try:
+                if self._record_changed(property_data):
+                    print(f"  ✅ {property_data['price']} - {property_data['area']}")
+                    self._emit(property_data)
+            except Exception as e:
+                self._detail_failed(property_data['url'], e)
+        return next_seq
+    
+    def _new_parse_executor(self):
+        """Process pool cho stage parse, None nếu parse ngay trong event loop"""
+        if self.parse_processes == 0:
+            return None
+        return make_parse_executor(self.parse_processes)
+    
+    async def scrape_category_async(self, category_url, max_pages=5, max_items_per_page=20, browser_pool=None,
+                                    start_page=1, pending_urls=None, executor=None, incremental=False):
+        """
+        Crawl một danh mục bằng pipeline fetch -> parse -> write (xem crawl_pipeline.py)
+        
+        Một tab đọc trang danh sách; `self.concurrency` worker fetch lấy HTML chi tiết trong khi
+        process pool parse các trang đã lấy về, stage write ghi kết quả ra sink.
+        Kết quả được ghi theo đúng thứ tự như khi crawl tuần tự bằng scrape_category;
+        chỉ các bài xong trước một bài còn đang crawl mới phải nằm chờ trong bộ nhớ.
+        Nếu không truyền browser_pool / executor thì tự tạo riêng cho danh mục này.
+        start_page/pending_urls dùng khi chạy tiếp từ checkpoint; incremental như scrape_category.
+        """
+        print(f"\n{'='*60}")
+        print(f"📂 Đang crawl danh mục: {category_url} (async, {self.concurrency} tab)")
+        print(f"{'='*60}")
+        
+        results = {}  # seq -> bản ghi đã crawl xong, chờ ghi theo thứ tự (None nếu lỗi)
+        pending = {}  # seq -> URL chi tiết đã vào pipeline nhưng chưa được ghi ra
+        seq = 0
+        next_seq = 0
+        count_before = self.record_count
+        self._resumed = set(pending_urls or [])
+        mark, retry_urls = self._start_incremental(category_url, incremental)
+        pending_urls = list(pending_urls or []) + retry_urls
+        
+        def on_result(done_seq, detail_url, property_data, error):
+            """Stage write: ghi các bài đã liền mạch theo thứ tự (frontier cập nhật lúc ghi ra)"""
+            nonlocal next_seq
+            if error is not None:
+                self._detail_failed(detail_url, error)
+            elif property_data is not None:  # None: trang không đổi, đã bỏ qua ở stage fetch
+                property_data = self._with_card(property_data)
+            # None (lỗi / không đổi) - _emit_ready bỏ qua, không đợi bài này
+            results[done_seq] = None if error is not None else property_data
+            next_seq = self._emit_ready(results, pending, next_seq)
+        
+        own_pool = browser_pool is None
+        pool = AsyncBrowserPool(headless=self.headless, request_router=RequestRouter()) if own_pool else browser_pool
+        own_executor = executor is None
+        if own_executor:
+            executor = self._new_parse_executor()
+        listing_page = None
+        
+        # Các queue có giới hạn: trang danh sách không chạy quá xa so với fetch, fetch không quá xa parse
+        pipeline = CrawlPipeline(
+            lambda: _DetailFetcher(self, pool),
+            functools.partial(parse_detail_html, parser=self.parser),
+            on_result,
+            fetch_workers=self.concurrency,
+            parse_workers=self.parse_processes or None,
+            executor=executor,
+            metrics=self.pipeline_metrics,
+            crawl_metrics=self.metrics,
+        )
+        pipeline.start()
+        
+        try:
+            if pending_urls:
+                print(f"\n♻️  Chạy tiếp {len(pending_urls)} bài còn dở")
+                for detail_url in pending_urls:
+                    pending[seq] = detail_url
+                    await pipeline.put(seq, detail_url)
+                    seq += 1
+            
+            for page_num in range(start_page, max_pages + 1):
+                print(f"\n📄 Trang {page_num}/{max_pages}")
+                
+                url = self._listing_url(category_url, page_num)
+                
+                try:
+                    html_content, listing_page = await self._fetch_html_async(
+                        pool, listing_page, url, MOGI_LISTING_MARKUP, PROFILES['mogi_listing'])
+                    with self.metrics.timed('parse'):
+                        listing_links = self.parse_listing_page(html_content, category_url)
+                    self.metrics.success('listing')
+                    
+                    if self._reached_high_water_mark(mark, html_content, page_num):
                         break
                     
+                    if not listing_links:
+                        if self._no_new_links():
+                            break
+                        continue
+                    
                     print(f"✅ Tìm thấy {len(listing_links)} bài MỚI (chưa crawl)")
                     
                     listing_links = listing_links[:max_items_per_page]
+                    if self.required_fields is not None:
+                        listing_links = self._emit_cards(html_content, listing_links)
                     
-                    for idx, detail_url in enumerate(listing_links, 1):
-                        print(f"  📌 [{idx}/{len(listing_links)}] {detail_url}")
-                        
-                        try:
-                            page.goto(detail_url, wait_until='domcontentloaded', timeout=30000)
-                            time.sleep(1)
-                            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            time.sleep(1)
-                            
-                            detail_html = page.content()
-                            property_data = self.parse_detail_page(detail_html, detail_url)
-                            
-                            category_data.append(property_data)
-                            self.data.append(property_data)
-                            print(f"  ✅ {property_data['price']} - {property_data['area']}")
-                            
-                        except Exception as e:
-                            print(f"  ❌ Lỗi: {e}")
-                        
-                        self.random_delay(2, 3)
+                    for detail_url in listing_links:
+                        pending[seq] = detail_url
+                        await pipeline.put(seq, detail_url)
+                        seq += 1
                     
                 except Exception as e:
+                    self.metrics.failure('listing', e)
+                    self.failed_pages.append((category_url, page_num))
                     print(f"❌ Lỗi trang {page_num}: {e}")
                 
-                self.random_delay(3, 5)
+                # Các bài chưa ghi ra (còn trong pipeline) được lưu lại để chạy tiếp nếu bị dừng
+                if self.checkpoint is not None:
+                    self.save_checkpoint(category_url, page_num + 1, [pending[k] for k in sorted(pending)])
+        finally:
+            # Xử lý hết các bài đã vào pipeline rồi dừng từng stage
+            await pipeline.join()
             
-            browser.close()
+            if listing_page is not None:
+                await pool.release(listing_page)
+            if own_pool:
+                await pool.close()
+            if own_executor and executor is not None:
+                executor.shutdown()
+        
+        category_count = self.record_count - count_before
         
-        print(f"\n✅ Danh mục này: {len(category_data)} bài")
-        return category_data
+        self._finish_incremental(category_url)
+        self.categories_done.append(category_url)
+        if self.checkpoint is not None:
+            self.save_checkpoint(None, 1, [])
+        
+        print(f"\n✅ Danh mục này: {category_count} bài")
+        return category_count
+    
+    async def scrape_all_async(self, max_pages=5, max_items_per_page=20, resume=False, incremental=False):
+        """Crawl lần lượt tất cả danh mục ở chế độ async, dùng chung một browser pool"""
+        state = self.load_checkpoint() if resume else None
+        incremental = self._check_incremental(incremental)
+        
+        # Browser chỉ được launch khi có URL đầu tiên cần fallback sang Playwright
+        pool = AsyncBrowserPool(headless=self.headless, request_router=RequestRouter())
+        # Process parse được tạo một lần cho mọi danh mục
+        executor = self._new_parse_executor()
+        try:
+            for category in self.categories:
+                if category in self.categories_done:
+                    continue
+                await self.scrape_category_async(category, max_pages=max_pages,
+                                                 max_items_per_page=max_items_per_page, browser_pool=pool,
+                                                 executor=executor, incremental=incremental,
+                                                 **self._resume_args(category, state))
+        finally:
+            await pool.close()
+            if executor is not None:
+                executor.shutdown()
     
     def save_to_csv(self, filename=None):
         if not self.data:
@@ -224,9 +1033,7 @@ class MogiMultiCategoryScraper:
             filename = f"mogi_hanoi_multicategory_{timestamp}.csv"
         
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = ['url', 'price', 'area', 'address', 'district', 
-                         'bedrooms', 'bathrooms', 'property_type', 'posted_date', 'description']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
             writer.writerows(self.data)
         
@@ -234,6 +1041,12 @@ class MogiMultiCategoryScraper:
         return filename
 
 def main():
+    parser = argparse.ArgumentParser(description='Crawl nhiều danh mục BĐS Hà Nội từ mogi.vn')
+    parser.add_argument('--resume', action='store_true', help='Chạy tiếp từ checkpoint của lần chạy bị dừng')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ lấy bài mới từ lần chạy trước (dừng ở high-water mark của từng danh mục)')
+    args = parser.parse_args()
+    
     print("""
     ╔══════════════════════════════════════════════════════════╗
     ║    MOGI.VN MULTI-CATEGORY SCRAPER - TRÁNH TRÙNG LẶP    ║
@@ -241,11 +1054,43 @@ def main():
     ╚══════════════════════════════════════════════════════════╝
     """)
     
-    scraper = MogiMultiCategoryScraper()
-    
     # CẤU HÌNH TỐI ĐA - LẤY NHIỀU DỮ LIỆU NHẤT
     PAGES_PER_CATEGORY = 50  # 50 trang/danh mục (tối đa)
     ITEMS_PER_PAGE = 20      # 20 bài/trang
+    USE_ASYNC = True         # Crawl chi tiết song song nhiều tab
+    CONCURRENCY = 6          # Số tab chi tiết chạy cùng lúc
+    HEADLESS = True          # Đặt False để xem quá trình crawl
+    USE_HTTP = True          # Lấy HTML qua HTTP, chỉ mở browser khi HTML tĩnh thiếu dữ liệu
+    PARSE_PROCESSES = None   # Số process parse song song (None = mọi core, 0 = parse trong event loop)
+    FRONTIER_DB = 'mogi_frontier.sqlite3'  # Nhớ bài đã crawl qua các lần chạy (None để tắt)
+    REFETCH_AFTER_DAYS = None  # Crawl lại bài đã lấy sau N ngày - chỉ bài có thay đổi mới được ghi ra
+    CHECKPOINT_FILE = 'mogi_checkpoint.json'  # Checkpoint để chạy tiếp bằng --resume
+    SNAPSHOT_DIR = 'snapshots'  # Lưu HTML đã lấy để parse lại offline: python3 snapshot_cache.py reparse (None để tắt)
+    # Job theo dõi giá: đặt vd ['price', 'area'] để chỉ mở trang chi tiết khi thẻ danh sách thiếu các trường này
+    REQUIRED_FIELDS = None
+    # Query sắp xếp "tin mới nhất" của mogi.vn (vd lấy từ URL khi chọn sắp xếp "Mới nhất" trên site).
+    # --incremental cần query này; None = thứ tự mặc định (tin VIP/ghim lên đầu) và --incremental bị tắt
+    NEWEST_FIRST_QUERY = None
+    METRICS_PORT = 9108      # Xem số liệu trực tiếp: curl http://127.0.0.1:9108/metrics (None để tắt)
+    
+    # Bản ghi được ghi nối vào file kết quả ngay trong lúc crawl (--resume ghi tiếp file cũ)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    scraper = MogiMultiCategoryScraper(
+        concurrency=CONCURRENCY,
+        parse_processes=PARSE_PROCESSES,
+        headless=HEADLESS,
+        http_fetcher=HttpFetcher(pool_size=CONCURRENCY + 2) if USE_HTTP else None,
+        frontier=UrlFrontier(FRONTIER_DB, refetch_after_days=REFETCH_AFTER_DAYS) if FRONTIER_DB else None,
+        checkpoint=CrawlCheckpoint(CHECKPOINT_FILE),
+        sink=RecordSink(f"mogi_hanoi_multicategory_{timestamp}.csv", encoding='utf-8'),
+        sort_query=NEWEST_FIRST_QUERY,
+        required_fields=REQUIRED_FIELDS,
+        snapshots=SnapshotCache(SNAPSHOT_DIR) if SNAPSHOT_DIR else None,
+    )
+    
+    if METRICS_PORT:
+        scraper.metrics.serve(METRICS_PORT)
     
     print(f"⚙️  CẤU HÌNH TỐI ĐA:")
     print(f"   - Số danh mục: {len(scraper.categories)}")
@@ -253,21 +1098,34 @@ def main():
     print(f"   - Số bài/trang: {ITEMS_PER_PAGE}")
     print(f"   - Dự kiến: ~{len(scraper.categories) * PAGES_PER_CATEGORY * 20} bài")
     print(f"   - Kỳ vọng sau loại trùng: 500-1000 bài duy nhất")
-    print(f"   - Thời gian ước tính: 4-6 giờ")
-    print(f"\n💡 Khuyến nghị: Chạy qua đêm!")
+    if USE_ASYNC:
+        print(f"   - Chế độ: async, {CONCURRENCY} tab song song")
+        print(f"   - Thời gian ước tính: dưới 1 giờ")
+    else:
+        print(f"   - Thời gian ước tính: 4-6 giờ")
+        print(f"\n💡 Khuyến nghị: Chạy qua đêm!")
     
     # Crawl từng danh mục
-    for category in scraper.categories:
-        scraper.scrape_category(category, max_pages=PAGES_PER_CATEGORY, max_items_per_page=ITEMS_PER_PAGE)
+    try:
+        if USE_ASYNC:
+            asyncio.run(scraper.scrape_all_async(max_pages=PAGES_PER_CATEGORY, max_items_per_page=ITEMS_PER_PAGE,
+                                                 resume=args.resume, incremental=args.incremental))
+        else:
+            scraper.scrape_all(max_pages=PAGES_PER_CATEGORY, max_items_per_page=ITEMS_PER_PAGE, resume=args.resume,
+                               incremental=args.incremental)
+    finally:
+        # Tổng kết lần chạy (thời gian từng bước, lỗi theo loại, tỉ lệ trường rỗng) - ghi cả khi bị dừng giữa chừng
+        scraper.metrics.write_summary(f"mogi_run_{timestamp}.json")
+        scraper.close()
     
-    # Lưu kết quả
-    filename = scraper.save_to_csv()
+    # Crawl đã xong nên không cần checkpoint nữa
+    scraper.checkpoint.clear()
     
     print(f"\n{'='*60}")
     print(f"✅ HOÀN THÀNH!")
-    print(f"   - Tổng số bài: {len(scraper.data)}")
+    print(f"   - Tổng số bài: {scraper.record_count}")
     print(f"   - Số URLs duy nhất: {len(scraper.seen_urls)}")
-    print(f"   - File: {filename}")
+    print(f"   - File: {scraper.sink.path}")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
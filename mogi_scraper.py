@@ -3,30 +3,54 @@ Mogi.vn Real Estate Scraper for Hanoi
 Dự án Data Mining - Bất động sản Hà Nội
 
 Mục đích: Thu thập dữ liệu bất động sản từ mogi.vn khu vực Hà Nội
-Phương pháp: Playwright + BeautifulSoup
+Phương pháp: HTTP thuần (fallback Playwright qua BrowserPool) + BeautifulSoup
 Ưu điểm: Mogi.vn KHÔNG có Cloudflare protection!
 """
 
 import csv
 import time
-import random
 from datetime import datetime
-from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import re
+import parse_engine
+from browser_pool import BrowserPool
+from request_policy import RequestRouter
+from page_readiness import PROFILES, ReadinessTracker, wait_until_ready
+from rate_limiter import AdaptiveRateLimiter
+from http_fetcher import HttpFetcher, MOGI_LISTING_MARKUP, MOGI_DETAIL_MARKUP
+from record_sink import RecordSink
+from hanoi_gazetteer import district_of
+from crawl_metrics import CrawlMetrics
+from snapshot_cache import SnapshotCache
 
 class MogiScraper:
-    def __init__(self):
+    def __init__(self, browser_pool=None, http_fetcher=None, rate_limiter=None, sink=None, parser='lxml', snapshots=None,
+                 metrics=None):
         self.base_url = "https://mogi.vn"
         self.hanoi_url = "https://mogi.vn/ha-noi/mua-mat-bang-cua-hang-shop"  # Mặt bằng Hà Nội
         self.data = []
+        # Có sink thì mỗi bản ghi được ghi nối ra file ngay, không giữ trong self.data
+        self.sink = sink
+        self.record_count = 0
+        # 'lxml': parse_engine (XPath biên dịch sẵn); 'html.parser': BeautifulSoup như trước
+        self.parser = parser
+        # Pool dùng chung có thể truyền vào; nếu không, scrape() tự tạo và tự đóng
+        self.browser_pool = browser_pool
+        self._own_pool = False
+        self._page = None
+        # Có http_fetcher thì lấy HTML qua HTTP trước, chỉ dùng browser khi thiếu dữ liệu
+        self.http_fetcher = http_fetcher
+        # Thời gian trang thực sự sẵn sàng (thay cho time.sleep cố định)
+        self.readiness = ReadinessTracker()
+        # Điều tiết tốc độ theo phản hồi của server (thay cho delay ngẫu nhiên)
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        if self.http_fetcher is not None and self.http_fetcher.rate_limiter is None:
+            self.http_fetcher.rate_limiter = self.rate_limiter
+        # SnapshotCache lưu HTML mọi trang đã lấy để parse lại offline (None = không lưu)
+        self.snapshots = snapshots
+        # Thời gian từng bước (HTTP, điều hướng, đợi sẵn sàng, page.content(), parse, ghi), lỗi, trường rỗng
+        self.metrics = metrics or CrawlMetrics('mogi')
         
-    def random_delay(self, min_seconds=2, max_seconds=4):
-        """Tạo delay ngẫu nhiên giữa các request"""
-        delay = random.uniform(min_seconds, max_seconds)
-        print(f"⏳ Đợi {delay:.2f} giây...")
-        time.sleep(delay)
-    
     def clean_text(self, text):
         """Làm sạch text"""
         if not text:
@@ -53,15 +77,16 @@ class MogiScraper:
     
     def parse_listing_page(self, html_content):
         """Parse trang danh sách để lấy links các bài đăng"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
         links = []
         
         # Mogi.vn sử dụng class 'link-overlay' cho links chi tiết
-        link_elements = soup.select('a.link-overlay')
+        if self.parser == 'lxml':
+            hrefs = parse_engine.mogi_listing_hrefs(html_content)
+        else:
+            soup = BeautifulSoup(html_content, 'html.parser')
+            hrefs = [elem.get('href', '') for elem in soup.select('a.link-overlay')]
         
-        for elem in link_elements:
-            href = elem.get('href', '')
+        for href in hrefs:
             if href:
                 # Nếu là relative URL, thêm base_url
                 if href.startswith('/'):
@@ -81,6 +106,9 @@ class MogiScraper:
     
     def parse_detail_page(self, html_content, url):
         """Parse trang chi tiết để lấy thông tin bất động sản"""
+        if self.parser == 'lxml':
+            return parse_engine.parse_mogi_detail(html_content, url, self)
+        
         soup = BeautifulSoup(html_content, 'html.parser')
         
         property_data = {
@@ -109,12 +137,7 @@ class MogiScraper:
             
             # Trích xuất quận từ địa chỉ
             # Format: "Đường ABC, Phường XYZ, Quận Hoàn Kiếm, Hà Nội"
-            parts = address_text.split(',')
-            for part in parts:
-                part = part.strip()
-                if 'quận' in part.lower() or 'huyện' in part.lower():
-                    property_data['district'] = part
-                    break
+            property_data['district'] = district_of(address_text)
         
         # Các thông tin từ info-attr
         info_attrs = soup.select('.info-attr')
@@ -151,6 +174,76 @@ class MogiScraper:
         
         return property_data
     
+    def _checkout_page(self):
+        """Lấy page Playwright cho lần điều hướng tiếp theo (chỉ mở browser khi thật sự cần)"""
+        if self.browser_pool is None:
+            self.browser_pool = BrowserPool(request_router=RequestRouter())
+            self._own_pool = True
+        if self._page is None:
+            self._page = self.browser_pool.acquire()
+        self._page = self.browser_pool.checkout(self._page)
+        return self._page
+    
+    def _release_page(self):
+        """Trả page về pool, đóng pool nếu do scraper tự tạo"""
+        if self._page is not None:
+            self.browser_pool.release(self._page)
+            self._page = None
+        if self._own_pool:
+            self.browser_pool.close()
+            self.browser_pool = None
+            self._own_pool = False
+    
+    def fetch_with_browser(self, url, profile):
+        """Render URL bằng Playwright, đợi tới khi trang thỏa readiness profile rồi trả về HTML"""
+        page = self._checkout_page()
+        
+        self.rate_limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            with self.metrics.timed('navigation'):
+                response = page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        except Exception as e:
+            self.rate_limiter.record(url, error=e)
+            raise
+        self.rate_limiter.record(url, latency=time.perf_counter() - start,
+                                 status=response.status if response else None)
+        
+        with self.metrics.timed('readiness'):
+            wait_until_ready(page, profile, self.readiness)
+        with self.metrics.timed('content'):
+            return page.content()
+    
+    def fetch_html(self, url, required_markup, profile):
+        """
+        Lấy HTML của một URL
+        
+        Thử HTTP thuần trước (nếu có http_fetcher); chỉ render bằng Playwright khi
+        HTML tĩnh (response 200) thiếu các class trong required_markup - 404/429/5xx thì raise.
+        HTML lấy được lưu vào snapshot cache (nếu có).
+        """
+        html = None
+        if self.http_fetcher is not None:
+            with self.metrics.timed('http'):
+                html = self.http_fetcher.fetch_with_markup(url, required_markup)
+            if html is None:
+                print("  ↩️  HTML tĩnh thiếu dữ liệu, chuyển sang Playwright")
+        if html is None:
+            html = self.fetch_with_browser(url, profile)
+        if self.snapshots is not None:
+            kind = 'mogi_detail' if required_markup is MOGI_DETAIL_MARKUP else 'mogi_listing'
+            self.snapshots.put(url, html, kind)
+        return html
+    
+    def _emit(self, property_data):
+        """Ghi một bản ghi ra sink (hoặc giữ trong self.data nếu không có sink)"""
+        self.record_count += 1
+        self.metrics.record_fields(property_data)
+        if self.sink is not None:
+            self.sink.write(property_data)
+        else:
+            self.data.append(property_data)
+    
     def scrape(self, max_pages=3, max_items_per_page=10, auto_save=True):
         """
         Hàm chính để crawl dữ liệu
@@ -158,29 +251,15 @@ class MogiScraper:
         Args:
             max_pages: Số trang tối đa cần crawl
             max_items_per_page: Số bài đăng tối đa mỗi trang
-            auto_save: Tự động lưu sau mỗi trang (tránh mất dữ liệu)
+            auto_save: Flush sink xuống đĩa sau mỗi trang (tránh mất dữ liệu)
         """
         print("🚀 Bắt đầu crawl dữ liệu từ Mogi.vn")
         print(f"📍 Khu vực: Hà Nội")
         print(f"📄 Số trang tối đa: {max_pages}")
-        print(f"💾 Auto-save: {'Bật' if auto_save else 'Tắt'}")
+        print(f"💾 Auto-save: {'Bật' if auto_save and self.sink is not None else 'Tắt'}")
         print("-" * 60)
         
-        with sync_playwright() as p:
-            # Khởi tạo browser
-            browser = p.chromium.launch(
-                headless=False,  # Đặt True để chạy ngầm
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                locale='vi-VN',
-            )
-            
-            page = context.new_page()
-            
+        try:
             # Crawl từng trang danh sách
             for page_num in range(1, max_pages + 1):
                 print(f"\n📄 Đang crawl trang {page_num}/{max_pages}")
@@ -193,20 +272,12 @@ class MogiScraper:
                 
                 try:
                     print(f"🌐 Đang truy cập: {url}")
-                    page.goto(url, wait_until='domcontentloaded', timeout=30000)
-                    
-                    # Đợi listings load
-                    time.sleep(2)
-                    
-                    # Scroll để load lazy content
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(1)
-                    
-                    # Lấy HTML content
-                    html_content = page.content()
+                    html_content = self.fetch_html(url, MOGI_LISTING_MARKUP, PROFILES['mogi_listing'])
                     
                     # Parse để lấy links
-                    listing_links = self.parse_listing_page(html_content)
+                    with self.metrics.timed('parse'):
+                        listing_links = self.parse_listing_page(html_content)
+                    self.metrics.success('listing')
                     
                     if not listing_links:
                         print("⚠️  Không tìm thấy bài đăng nào")
@@ -220,42 +291,35 @@ class MogiScraper:
                         print(f"\n  📌 [{idx}/{len(listing_links)}] Đang crawl: {detail_url}")
                         
                         try:
-                            page.goto(detail_url, wait_until='domcontentloaded', timeout=30000)
-                            time.sleep(1)
-                            
-                            # Scroll để load hết nội dung
-                            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            time.sleep(1)
+                            detail_html = self.fetch_html(detail_url, MOGI_DETAIL_MARKUP, PROFILES['mogi_detail'])
+                            with self.metrics.timed('parse'):
+                                property_data = self.parse_detail_page(detail_html, detail_url)
                             
-                            detail_html = page.content()
-                            property_data = self.parse_detail_page(detail_html, detail_url)
-                            
-                            self.data.append(property_data)
+                            with self.metrics.timed('persist'):
+                                self._emit(property_data)
+                            self.metrics.success('detail')
                             print(f"  ✅ Đã lấy dữ liệu: {property_data['price']} - {property_data['area']}")
                             
                         except Exception as e:
+                            self.metrics.failure('detail', e)
                             print(f"  ❌ Lỗi khi crawl chi tiết: {e}")
-                        
-                        # Delay giữa các request
-                        self.random_delay(2, 3)
                     
-                    # Auto-save sau mỗi trang (tránh mất dữ liệu khi dừng giữa chừng)
-                    if auto_save and self.data:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        temp_filename = f"mogi_hanoi_{timestamp}_temp.csv"
-                        self.save_to_csv(temp_filename)
-                        print(f"  💾 Đã lưu tạm {len(self.data)} bài vào: {temp_filename}")
+                    # Auto-save sau mỗi trang: chỉ ghi nối các bài mới, không ghi lại cả file
+                    if auto_save and self.sink is not None:
+                        self.sink.flush()
+                        print(f"  💾 Đã ghi {self.record_count} bài vào: {self.sink.path}")
                     
                 except Exception as e:
+                    self.metrics.failure('listing', e)
                     print(f"❌ Lỗi khi crawl trang {page_num}: {e}")
-                
-                # Delay giữa các trang
-                self.random_delay(3, 5)
-            
-            browser.close()
+        finally:
+            self._release_page()
         
         print(f"\n{'='*60}")
-        print(f"✅ Hoàn thành! Đã crawl được {len(self.data)} bài đăng")
+        print(f"✅ Hoàn thành! Đã crawl được {self.record_count} bài đăng")
+        self.readiness.print_stats()
+        self.rate_limiter.print_stats()
+        self.metrics.print_stats()
         print(f"{'='*60}")
     
     def save_to_csv(self, filename='mogi_hanoi_data.csv'):
@@ -285,7 +349,21 @@ def main():
     ╚══════════════════════════════════════════════════════════╝
     """)
     
-    scraper = MogiScraper()
+    HEADLESS = True  # Đặt False để xem quá trình crawl
+    USE_HTTP = True  # Lấy HTML qua HTTP, chỉ mở browser khi HTML tĩnh thiếu dữ liệu
+    METRICS_PORT = 9110  # Xem số liệu trực tiếp: curl http://127.0.0.1:9110/metrics (None để tắt)
+    SNAPSHOT_DIR = 'snapshots'  # Lưu HTML đã lấy để parse lại offline: python3 snapshot_cache.py reparse (None để tắt)
+    
+    # Bản ghi được ghi nối vào file kết quả ngay trong lúc crawl
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"mogi_hanoi_{timestamp}.csv"
+    
+    scraper = MogiScraper(
+        browser_pool=BrowserPool(headless=HEADLESS, request_router=RequestRouter()),
+        http_fetcher=HttpFetcher() if USE_HTTP else None,
+        sink=RecordSink(filename),
+        snapshots=SnapshotCache(SNAPSHOT_DIR) if SNAPSHOT_DIR else None,
+    )
     
     # Cấu hình crawl - Mặt bằng/cửa hàng ít trùng lặp hơn
     MAX_PAGES = 30         # 30 trang cho mặt bằng
@@ -298,14 +376,25 @@ def main():
     print(f"   - Tổng dự kiến: ~{MAX_PAGES * MAX_ITEMS_PER_PAGE} bài đăng")
     print()
     
-    # Bắt đầu crawl
-    scraper.scrape(max_pages=MAX_PAGES, max_items_per_page=MAX_ITEMS_PER_PAGE)
+    if METRICS_PORT:
+        scraper.metrics.serve(METRICS_PORT)
     
-    # Lưu dữ liệu
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"mogi_hanoi_{timestamp}.csv"
-    scraper.save_to_csv(filename)
+    # Bắt đầu crawl
+    try:
+        scraper.scrape(max_pages=MAX_PAGES, max_items_per_page=MAX_ITEMS_PER_PAGE)
+    finally:
+        scraper.metrics.write_summary(f"mogi_hanoi_run_{timestamp}.json")
+        scraper.metrics.close()
+        scraper.sink.close()
+        scraper.browser_pool.close()
+        if scraper.http_fetcher is not None:
+            scraper.http_fetcher.print_stats()
+            scraper.http_fetcher.close()
+        if scraper.snapshots is not None:
+            scraper.snapshots.print_stats()
+            scraper.snapshots.close()
     
+    print(f"\n💾 Đã lưu {scraper.record_count} bản ghi vào file: {filename}")
     print(f"\n✨ Hoàn tất! Kiểm tra file: {filename}")
     print(f"\n📊 Để phân tích dữ liệu, chạy:")
     print(f"   python3 analyze_data.py")
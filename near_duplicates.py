@@ -0,0 +1,276 @@
+"""
+Near Duplicates - Gom các tin đăng lại (cùng bất động sản, ID mới) bằng MinHash + LSH
+
+clean_data.py chỉ bỏ được các dòng trùng url. Nhưng một căn thường được đăng lại nhiều lần với ID mới
+và mô tả sửa vài chữ (xem DUPLICATE_SOLUTION.md). So từng cặp mô tả là O(n²) - không chạy nổi với
+hàng trăm nghìn dòng. Ở đây:
+- Mỗi tin được biểu diễn bằng tập shingle: cụm 3 từ liên tiếp của description và cụm 2 từ của address
+  (đã bỏ dấu, chữ thường). Token được hash cả mảng một lần (pandas), shingle ghép bằng numpy
+- Chữ ký MinHash NUM_PERM giá trị cho mỗi tin (numpy, theo từng khối shingle)
+- LSH: chia chữ ký thành BANDS band, chỉ các tin trùng nhau ở ít nhất một band mới thành ứng viên.
+  Trong mỗi bucket, mỗi tin chỉ được so với tin đầu bucket và tin liền trước - không sinh cặp O(k²)
+- Ứng viên có độ giống (ước lượng Jaccard theo chữ ký) >= THRESHOLD được nối; các thành phần liên
+  thông là một cụm, mỗi cụm một dedup_cluster_id
+
+Cách dùng:
+    from near_duplicates import add_dedup_column
+    df, stats = add_dedup_column(df)
+    df.drop_duplicates('dedup_cluster_id')  # mỗi bất động sản một dòng
+"""
+
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from hanoi_gazetteer import fold
+
+
+NUM_PERM = 64
+# 16 band x 4 hàng: cặp có Jaccard 0.7 thành ứng viên với xác suất ~99%, Jaccard 0.3 chỉ ~12%
+BANDS = 16
+THRESHOLD = 0.7
+DESCRIPTION_SHINGLE = 3
+ADDRESS_SHINGLE = 2
+SEED = 20260205
+# Số shingle tính chữ ký mỗi lần (giới hạn bộ nhớ tạm: ~16 MB mỗi mảng)
+_CHUNK = 1 << 21
+# Số văn bản tách token mỗi lần (token là object Python - không tách cả cột một lúc)
+_DOCS_PER_BATCH = 20000
+
+# Hằng số lẻ để trộn hash các token trong một shingle; salt tách shingle description / address
+_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                         0xD6E8FEB86659FD93], dtype=np.uint64)
+_DESCRIPTION_SALT = np.uint64(0x5DEECE66D)
+_ADDRESS_SALT = np.uint64(0xB5297A4D3F84D5B5)
+_MAX_HASH = np.iinfo(np.uint64).max
+
+
+def _token_hashes(texts):
+    """
+    Token (đã bỏ dấu) của từng văn bản, dạng hash 64 bit
+
+    Returns:
+        (doc, hashes) - token thứ i thuộc văn bản doc[i], theo đúng thứ tự trong văn bản
+    """
+    split = [fold(text).split() if isinstance(text, str) else [] for text in texts]
+    counts = np.array([len(words) for words in split], dtype=np.int64)
+    doc = np.repeat(np.arange(len(split), dtype=np.int64), counts)
+    tokens = np.array(list(chain.from_iterable(split)), dtype=object)
+    return doc, pd.util.hash_array(tokens)
+
+
+def shingles(texts, size, salt=np.uint64(0)):
+    """
+    Hash các cụm size từ liên tiếp của từng văn bản (văn bản ngắn hơn size từ: dùng từng từ)
+
+    Returns:
+        (doc, hashes) - shingle thứ i thuộc văn bản doc[i]
+    """
+    doc, hashes = _token_hashes(texts)
+    count = len(hashes) - size + 1
+    if count > 0:
+        grams = np.zeros(count, dtype=np.uint64)
+        for k in range(size):
+            grams ^= hashes[k:k + count] * _MULTIPLIERS[k]
+        # Cụm không được vắt qua hai văn bản
+        inside = doc[:count] == doc[size - 1:size - 1 + count]
+        gram_doc, grams = doc[:count][inside], grams[inside]
+    else:
+        gram_doc, grams = doc[:0], hashes[:0]
+    short = np.bincount(doc, minlength=doc.max() + 1 if len(doc) else 0)[doc] < size
+    doc = np.concatenate([gram_doc, doc[short]])
+    hashes = np.concatenate([grams, hashes[short]])
+    return doc, hashes ^ salt
+
+
+def minhash_signatures(doc, hashes, n_docs, num_perm=NUM_PERM, seed=SEED):
+    """
+    Chữ ký MinHash của từng văn bản
+
+    Args:
+        doc, hashes: shingle của các văn bản (từ shingles())
+        n_docs: Số văn bản
+
+    Returns:
+        (signatures, has_shingles) - mảng uint64 [n_docs, num_perm] và mảng bool
+        (văn bản không có shingle nào có chữ ký toàn giá trị max, không được dùng để so)
+    """
+    rng = np.random.default_rng(seed)
+    # Họ hàm a*x + b (mod 2^64) với a lẻ - mỗi hàm là một "hoán vị" của không gian hash
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    order = np.argsort(doc, kind='stable')
+    doc, hashes = doc[order], hashes[order]
+    signatures = np.full((n_docs, num_perm), _MAX_HASH, dtype=np.uint64)
+    has_shingles = np.zeros(n_docs, dtype=bool)
+    if not len(doc):
+        return signatures, has_shingles
+
+    starts = np.flatnonzero(np.r_[True, doc[1:] != doc[:-1]])
+    present = doc[starts]
+    has_shingles[present] = True
+    bounds = np.r_[starts, len(doc)]
+
+    # Theo khối văn bản liền nhau, mỗi khối khoảng _CHUNK shingle
+    lo = 0
+    while lo < len(starts):
+        hi = int(np.searchsorted(bounds, bounds[lo] + _CHUNK, side='right')) - 1
+        hi = min(max(hi, lo + 1), len(starts))
+        block = hashes[bounds[lo]:bounds[hi]]
+        block_starts = bounds[lo:hi] - bounds[lo]
+        for i in range(num_perm):
+            signatures[present[lo:hi], i] = np.minimum.reduceat(block * a[i] + b[i], block_starts)
+        lo = hi
+    return signatures, has_shingles
+
+
+def field_signatures(fields, num_perm=NUM_PERM):
+    """
+    Chữ ký MinHash của tập shingle gộp từ nhiều cột văn bản, tính theo từng lô _DOCS_PER_BATCH văn bản
+
+    Args:
+        fields: [(Series, số từ mỗi shingle, salt)] - các Series cùng độ dài
+                (chỉ từng lô được chuyển thành chuỗi Python)
+
+    Returns:
+        (signatures, has_shingles) - như minhash_signatures
+    """
+    n_docs = len(fields[0][0])
+    signatures = np.empty((n_docs, num_perm), dtype=np.uint64)
+    has_shingles = np.empty(n_docs, dtype=bool)
+    for lo in range(0, n_docs, _DOCS_PER_BATCH):
+        hi = min(lo + _DOCS_PER_BATCH, n_docs)
+        parts = [shingles(texts.iloc[lo:hi].tolist(), size, salt) for texts, size, salt in fields]
+        signatures[lo:hi], has_shingles[lo:hi] = minhash_signatures(
+            np.concatenate([doc for doc, _ in parts]), np.concatenate([hashes for _, hashes in parts]),
+            hi - lo, num_perm)
+    return signatures, has_shingles
+
+
+def text_signatures(descriptions, addresses, num_perm=NUM_PERM):
+    """Chữ ký theo shingle của description (DESCRIPTION_SHINGLE từ) và address (ADDRESS_SHINGLE từ)"""
+    return field_signatures([(descriptions, DESCRIPTION_SHINGLE, _DESCRIPTION_SALT),
+                             (addresses, ADDRESS_SHINGLE, _ADDRESS_SALT)], num_perm)
+
+
+def lsh_candidate_pairs(signatures, bands=BANDS):
+    """
+    Các cặp văn bản trùng nhau ở ít nhất một band của chữ ký
+
+    Mỗi band: văn bản được sắp theo hash của band, các văn bản liền nhau cùng hash là một bucket;
+    mỗi văn bản chỉ ghép với văn bản đầu bucket và văn bản liền trước (đủ để nối cả bucket
+    thành một cụm, số cặp tuyến tính theo số văn bản).
+
+    Returns:
+        (left, right) - mảng chỉ số dòng của signatures, left < right, không lặp
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    left, right = [], []
+    for band in range(bands):
+        part = signatures[:, band * rows:(band + 1) * rows]
+        key = np.zeros(n, dtype=np.uint64)
+        for j in range(rows):
+            key = key * _MULTIPLIERS[0] ^ part[:, j]
+        order = np.argsort(key, kind='stable')
+        key = key[order]
+        same = key[1:] == key[:-1]
+        if not same.any():
+            continue
+        position = np.arange(n)
+        head = np.maximum.accumulate(np.where(np.r_[False, same], 0, position))
+        member = np.flatnonzero(np.r_[False, same])
+        left.extend([order[head[member]], order[member - 1]])
+        right.extend([order[member], order[member]])
+    if not left:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    left, right = np.concatenate(left), np.concatenate(right)
+    # Cùng một cặp có thể rơi vào nhiều band
+    pairs = np.unique(np.minimum(left, right).astype(np.int64) * n + np.maximum(left, right))
+    return pairs // n, pairs % n
+
+
+def signature_similarity(signatures, left, right, chunk=1 << 16):
+    """Ước lượng Jaccard của từng cặp: tỉ lệ vị trí chữ ký trùng nhau"""
+    similarity = np.empty(len(left), dtype=np.float64)
+    for lo in range(0, len(left), chunk):
+        hi = lo + chunk
+        similarity[lo:hi] = (signatures[left[lo:hi]] == signatures[right[lo:hi]]).mean(axis=1)
+    return similarity
+
+
+def connected_components(n, left, right):
+    """
+    Nhãn thành phần liên thông (nhãn = chỉ số nhỏ nhất trong thành phần), lan truyền theo mảng
+    """
+    labels = np.arange(n)
+    if not len(left):
+        return labels
+    while True:
+        smallest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, smallest)
+        np.minimum.at(updated, right, smallest)
+        updated = updated[updated]  # nhảy con trỏ: hội tụ sau O(log n) vòng
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_ids(descriptions, addresses, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    """
+    Gom các tin gần trùng (description + address)
+
+    Returns:
+        (Series int64 'dedup_cluster_id' cùng index với descriptions, stats)
+        - id đánh số 0, 1, 2... theo thứ tự xuất hiện; tin không có mô tả lẫn địa chỉ là một cụm riêng
+    """
+    descriptions = pd.Series(descriptions)
+    addresses = pd.Series(addresses, index=descriptions.index)
+    # Cặp (mô tả, địa chỉ) giống hệt nhau chỉ tính chữ ký một lần
+    # (ghép mã của hai cột, không ghép chuỗi - tránh copy toàn bộ mô tả)
+    d_codes, d_uniques = pd.factorize(descriptions)
+    a_codes, a_uniques = pd.factorize(addresses)
+    codes, uniques = pd.factorize((d_codes.astype(np.int64) + 1) * (len(a_uniques) + 1) + a_codes + 1)
+    first = np.unique(codes, return_index=True)[1]
+    n_docs = len(uniques)
+
+    signatures, has_shingles = text_signatures(
+        descriptions.iloc[first], addresses.iloc[first], num_perm)
+
+    usable = np.flatnonzero(has_shingles)
+    left, right = lsh_candidate_pairs(signatures[usable], bands)
+    similarity = signature_similarity(signatures[usable], left, right)
+    similar = similarity >= threshold
+    labels = connected_components(n_docs, usable[left[similar]], usable[right[similar]])
+
+    row_labels = labels[codes]
+    # Tin không có shingle nào: mỗi dòng một cụm riêng
+    empty_rows = ~has_shingles[codes]
+    row_labels = np.where(empty_rows, n_docs + np.arange(len(codes)), row_labels)
+    ids = pd.factorize(row_labels)[0]
+
+    stats = {
+        'rows': len(codes),
+        'distinct_texts': n_docs,
+        'candidate_pairs': int(len(left)),
+        'matched_pairs': int(similar.sum()),
+        'clusters': int(ids.max() + 1) if len(ids) else 0,
+    }
+    return pd.Series(ids, index=descriptions.index, name='dedup_cluster_id', dtype='int64'), stats
+
+
+def add_dedup_column(df, threshold=THRESHOLD):
+    """
+    Thêm cột dedup_cluster_id (đã có thì giữ nguyên)
+
+    Returns:
+        (DataFrame mới, stats) - stats là None nếu cột đã có
+    """
+    if 'dedup_cluster_id' in df.columns:
+        return df, None
+    ids, stats = cluster_ids(df['description'], df['address'], threshold)
+    return df.assign(dedup_cluster_id=ids), stats
@@ -0,0 +1,157 @@
+"""
+Page Readiness - Đợi trang sẵn sàng theo sự kiện thay vì time.sleep cố định
+
+Mỗi site/loại trang có một profile: các selector mà parser thực sự cần, hoặc tín hiệu
+DOM ổn định (không còn mutation trong một khoảng ngắn). Trang nhanh thì đi tiếp ngay,
+trang chậm thì đợi tối đa timeout. Thời gian sẵn sàng thực tế được ghi lại để thống kê.
+"""
+
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as AsyncPlaywrightTimeoutError
+
+
+SCROLL_TO_BOTTOM = "window.scrollTo(0, document.body.scrollHeight)"
+
+# Ghi lại thời điểm mutation cuối cùng của DOM để kiểm tra "DOM ổn định"
+INSTALL_MUTATION_OBSERVER = """() => {
+    if (window.__dmLastMutation !== undefined) return;
+    window.__dmLastMutation = performance.now();
+    new MutationObserver(() => { window.__dmLastMutation = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}"""
+
+DOM_QUIET_FOR = "quietMs => performance.now() - window.__dmLastMutation >= quietMs"
+
+
+class ReadinessProfile:
+    """Điều kiện sẵn sàng của một loại trang"""
+
+    def __init__(self, name, selectors=(), quiet_ms=None, timeout_ms=10000, scroll=False):
+        """
+        Args:
+            name: Tên profile (dùng trong thống kê)
+            selectors: Các selector phải xuất hiện trong DOM
+            quiet_ms: Nếu đặt, đợi thêm tới khi DOM không đổi trong quiet_ms
+            timeout_ms: Thời gian đợi tối đa cho cả profile
+            scroll: Scroll xuống cuối trang để kích hoạt lazy content
+        """
+        self.name = name
+        self.selectors = list(selectors)
+        self.quiet_ms = quiet_ms
+        self.timeout_ms = timeout_ms
+        self.scroll = scroll
+
+
+PROFILES = {
+    # Mogi: parse_listing_page chỉ cần link-overlay; lazy content được nạp khi scroll
+    'mogi_listing': ReadinessProfile('mogi_listing', selectors=['a.link-overlay'], scroll=True),
+    # parse_detail_page đọc .price và .info-attr (địa chỉ, mô tả render cùng lúc)
+    'mogi_detail': ReadinessProfile('mogi_detail', selectors=['.price', '.info-attr']),
+    'nhatot_listing': ReadinessProfile('nhatot_listing', selectors=["a[href$='.htm']"], scroll=True),
+    # Nhatot không có class cố định - đợi DOM ổn định sau khi hydrate
+    'nhatot_detail': ReadinessProfile('nhatot_detail', quiet_ms=500, timeout_ms=15000),
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ReadinessTracker:
+    """Thống kê thời gian sẵn sàng thực tế theo từng profile"""
+
+    def __init__(self):
+        self.timings = {}   # profile -> danh sách thời gian (giây)
+        self.timeouts = {}  # profile -> số lần hết timeout
+
+    def record(self, profile_name, elapsed, timed_out):
+        self.timings.setdefault(profile_name, []).append(elapsed)
+        if timed_out:
+            self.timeouts[profile_name] = self.timeouts.get(profile_name, 0) + 1
+
+    def summary(self):
+        """Thống kê dạng dict: count, mean, p50, p95, max, timeouts cho mỗi profile"""
+        result = {}
+        for name, values in self.timings.items():
+            result[name] = {
+                'count': len(values),
+                'mean_s': sum(values) / len(values),
+                'p50_s': _percentile(values, 50),
+                'p95_s': _percentile(values, 95),
+                'max_s': max(values),
+                'timeouts': self.timeouts.get(name, 0),
+            }
+        return result
+
+    def print_stats(self):
+        """In thời gian sẵn sàng của từng loại trang"""
+        for name, s in self.summary().items():
+            print(f"⏱️  Sẵn sàng [{name}]: {s['count']} trang, TB {s['mean_s']:.2f}s, "
+                  f"p50 {s['p50_s']:.2f}s, p95 {s['p95_s']:.2f}s, timeout {s['timeouts']}")
+
+
+def wait_until_ready(page, profile, tracker=None):
+    """
+    Đợi page (Playwright sync API) thỏa profile.
+
+    Hết timeout thì không raise - parser vẫn chạy với những gì đã có.
+
+    Returns:
+        Thời gian (giây) từ lúc gọi tới khi trang sẵn sàng
+    """
+    start = time.perf_counter()
+    deadline = start + profile.timeout_ms / 1000
+    timed_out = False
+
+    def remaining_ms():
+        return max(1, int((deadline - time.perf_counter()) * 1000))
+
+    try:
+        if profile.quiet_ms:
+            page.evaluate(INSTALL_MUTATION_OBSERVER)
+        if profile.scroll:
+            page.evaluate(SCROLL_TO_BOTTOM)
+        for selector in profile.selectors:
+            page.wait_for_selector(selector, state='attached', timeout=remaining_ms())
+        if profile.quiet_ms:
+            page.wait_for_function(DOM_QUIET_FOR, arg=profile.quiet_ms, polling=100, timeout=remaining_ms())
+    except PlaywrightTimeoutError:
+        timed_out = True
+
+    elapsed = time.perf_counter() - start
+    if tracker is not None:
+        tracker.record(profile.name, elapsed, timed_out)
+    return elapsed
+
+
+async def async_wait_until_ready(page, profile, tracker=None):
+    """Giống wait_until_ready nhưng cho Playwright async API"""
+    start = time.perf_counter()
+    deadline = start + profile.timeout_ms / 1000
+    timed_out = False
+
+    def remaining_ms():
+        return max(1, int((deadline - time.perf_counter()) * 1000))
+
+    try:
+        if profile.quiet_ms:
+            await page.evaluate(INSTALL_MUTATION_OBSERVER)
+        if profile.scroll:
+            await page.evaluate(SCROLL_TO_BOTTOM)
+        for selector in profile.selectors:
+            await page.wait_for_selector(selector, state='attached', timeout=remaining_ms())
+        if profile.quiet_ms:
+            await page.wait_for_function(DOM_QUIET_FOR, arg=profile.quiet_ms, polling=100, timeout=remaining_ms())
+    except AsyncPlaywrightTimeoutError:
+        timed_out = True
+
+    elapsed = time.perf_counter() - start
+    if tracker is not None:
+        tracker.record(profile.name, elapsed, timed_out)
+    return elapsed
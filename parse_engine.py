@@ -0,0 +1,337 @@
+"""
+Parse Engine - Parse trang mogi.vn / nhatot.com bằng lxml với XPath biên dịch sẵn
+
+BeautifulSoup(html, 'html.parser') dựng cây bằng parser thuần Python - khi fetch đã song song
+thì parse trở thành phần tốn CPU nhất. Module này dùng parser C của libxml2 (lxml) và các
+biểu thức XPath được biên dịch một lần khi import, cho ra đúng các trường mà
+parse_listing_page / parse_detail_page (bản BeautifulSoup) trả về.
+
+Các hàm parse chi tiết nhận scraper để dùng chính clean_text / extract_price / extract_area
+của scraper đó, nên kết quả khớp từng ký tự với bản BeautifulSoup.
+Kiểm tra tương đương: python3 -m pytest tests/test_parse_engine.py - đo tốc độ: python3 benchmark_parsers.py
+"""
+
+import re
+import json
+from datetime import date, timedelta
+from lxml import etree
+
+from hanoi_gazetteer import district_of
+
+
+# Parser dùng chung (lxml cho phép dùng lại parser giữa các lần parse trong cùng thread)
+_HTML_PARSER = etree.HTMLParser(remove_comments=False, remove_blank_text=False)
+
+# Chuỗi nằm trong các thẻ này không được BeautifulSoup tính vào get_text()
+_NON_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def _has_class(name):
+    """Điều kiện XPath tương đương selector CSS .name (class là một token)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# mogi.vn
+_MOGI_LISTING_LINKS = etree.XPath(f"//a[{_has_class('link-overlay')}]")
+_MOGI_PRICE = etree.XPath(f"//*[{_has_class('price')}]")
+_MOGI_ADDRESS = etree.XPath(f"//*[{_has_class('address')}]")
+_MOGI_INFO_ATTRS = etree.XPath(f"//*[{_has_class('info-attr')}]")
+_SPANS = etree.XPath(".//span")
+_MOGI_BREADCRUMBS = etree.XPath(f"//*[{_has_class('breadcrumb')}]//li//a")
+# Thẻ bài trên trang danh sách (tìm trong thẻ cha của a.link-overlay)
+_PARENT = etree.XPath("..")
+_MOGI_CARD_PRICE = etree.XPath(f".//*[{_has_class('price')}]")
+_MOGI_CARD_ADDRESS = etree.XPath(f".//*[{_has_class('prop-addr')}]")
+_MOGI_CARD_ATTRS = etree.XPath(f".//*[{_has_class('prop-attr')}]//li")
+_MOGI_CARD_CREATED = etree.XPath(f".//*[{_has_class('prop-created')}]")
+_MOGI_DESCRIPTIONS = [
+    etree.XPath(f"//*[{_has_class('introduction')}]"),
+    etree.XPath(f"//*[{_has_class('property-description')}]"),
+    etree.XPath(f"//*[{_has_class('info-content-body')}]"),
+]
+
+# nhatot.com
+_ALL_LINKS = etree.XPath("//a[@href]")
+_JSON_LD = etree.XPath("//script[@type='application/ld+json']")
+_CLASSED = etree.XPath("//*[@class]")
+_ITEMPROP = {
+    name: etree.XPath(f"//*[@itemprop='{name}']")
+    for name in ('price', 'address', 'datePublished', 'description')
+}
+
+# Cùng các regex class như ChoTotScraper.parse_detail_page
+_PRICE_CLASSES = [re.compile(r'.*price.*', re.I), re.compile(r'.*gia.*', re.I)]
+_AREA_CLASSES = [re.compile(r'.*area.*', re.I), re.compile(r'.*dien.*tich.*', re.I)]
+_ADDRESS_CLASSES = [re.compile(r'.*address.*', re.I), re.compile(r'.*dia.*chi.*', re.I)]
+_SPEC_CLASS = re.compile(r'.*(spec|attribute|param).*', re.I)
+_DATE_CLASSES = [re.compile(r'.*date.*', re.I), re.compile(r'.*time.*', re.I)]
+_DESC_CLASSES = [re.compile(r'.*description.*', re.I), re.compile(r'.*mo.*ta.*', re.I)]
+_NUMBER = re.compile(r'\d+')
+
+
+def empty_record(url):
+    """Bản ghi rỗng theo đúng thứ tự cột của các scraper"""
+    return {
+        'url': url,
+        'price': None,
+        'area': None,
+        'address': None,
+        'district': None,
+        'bedrooms': None,
+        'bathrooms': None,
+        'property_type': None,
+        'posted_date': None,
+        'description': None
+    }
+
+
+def parse_document(html_content):
+    """Dựng cây lxml; None nếu HTML rỗng"""
+    if not html_content:
+        return None
+    return etree.fromstring(html_content, _HTML_PARSER)
+
+
+def _strings(elem):
+    """Các đoạn text theo thứ tự tài liệu, bỏ comment và nội dung script/style như BeautifulSoup"""
+    if elem.text:
+        yield elem.text
+    for child in elem:
+        if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+            yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def text_content(elem, strip=False):
+    """Tương đương Tag.get_text() / Tag.get_text(strip=True) của BeautifulSoup"""
+    if strip:
+        return ''.join(s.strip() for s in _strings(elem) if s.strip())
+    return ''.join(_strings(elem))
+
+
+def _first(xpath, root):
+    result = xpath(root)
+    return result[0] if result else None
+
+
+def _class_index(root):
+    """(element, chuỗi class đã chuẩn hóa) của mọi thẻ có class, theo thứ tự tài liệu"""
+    return [(elem, ' '.join(elem.get('class').split())) for elem in _CLASSED(root)]
+
+
+def _find_by_class(index, pattern):
+    """Tương đương soup.find(attrs={'class': pattern}) - thẻ đầu tiên có class khớp regex"""
+    for elem, classes in index:
+        if pattern.search(classes):
+            return elem
+    return None
+
+
+# ---------------------------------------------------------------- mogi.vn
+
+def mogi_listing_hrefs(html_content):
+    """href của các thẻ a.link-overlay (giống soup.select('a.link-overlay'))"""
+    root = parse_document(html_content)
+    if root is None:
+        return []
+    return [elem.get('href', '') for elem in _MOGI_LISTING_LINKS(root)]
+
+
+def mogi_listing_cards(html_content):
+    """
+    Text thô trên thẻ của mỗi a.link-overlay: {'href', 'price', 'address', 'attrs', 'created'}
+
+    Thẻ là phần tử cha của link; link quảng cáo không có các trường này (giá trị None / []).
+    """
+    root = parse_document(html_content)
+    if root is None:
+        return []
+    cards = []
+    for link in _MOGI_LISTING_LINKS(root):
+        parent = _first(_PARENT, link)
+        price = _first(_MOGI_CARD_PRICE, parent)
+        address = _first(_MOGI_CARD_ADDRESS, parent)
+        created = _first(_MOGI_CARD_CREATED, parent)
+        cards.append({
+            'href': link.get('href', ''),
+            'price': text_content(price) if price is not None else None,
+            'address': text_content(address) if address is not None else None,
+            'attrs': [text_content(li) for li in _MOGI_CARD_ATTRS(parent)],
+            'created': text_content(created) if created is not None else None,
+        })
+    return cards
+
+
+def mogi_card_record(url, card, scraper):
+    """
+    Bản ghi (thiếu mô tả, loại hình) từ text thô của một thẻ bài - dùng chung cho lxml và BeautifulSoup
+
+    Số phòng lấy phần số ('3 PN' -> '3') như trang chi tiết; ngày 'Hôm nay' / 'Hôm qua' đổi sang dd/mm/yyyy.
+    """
+    property_data = empty_record(url)
+    property_data['price'] = scraper.extract_price(card['price'])
+
+    address_text = scraper.clean_text(card['address'])
+    if address_text:
+        property_data['address'] = address_text
+        property_data['district'] = district_of(address_text)
+
+    for attr in card['attrs']:
+        value = scraper.clean_text(attr)
+        if not value:
+            continue
+        lower = value.lower()
+        number = _NUMBER.search(value)
+        if property_data['area'] is None and ('m²' in lower or 'm2' in lower):
+            property_data['area'] = scraper.extract_area(value)
+        elif number and ('pn' in lower or 'phòng ngủ' in lower):
+            property_data['bedrooms'] = number.group()
+        elif number and ('wc' in lower or 'toilet' in lower or 'nhà tắm' in lower):
+            property_data['bathrooms'] = number.group()
+
+    created = scraper.clean_text(card['created'])
+    if created:
+        days_ago = {'hôm nay': 0, 'hôm qua': 1}.get(created.lower())
+        if days_ago is not None:
+            created = (date.today() - timedelta(days=days_ago)).strftime('%d/%m/%Y')
+        property_data['posted_date'] = created
+
+    return property_data
+
+
+def parse_mogi_detail(html_content, url, scraper):
+    """
+    Parse trang chi tiết mogi.vn - cùng kết quả với parse_detail_page bản BeautifulSoup
+
+    Args:
+        scraper: MogiScraper / MogiMultiCategoryScraper (dùng clean_text, extract_price, extract_area)
+    """
+    property_data = empty_record(url)
+    root = parse_document(html_content)
+    if root is None:
+        return property_data
+
+    price_elem = _first(_MOGI_PRICE, root)
+    if price_elem is not None:
+        property_data['price'] = scraper.extract_price(text_content(price_elem))
+
+    address_elem = _first(_MOGI_ADDRESS, root)
+    if address_elem is not None:
+        address_text = scraper.clean_text(text_content(address_elem))
+        property_data['address'] = address_text
+        property_data['district'] = district_of(address_text)
+
+    for attr in _MOGI_INFO_ATTRS(root):
+        spans = _SPANS(attr)
+        if len(spans) >= 2:
+            label = scraper.clean_text(text_content(spans[0])).lower()
+            value = scraper.clean_text(text_content(spans[-1]))
+
+            if 'diện tích' in label:
+                property_data['area'] = scraper.extract_area(value)
+            elif 'phòng ngủ' in label:
+                property_data['bedrooms'] = value
+            elif 'nhà tắm' in label or 'toilet' in label:
+                property_data['bathrooms'] = value
+            elif 'ngày đăng' in label:
+                property_data['posted_date'] = value
+
+    breadcrumbs = _MOGI_BREADCRUMBS(root)
+    if breadcrumbs:
+        property_data['property_type'] = scraper.clean_text(text_content(breadcrumbs[-1]))
+
+    for xpath in _MOGI_DESCRIPTIONS:
+        desc_elem = _first(xpath, root)
+        if desc_elem is not None:
+            property_data['description'] = scraper.clean_text(text_content(desc_elem))[:500]
+            break
+
+    return property_data
+
+
+# ---------------------------------------------------------------- nhatot.com
+
+def chotot_listing_hrefs(html_content):
+    """href của mọi thẻ a có href (giống soup.find_all('a', href=True))"""
+    root = parse_document(html_content)
+    if root is None:
+        return []
+    return [elem.get('href') for elem in _ALL_LINKS(root)]
+
+
+def _find_first(index, root, patterns, itemprop=None):
+    """Thử lần lượt các regex class rồi tới [itemprop=...], như vòng selector của ChoTotScraper"""
+    for pattern in patterns:
+        elem = _find_by_class(index, pattern)
+        if elem is not None:
+            return elem
+    if itemprop is not None:
+        return _first(_ITEMPROP[itemprop], root)
+    return None
+
+
+def parse_chotot_detail(html_content, url, scraper):
+    """
+    Parse trang chi tiết nhatot.com - cùng kết quả với ChoTotScraper.parse_detail_page bản BeautifulSoup
+
+    Mỗi lần soup.find(attrs={'class': regex}) duyệt lại toàn bộ cây; ở đây danh sách thẻ có class
+    chỉ được lấy một lần rồi dùng chung cho mọi trường.
+    """
+    property_data = empty_record(url)
+    root = parse_document(html_content)
+    if root is None:
+        return property_data
+
+    json_ld = _first(_JSON_LD, root)
+    if json_ld is not None:
+        try:
+            data = json.loads(json_ld.text)
+            if isinstance(data, dict):
+                property_data['price'] = data.get('offers', {}).get('price')
+                property_data['address'] = data.get('address', {}).get('streetAddress')
+        except:
+            pass
+
+    index = _class_index(root)
+
+    elem = _find_first(index, root, _PRICE_CLASSES, 'price')
+    if elem is not None:
+        property_data['price'] = scraper.extract_price(text_content(elem, strip=True))
+
+    elem = _find_first(index, root, _AREA_CLASSES)
+    if elem is not None:
+        property_data['area'] = scraper.extract_area(text_content(elem, strip=True))
+
+    elem = _find_first(index, root, _ADDRESS_CLASSES, 'address')
+    if elem is not None:
+        property_data['address'] = text_content(elem, strip=True)
+        property_data['district'] = district_of(property_data['address'])
+
+    for row, classes in index:
+        if row.tag not in ('tr', 'div') or not _SPEC_CLASS.search(classes):
+            continue
+        text = text_content(row).lower()
+
+        if 'phòng ngủ' in text or 'bedroom' in text:
+            numbers = _NUMBER.findall(text)
+            if numbers:
+                property_data['bedrooms'] = numbers[0]
+
+        if 'phòng tắm' in text or 'toilet' in text or 'bathroom' in text:
+            numbers = _NUMBER.findall(text)
+            if numbers:
+                property_data['bathrooms'] = numbers[0]
+
+        if 'loại hình' in text or 'property type' in text or 'loại bds' in text:
+            property_data['property_type'] = text_content(row, strip=True).split(':')[-1].strip()
+
+    elem = _find_first(index, root, _DATE_CLASSES, 'datePublished')
+    if elem is not None:
+        property_data['posted_date'] = text_content(elem, strip=True)
+
+    elem = _find_first(index, root, _DESC_CLASSES, 'description')
+    if elem is not None:
+        property_data['description'] = text_content(elem, strip=True)[:500]
+
+    return property_data
@@ -0,0 +1,196 @@
+"""
+Adaptive Rate Limiter - Điều tiết tốc độ request theo từng host (token bucket + AIMD)
+
+Thay cho random_delay (ngủ ngẫu nhiên 2-5 giây trước mọi request):
+- Mỗi host có một token bucket với tốc độ hiện tại (request/giây)
+- Response nhanh, không lỗi -> tăng tốc độ từng bước nhỏ (additive increase)
+- Timeout, 429, 5xx -> giảm mạnh theo hệ số (multiplicative decrease), tôn trọng Retry-After
+- Thread-safe và dùng được từ asyncio, nên mọi worker song song dùng chung một limiter
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+
+def host_of(url):
+    return urlsplit(url).hostname or ''
+
+
+class _HostState:
+    """Trạng thái điều tiết của một host"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.ewma_latency = None
+        self.recent_errors = deque(maxlen=20)  # 1 = lỗi, 0 = thành công
+        self.requests = 0
+        self.errors = 0
+        self.backoffs = 0
+        self.total_wait = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Token bucket theo host với điều chỉnh AIMD dựa trên latency và lỗi"""
+
+    def __init__(self, initial_rate=0.5, min_rate=0.1, max_rate=5.0, burst=2,
+                 increase_step=0.05, decrease_factor=0.5, target_latency=2.0,
+                 max_error_rate=0.1, max_events=500):
+        """
+        Args:
+            initial_rate: Tốc độ ban đầu (request/giây) - 0.5 tương đương 1 request / 2 giây
+            min_rate, max_rate: Giới hạn tốc độ
+            burst: Số request tối đa được dồn (token tối đa trong bucket)
+            increase_step: Lượng tăng tốc độ sau mỗi response khỏe
+            decrease_factor: Hệ số nhân khi bị lỗi / quá tải
+            target_latency: Latency (giây) tối đa để còn được tăng tốc
+            max_error_rate: Tỷ lệ lỗi gần đây tối đa để còn được tăng tốc
+            max_events: Số backoff event giữ lại để xuất ra
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self.backoff_events = deque(maxlen=max_events)
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_rate, self.burst)
+        return state
+
+    def _reserve(self, url):
+        """Giữ chỗ một token cho request, trả về số giây cần đợi trước khi gửi"""
+        with self._lock:
+            state = self._state(host_of(url))
+            now = time.monotonic()
+
+            # Nạp lại token theo tốc độ hiện tại
+            state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+            state.last_refill = now
+
+            # Token âm nghĩa là các worker khác đã giữ chỗ trước - xếp hàng phía sau
+            state.tokens -= 1
+            wait = 0.0 if state.tokens >= 0 else -state.tokens / state.rate
+            wait = max(wait, state.paused_until - now)
+
+            state.requests += 1
+            state.total_wait += wait
+            return wait
+
+    def acquire(self, url):
+        """Đợi (blocking) tới lượt gửi request tới host của url"""
+        wait = self._reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, url):
+        """Đợi tới lượt gửi request (không chặn event loop)"""
+        wait = self._reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record(self, url, latency=None, status=None, error=None, retry_after=None):
+        """
+        Báo kết quả một request để điều chỉnh tốc độ.
+
+        Args:
+            latency: Thời gian response (giây)
+            status: HTTP status (None nếu không có response)
+            error: Exception nếu request lỗi (timeout, mất kết nối...)
+            retry_after: Giá trị header Retry-After (giây), nếu có
+        """
+        host = host_of(url)
+        with self._lock:
+            state = self._state(host)
+
+            overloaded = error is not None or status == 429 or (status is not None and status >= 500)
+            state.recent_errors.append(1 if overloaded else 0)
+
+            if latency is not None:
+                if state.ewma_latency is None:
+                    state.ewma_latency = latency
+                else:
+                    state.ewma_latency = 0.8 * state.ewma_latency + 0.2 * latency
+
+            if overloaded:
+                state.errors += 1
+                self._back_off(host, state, error, status, retry_after)
+                return
+
+            error_rate = sum(state.recent_errors) / len(state.recent_errors)
+            if (state.ewma_latency is None or state.ewma_latency <= self.target_latency) \
+                    and error_rate <= self.max_error_rate:
+                state.rate = min(self.max_rate, state.rate + self.increase_step)
+            elif state.ewma_latency is not None and state.ewma_latency > 2 * self.target_latency:
+                # Server chậm hẳn đi - giảm nhẹ, không tính là backoff
+                state.rate = max(self.min_rate, state.rate * 0.9)
+
+    def _back_off(self, host, state, error, status, retry_after):
+        """Giảm tốc độ mạnh (gọi khi đang giữ lock)"""
+        old_rate = state.rate
+        state.rate = max(self.min_rate, state.rate * self.decrease_factor)
+        state.tokens = min(state.tokens, 0)
+        state.backoffs += 1
+
+        pause = 0.0
+        if retry_after:
+            try:
+                pause = float(retry_after)
+            except (TypeError, ValueError):
+                pause = 0.0
+        if pause > 0:
+            state.paused_until = max(state.paused_until, time.monotonic() + pause)
+
+        reason = type(error).__name__ if error is not None else f"HTTP {status}"
+        self.backoff_events.append({
+            'time': time.time(),
+            'host': host,
+            'reason': reason,
+            'old_rate': round(old_rate, 3),
+            'new_rate': round(state.rate, 3),
+            'pause_s': pause,
+        })
+        print(f"🐢 Giảm tốc {host}: {old_rate:.2f} -> {state.rate:.2f} req/s ({reason})")
+
+    def current_rate(self, url):
+        """Tốc độ hiện tại (request/giây) của host chứa url"""
+        with self._lock:
+            return self._state(host_of(url)).rate
+
+    def snapshot(self):
+        """Trạng thái hiện tại của mọi host - dùng để export/ghi log"""
+        with self._lock:
+            result = {}
+            for host, state in self._hosts.items():
+                result[host] = {
+                    'rate': round(state.rate, 3),
+                    'ewma_latency_s': round(state.ewma_latency, 3) if state.ewma_latency is not None else None,
+                    'recent_error_rate': round(sum(state.recent_errors) / len(state.recent_errors), 3)
+                    if state.recent_errors else 0.0,
+                    'requests': state.requests,
+                    'errors': state.errors,
+                    'backoffs': state.backoffs,
+                    'total_wait_s': round(state.total_wait, 1),
+                }
+            return result
+
+    def print_stats(self):
+        """In tốc độ hiện tại và số lần backoff của từng host"""
+        for host, s in self.snapshot().items():
+            print(f"🚦 {host}: {s['rate']:.2f} req/s, {s['requests']} request, "
+                  f"{s['errors']} lỗi, {s['backoffs']} lần giảm tốc, đợi tổng {s['total_wait_s']}s")
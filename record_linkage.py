@@ -0,0 +1,303 @@
+"""
+Record Linkage - Nối cùng một bất động sản đăng trên cả nhatot.com và mogi.vn
+
+ChoTotScraper và các scraper mogi ghi cùng 10 cột nhưng không có gì cho biết hai tin ở hai site là
+một căn, nên gộp dữ liệu hai nguồn sẽ đếm một căn hai lần. So mọi cặp (mogi x nhatot) là O(n²); ở đây:
+- Blocking: mỗi tin có khóa (district_id, bucket diện tích, bucket giá, số phòng ngủ). Diện tích và giá
+  chia bucket theo log (mỗi bucket rộng ~10%), một phía được nhân ra các bucket lân cận để cặp nằm
+  sát biên bucket không bị lọt. Các cặp chỉ được sinh bằng phép join (pandas merge) trên khóa
+- Tin thiếu giá hoặc số phòng ngủ được ghép ở lượt thứ hai theo khóa thô (district_id, bucket diện tích)
+  rồi lọc các trường còn lại nếu cả hai bên đều có
+- Chấm điểm từng cặp trong block: độ giống địa chỉ (tập từ, bỏ dấu, bỏ từ chung như "phường", "hà nội"),
+  độ giống mô tả (MinHash như near_duplicates.py) và độ gần của diện tích / giá
+- Mỗi tin giữ cặp điểm cao nhất (>= MATCH_THRESHOLD); tin đăng lại cùng nguồn (dedup_cluster_id)
+  và cùng url cũng được nối. Mỗi thành phần liên thông là một bất động sản, mã chuẩn theo url nhỏ nhất
+
+Cách dùng:
+    python3 record_linkage.py mogi_hanoi_multicategory_*_cleaned.csv chotot_hanoi_*_cleaned.csv
+    python3 record_linkage.py --dataset dataset
+"""
+
+import os
+import re
+import sys
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import source_of
+from field_normalizer import add_normalized_columns
+from hanoi_gazetteer import add_location_columns, fold
+from near_duplicates import field_signatures, signature_similarity, connected_components, DESCRIPTION_SHINGLE
+
+
+# Mỗi bucket rộng 10% (theo log) - cặp lệch tới ~10% luôn nằm cùng bucket hoặc bucket kề
+BUCKET_STEP = 0.1
+AREA_TOLERANCE = 0.1
+PRICE_TOLERANCE = 0.15
+MATCH_THRESHOLD = 0.55
+# Cặp không có bằng chứng riêng (mô tả giống, cùng tên đường / số nhà, giá khớp) bị giới hạn dưới ngưỡng:
+# địa chỉ chỉ có phường / quận + diện tích gần nhau thì hầu như căn nào cùng phường cũng khớp
+DESCRIPTION_MATCH = 0.5
+WEAK_PAIR_CAP = 0.5
+# Trọng số điểm: địa chỉ, mô tả, độ gần diện tích / giá (thiếu mô tả: dồn sang địa chỉ)
+WEIGHTS = (0.45, 0.35, 0.2)
+# Từ xuất hiện trong hầu hết địa chỉ - không mang thông tin để phân biệt hai căn
+ADDRESS_STOPWORDS = frozenset([
+    'ha', 'noi', 'viet', 'nam', 'tp', 'thanh', 'pho', 'duong', 'ngo', 'ngach', 'hem', 'so',
+    'phuong', 'p', 'quan', 'q', 'huyen', 'xa', 'thi', 'tran', 'tt', 'tx',
+])
+_DIGITS = re.compile(r'(\d+)')
+
+
+def _numbers(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _bucket(values):
+    """Bucket log (mỗi bucket rộng BUCKET_STEP); NaN / <= 0 -> -1"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buckets = np.floor(np.log(values) / np.log1p(BUCKET_STEP))
+    return np.where(np.isfinite(buckets), buckets, -1).astype(np.int64)
+
+
+def _address_key(address):
+    """Địa chỉ bỏ dấu, bỏ từ chung: 'Phạm Hùng, Phường Mỹ Đình 2, Hà Nội' -> 'pham hung my dinh 2'"""
+    if not isinstance(address, str):
+        return None
+    return ' '.join(word for word in fold(address).split() if word not in ADDRESS_STOPWORDS)
+
+
+def _street_tokens(df, addresses):
+    """Từ trong địa chỉ ngoài tên phường / quận (tên đường, ngõ, số nhà, tòa nhà) của từng dòng"""
+    places = (df['ward'].astype(object).map(_address_key).fillna('') + ' '
+              + df['district'].astype(object).map(_address_key).fillna(''))
+    return [frozenset((address or '').split()) - frozenset(place.split())
+            for address, place in zip(addresses, places)]
+
+
+def prepare(df):
+    """
+    Thêm các cột chuẩn hóa / phường quận nếu chưa có và tính khóa blocking của từng tin
+
+    Returns:
+        (df, keys) - keys: DataFrame cùng số dòng với các cột row, source, district_id,
+        area_bucket, price_bucket, bedrooms (-1 = không biết)
+    """
+    df = add_location_columns(add_normalized_columns(df.reset_index(drop=True)))
+    bedrooms = _numbers(df['bedrooms'].astype('string').str.extract(_DIGITS, expand=False))
+    keys = pd.DataFrame({
+        'row': np.arange(len(df)),
+        'source': df['source'].astype(str).to_numpy(),
+        'district_id': df['district_id'].astype(object).to_numpy(),
+        'area_bucket': _bucket(_numbers(df['area_m2'])),
+        'price_bucket': _bucket(_numbers(df['price_million'])),
+        'bedrooms': np.where(np.isnan(bedrooms), -1, bedrooms).astype(np.int64),
+    })
+    # Không biết quận hoặc diện tích thì không có block để ghép
+    keys = keys[keys['district_id'].notna() & (keys['area_bucket'] >= 0)]
+    return df, keys
+
+
+def _block_join(left, right, on, expand):
+    """
+    Join hai phía theo khóa on; các cột trong expand của phía phải được nhân ra bucket -1 / 0 / +1
+
+    Returns:
+        DataFrame cột row_x, row_y (và các cột khóa / nguồn của hai phía)
+    """
+    for column in expand:
+        right = pd.concat([right.assign(**{column: right[column] + shift}) for shift in (-1, 0, 1)],
+                          ignore_index=True)
+    pairs = left.merge(right, on=on)
+    # Chỉ nối khác nguồn (cùng nguồn đã gom bằng dedup_cluster_id)
+    return pairs[pairs['source_x'] != pairs['source_y']]
+
+
+def candidate_pairs(keys):
+    """
+    Các cặp tin khác nguồn nằm trong cùng block
+
+    Returns:
+        (left, right) - chỉ số dòng, left < right, không lặp
+    """
+    complete = keys[(keys['price_bucket'] >= 0) & (keys['bedrooms'] >= 0)]
+    on = ['district_id', 'area_bucket', 'price_bucket', 'bedrooms']
+    full = _block_join(complete, complete, on, ['area_bucket', 'price_bucket'])
+
+    # Lượt 2: một bên thiếu giá hoặc số phòng ngủ - khóa thô, rồi lọc trường mà cả hai bên đều có
+    partial = keys[(keys['price_bucket'] < 0) | (keys['bedrooms'] < 0)]
+    coarse = _block_join(partial, keys, ['district_id', 'area_bucket'], ['area_bucket'])
+    price_ok = ((coarse['price_bucket_x'] < 0) | (coarse['price_bucket_y'] < 0)
+                | ((coarse['price_bucket_x'] - coarse['price_bucket_y']).abs() <= 1))
+    bedrooms_ok = ((coarse['bedrooms_x'] < 0) | (coarse['bedrooms_y'] < 0)
+                   | (coarse['bedrooms_x'] == coarse['bedrooms_y']))
+    coarse = coarse[price_ok & bedrooms_ok]
+
+    left = np.concatenate([full['row_x'].to_numpy(), coarse['row_x'].to_numpy()]).astype(np.int64)
+    right = np.concatenate([full['row_y'].to_numpy(), coarse['row_y'].to_numpy()]).astype(np.int64)
+    n = int(keys['row'].max()) + 1 if len(keys) else 1
+    pairs = np.unique(np.minimum(left, right) * n + np.maximum(left, right))
+    return pairs // n, pairs % n
+
+
+def score_pairs(df, left, right):
+    """
+    Điểm giống nhau (0..1) của từng cặp: địa chỉ, mô tả và độ gần diện tích / giá
+
+    Returns:
+        DataFrame cột left, right, address, description, closeness, score
+    """
+    addresses = df['address'].map(_address_key)
+    # Địa chỉ hai site viết khác thứ tự / tiền tố nên so theo tập từ đơn
+    address_sig, has_address = field_signatures([(addresses, 1, 0)])
+    description_sig, has_description = field_signatures([(df['description'], DESCRIPTION_SHINGLE, 0)])
+    address = np.where(has_address[left] & has_address[right],
+                       signature_similarity(address_sig, left, right), 0.0)
+    both_described = has_description[left] & has_description[right]
+    description = np.where(both_described, signature_similarity(description_sig, left, right), np.nan)
+
+    area, price = _numbers(df['area_m2']), _numbers(df['price_million'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        area_gap = np.abs(area[left] - area[right]) / np.maximum(area[left], area[right]) / AREA_TOLERANCE
+        price_gap = np.abs(price[left] - price[right]) / np.maximum(price[left], price[right]) / PRICE_TOLERANCE
+    gap = np.fmax(area_gap, price_gap)  # thiếu giá: chỉ tính diện tích
+    closeness = np.clip(1 - np.nan_to_num(gap, nan=1.0), 0, 1)
+
+    w_address, w_description, w_closeness = WEIGHTS
+    score = np.where(both_described,
+                     w_address * address + w_description * np.nan_to_num(description) + w_closeness * closeness,
+                     (w_address + w_description) * address + w_closeness * closeness)
+    # Ít nhất một tín hiệu phân biệt được hai căn cùng phường mới cho phép đạt ngưỡng nối
+    price_match = np.nan_to_num(price_gap, nan=np.inf) <= 1
+    evidence = price_match | (np.nan_to_num(description) >= DESCRIPTION_MATCH)
+    weak = np.flatnonzero(~evidence & (score > WEAK_PAIR_CAP))
+    if len(weak):
+        streets = _street_tokens(df, addresses)
+        shared = np.fromiter((bool(streets[a] & streets[b]) for a, b in zip(left[weak], right[weak])),
+                             dtype=bool, count=len(weak))
+        score[weak[~shared]] = WEAK_PAIR_CAP
+    # Cả hai bên đều xác định được phường mà khác phường thì không phải một căn
+    ward = df['ward_id'].astype(object).to_numpy()
+    other_ward = pd.notna(ward[left]) & pd.notna(ward[right]) & (ward[left] != ward[right])
+    score = np.where(other_ward, 0.0, score)
+    return pd.DataFrame({'left': left, 'right': right, 'address': address, 'description': description,
+                         'closeness': closeness, 'score': score})
+
+
+def _same_group_edges(df, columns):
+    """Cạnh nối mỗi dòng với dòng đầu tiên cùng giá trị columns (bỏ dòng thiếu giá trị)"""
+    groups = df[columns].dropna()
+    rows = groups.index.to_series()
+    head = rows.groupby([groups[column] for column in columns], sort=False).transform('min')
+    return head.to_numpy(dtype=np.int64), rows.to_numpy(dtype=np.int64)
+
+
+def canonical_id(url):
+    return 'P' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+
+
+def link_records(df, threshold=MATCH_THRESHOLD):
+    """
+    Gán mã bất động sản chuẩn cho từng url
+
+    Args:
+        df: DataFrame theo FIELDNAMES + cột source ('mogi' / 'chotot'); có thể có sẵn
+            price_million, area_m2, district_id, ward_id, dedup_cluster_id (file _cleaned.csv)
+
+    Returns:
+        (links, stats) - links: DataFrame url, source, canonical_id, match_url, match_score
+        (một dòng mỗi url; match_* là tin khớp nhất ở nguồn khác, nếu có)
+    """
+    df, keys = prepare(df)
+    left, right = candidate_pairs(keys)
+    scored = score_pairs(df, left, right)
+    accepted = scored[scored['score'] >= threshold].sort_values('score', ascending=False, kind='stable')
+    # Mỗi tin giữ cặp tốt nhất của nó (tránh nối dây chuyền qua các cặp yếu)
+    best = pd.concat([accepted.drop_duplicates('left'), accepted.drop_duplicates('right')]).drop_duplicates()
+
+    edges = [(best['left'].to_numpy(), best['right'].to_numpy()), _same_group_edges(df, ['url'])]
+    if 'dedup_cluster_id' in df.columns:
+        # Trong dataset Parquet, dedup_cluster_id chỉ duy nhất trong cùng source + crawl_date
+        scope = ['source', 'crawl_date'] if 'crawl_date' in df.columns else ['source']
+        edges.append(_same_group_edges(df, scope + ['dedup_cluster_id']))
+    labels = connected_components(len(df), np.concatenate([a for a, _ in edges]),
+                                  np.concatenate([b for _, b in edges]))
+
+    urls = df['url'].astype(str)
+    smallest = urls.groupby(labels).transform('min')
+    partner = pd.concat([best.rename(columns={'left': 'row', 'right': 'match'}),
+                         best.rename(columns={'right': 'row', 'left': 'match'})])
+    partner = partner.sort_values('score', ascending=False, kind='stable').drop_duplicates('row').set_index('row')
+    links = pd.DataFrame({
+        'url': urls,
+        'source': df['source'].astype(str),
+        'canonical_id': smallest.map(canonical_id),
+        'match_url': partner['match'].map(urls).reindex(df.index),
+        'match_score': partner['score'].round(3).reindex(df.index),
+    }).drop_duplicates('url')
+
+    sources = links.groupby('canonical_id')['source'].nunique()
+    stats = {
+        'records': len(links),
+        'blocked': len(keys),
+        'candidate_pairs': len(scored),
+        'matched_pairs': len(best),
+        'properties': int(links['canonical_id'].nunique()),
+        'cross_source_properties': int((sources > 1).sum()),
+    }
+    return links, stats
+
+
+def load_csvs(files):
+    """Đọc các file CSV (nguồn theo tên file); dedup_cluster_id được đánh số lại để không trùng giữa các file"""
+    frames, offset = [], 0
+    for path in files:
+        frame = pd.read_csv(path, dtype=str)
+        frame['source'] = source_of(path)
+        if 'dedup_cluster_id' in frame.columns:
+            ids = pd.to_numeric(frame['dedup_cluster_id'], errors='coerce')
+            frame['dedup_cluster_id'] = ids + offset
+            offset += int(ids.max()) + 1 if ids.notna().any() else 0
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nối tin cùng một bất động sản giữa nhatot.com và mogi.vn')
+    parser.add_argument('files', nargs='*', help='File CSV đã crawl / đã làm sạch (mogi_hanoi_*, chotot_hanoi_*)')
+    parser.add_argument('--dataset', help='Đọc từ dataset Parquet (dataset_store.py) thay cho file CSV')
+    parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD, help='Điểm tối thiểu để nối hai tin')
+    parser.add_argument('--output', help='File CSV kết quả (mặc định property_links_<thời gian>.csv)')
+    args = parser.parse_args()
+
+    if args.dataset:
+        from dataset_store import read_dataset
+        df = read_dataset(args.dataset).astype(object)
+        df = df.where(df.notna(), None)  # pd.NA của cột Arrow không so sánh được như NaN / None
+    elif args.files:
+        missing = [path for path in args.files if not os.path.exists(path)]
+        if missing:
+            print(f"❌ Không tìm thấy file: {', '.join(missing)}")
+            sys.exit(1)
+        df = load_csvs(args.files)
+    else:
+        parser.error('cần danh sách file CSV hoặc --dataset')
+
+    print(f"📂 {len(df)} tin từ: {', '.join(sorted(df['source'].astype(str).unique()))}")
+    links, stats = link_records(df, args.threshold)
+    print(f"🧱 {stats['blocked']} tin có khóa blocking -> {stats['candidate_pairs']} cặp ứng viên "
+          f"(so mọi cặp sẽ là {stats['blocked'] * (stats['blocked'] - 1) // 2})")
+    print(f"🔗 {stats['matched_pairs']} cặp khớp, {stats['properties']} bất động sản "
+          f"({stats['cross_source_properties']} căn có trên nhiều nguồn)")
+
+    output = args.output or f"property_links_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    links.to_csv(output, index=False, encoding='utf-8-sig')
+    print(f"💾 Đã lưu bảng url -> canonical_id: {output}")
+
+
+if __name__ == "__main__":
+    main()
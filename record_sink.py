@@ -0,0 +1,116 @@
+"""
+Record Sink - Ghi bản ghi ra file theo kiểu append, mỗi bản ghi chỉ ghi một lần
+
+Trước đây auto-save ghi lại toàn bộ self.data ra một file _temp.csv mới sau mỗi trang
+(O(n²) lần ghi đĩa, để lại hàng chục file tạm). RecordSink ghi nối từng bản ghi vào một
+file duy nhất (CSV hoặc JSONL), gom theo lô rồi flush + fsync, nên scraper không cần giữ
+mọi bản ghi trong bộ nhớ chỉ để lưu.
+"""
+
+import os
+import csv
+import json
+
+
+FIELDNAMES = ['url', 'price', 'area', 'address', 'district', 'bedrooms',
+              'bathrooms', 'property_type', 'posted_date', 'description']
+
+
+class RecordSink:
+    """Ghi nối bản ghi vào file CSV/JSONL theo lô, an toàn khi process bị dừng đột ngột"""
+
+    def __init__(self, path, fieldnames=FIELDNAMES, fmt=None, batch_size=50, fsync=True, encoding='utf-8-sig'):
+        """
+        Args:
+            path: File đích (.csv hoặc .jsonl)
+            fieldnames: Các cột (CSV) / khóa (JSONL)
+            fmt: 'csv' hoặc 'jsonl' - mặc định đoán theo đuôi file
+            batch_size: Số bản ghi gom lại trước mỗi lần ghi đĩa
+            fsync: Gọi os.fsync sau mỗi lần flush (dữ liệu đã flush không mất khi mất điện)
+            encoding: Encoding file CSV (utf-8-sig để Excel đọc đúng tiếng Việt)
+        """
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.fmt = fmt or ('jsonl' if path.endswith('.jsonl') else 'csv')
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.encoding = encoding if self.fmt == 'csv' else 'utf-8'
+
+        self.count = 0  # Số bản ghi đã nhận (kể cả đang trong buffer)
+        self._buffer = []
+        self._file = None
+        self._writer = None
+
+    def _open(self):
+        """Mở file ở chế độ append (lần flush đầu tiên), ghi header nếu file mới"""
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, 'a', newline='', encoding=self.encoding)
+        if self.fmt == 'csv':
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, record):
+        """
+        Nhận một bản ghi; tự flush khi đủ một lô
+
+        Returns:
+            True nếu lần ghi này đã flush mọi bản ghi xuống đĩa
+        """
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Ghi buffer xuống đĩa"""
+        if self._file is None:
+            if not self._buffer:
+                return
+            self._open()
+
+        for record in self._buffer:
+            if self.fmt == 'csv':
+                self._writer.writerow(record)
+            else:
+                row = {k: record.get(k) for k in self.fieldnames}
+                self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._buffer = []
+
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def offset(self):
+        """
+        Flush rồi trả về kích thước file (bytes) - dùng để ghi vào checkpoint.
+
+        Khi chạy tiếp, cắt file về đúng offset này để bỏ các bản ghi ghi sau checkpoint
+        (những bài đó vẫn nằm trong danh sách chờ và sẽ được crawl lại).
+        """
+        self.flush()
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def resume_at(self, path, offset, count):
+        """Chuyển sang ghi tiếp file của lần chạy trước, cắt bỏ phần sau checkpoint"""
+        self.close()
+        self.path = path
+        self.count = count
+        if os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,191 @@
+"""
+Request Policy - Chặn tài nguyên nặng khi crawl bằng Playwright
+
+Scraper chỉ đọc text trong DOM nên ảnh, font, CSS, script quảng cáo/analytics đều
+không cần tải. RequestRouter gắn request interception (page.route) lên từng page,
+chỉ cho qua document/XHR theo chính sách của từng site và abort phần còn lại.
+Thống kê số request bị chặn và dung lượng tiết kiệm (ước tính) theo từng lượt tải trang.
+"""
+
+from collections import deque
+from urllib.parse import urlsplit
+
+
+# Dung lượng trung bình ước tính cho mỗi loại tài nguyên bị chặn (bytes).
+# Request bị abort thì không có response nên không biết kích thước thật.
+ESTIMATED_BYTES = {
+    'image': 60 * 1024,
+    'media': 500 * 1024,
+    'font': 40 * 1024,
+    'stylesheet': 30 * 1024,
+    'script': 80 * 1024,
+    'xhr': 5 * 1024,
+    'fetch': 5 * 1024,
+    'other': 10 * 1024,
+}
+
+# Host quảng cáo / tracking - luôn chặn, kể cả khi là XHR
+TRACKER_HOSTS = [
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'doubleclick.net',
+    'googleadservices.com',
+    'facebook.net',
+    'facebook.com',
+    'hotjar.com',
+    'clarity.ms',
+    'tiktok.com',
+    'criteo.com',
+    'adnxs.com',
+    'zalo.me',
+]
+
+
+def _host_matches(host, suffixes):
+    """host có trùng hoặc là subdomain của một trong các suffix"""
+    return any(host == s or host.endswith('.' + s) for s in suffixes)
+
+
+class RequestPolicy:
+    """Chính sách cho một site: loại tài nguyên được phép và các host được phép tải script"""
+
+    def __init__(self, allowed_types=('document', 'xhr', 'fetch'), first_party_hosts=(),
+                 first_party_types=(), blocked_hosts=TRACKER_HOSTS):
+        """
+        Args:
+            allowed_types: Loại tài nguyên (request.resource_type) cho qua từ mọi host
+            first_party_hosts: Host của chính site (dùng cho first_party_types)
+            first_party_types: Loại tài nguyên chỉ cho qua nếu đến từ first_party_hosts
+            blocked_hosts: Host luôn bị chặn (quảng cáo, analytics)
+        """
+        self.allowed_types = set(allowed_types)
+        self.first_party_hosts = list(first_party_hosts)
+        self.first_party_types = set(first_party_types)
+        self.blocked_hosts = list(blocked_hosts)
+
+    def allows(self, resource_type, url):
+        """Request có được phép đi qua không"""
+        host = urlsplit(url).hostname or ''
+        if _host_matches(host, self.blocked_hosts):
+            return False
+        if resource_type in self.allowed_types:
+            return True
+        if resource_type in self.first_party_types and _host_matches(host, self.first_party_hosts):
+            return True
+        return False
+
+
+# Chính sách theo site (khóa là domain gốc)
+SITE_POLICIES = {
+    # Mogi render HTML phía server - chỉ cần document
+    'mogi.vn': RequestPolicy(),
+    # Nhatot (Next.js) cần script của chính site để gọi XHR lấy dữ liệu
+    'nhatot.com': RequestPolicy(
+        first_party_hosts=['nhatot.com', 'chotot.com', 'chotot.org'],
+        first_party_types=['script'],
+    ),
+}
+
+DEFAULT_POLICY = RequestPolicy()
+
+
+class RequestRouter:
+    """
+    Gắn request interception lên page và thống kê request bị chặn.
+
+    Chính sách được chọn theo host của lượt điều hướng chính gần nhất trên page,
+    nên một page dùng chung có thể crawl nhiều site khác nhau.
+    """
+
+    def __init__(self, site_policies=None, default_policy=DEFAULT_POLICY, history_size=1000):
+        self.site_policies = site_policies if site_policies is not None else SITE_POLICIES
+        self.default_policy = default_policy
+        # Thống kê từng lượt tải trang gần nhất: url, allowed, blocked, bytes_saved
+        self.page_loads = deque(maxlen=history_size)
+        self.totals = {'page_loads': 0, 'allowed': 0, 'blocked': 0, 'bytes_saved': 0}
+        self.blocked_by_type = {}
+
+    def policy_for(self, url):
+        """Chính sách của site chứa url (hoặc None nếu không phải site đã cấu hình)"""
+        host = urlsplit(url).hostname or ''
+        for site, policy in self.site_policies.items():
+            if _host_matches(host, [site]):
+                return policy
+        return None
+
+    def _decide(self, state, request):
+        """Quyết định cho qua/chặn một request và cập nhật thống kê của page"""
+        resource_type = request.resource_type
+        url = request.url
+
+        if resource_type == 'document' and request.is_navigation_request():
+            site_policy = self.policy_for(url)
+            # Chỉ đổi chính sách khi điều hướng tới site đã biết (iframe quảng cáo thì bỏ qua)
+            if site_policy is not None or state['load'] is None:
+                self._start_load(state, url, site_policy)
+        elif state['load'] is None:
+            self._start_load(state, url, None)
+
+        load = state['load']
+        if state['policy'].allows(resource_type, url):
+            load['allowed'] += 1
+            self.totals['allowed'] += 1
+            return True
+
+        saved = ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES['other'])
+        load['blocked'] += 1
+        load['bytes_saved'] += saved
+        self.totals['blocked'] += 1
+        self.totals['bytes_saved'] += saved
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        return False
+
+    def _start_load(self, state, url, site_policy):
+        """Bắt đầu thống kê một lượt tải trang mới trên page"""
+        state['policy'] = site_policy or self.default_policy
+        state['load'] = {'url': url, 'allowed': 0, 'blocked': 0, 'bytes_saved': 0}
+        self.page_loads.append(state['load'])
+        self.totals['page_loads'] += 1
+
+    def _new_state(self):
+        return {'policy': self.default_policy, 'load': None}
+
+    def attach(self, page):
+        """Gắn interception lên page (Playwright sync API)"""
+        state = self._new_state()
+
+        def handle(route, request):
+            if self._decide(state, request):
+                route.continue_()
+            else:
+                route.abort()
+
+        page.route('**/*', handle)
+
+    async def attach_async(self, page):
+        """Gắn interception lên page (Playwright async API)"""
+        state = self._new_state()
+
+        async def handle(route, request):
+            if self._decide(state, request):
+                await route.continue_()
+            else:
+                await route.abort()
+
+        await page.route('**/*', handle)
+
+    def last_page_load(self):
+        """Thống kê lượt tải trang gần nhất"""
+        return self.page_loads[-1] if self.page_loads else None
+
+    def print_stats(self):
+        """In thống kê request bị chặn"""
+        loads = max(self.totals['page_loads'], 1)
+        print(f"🚫 Request policy: chặn {self.totals['blocked']} request, "
+              f"cho qua {self.totals['allowed']} trên {self.totals['page_loads']} lượt tải trang")
+        print(f"   - Tiết kiệm ước tính: {self.totals['bytes_saved'] / (1024 * 1024):.1f} MB "
+              f"(~{self.totals['bytes_saved'] / loads / 1024:.0f} KB/trang)")
+        if self.blocked_by_type:
+            by_type = ', '.join(f"{k}: {v}" for k, v in sorted(self.blocked_by_type.items(), key=lambda x: -x[1]))
+            print(f"   - Theo loại: {by_type}")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot Cache - Lưu HTML mọi trang đã lấy (nén gzip) để parse lại mà không cần crawl lại
+
+Khi sửa selector trong parse_detail_page (ví dụ property_type đang lấy breadcrumb cuối cùng nên
+thực ra là quận), cách duy nhất để có dữ liệu đúng là crawl lại nhiều giờ. Cache này lưu:
+- objects/ab/abcdef....html.gz: nội dung HTML nén, đặt tên theo SHA-256 của nội dung
+  (cùng HTML lấy nhiều lần chỉ lưu một bản)
+- index.sqlite3: mỗi lần lấy một dòng (url, thời điểm lấy, loại trang, digest)
+Khi tổng dung lượng vượt giới hạn, các snapshot cũ nhất bị xóa trước (giữ bản mới nhất của mỗi URL lâu nhất).
+
+Lệnh reparse dựng lại dữ liệu từ snapshot mới nhất của mỗi trang chi tiết bằng parser hiện tại,
+chạy song song trên mọi core và không mở Playwright.
+
+Cách dùng:
+    python3 snapshot_cache.py info
+    python3 snapshot_cache.py reparse --output mogi_hanoi_reparsed.csv --dataset dataset
+"""
+
+import os
+import gzip
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+from record_sink import RecordSink, FIELDNAMES
+
+
+SNAPSHOT_DIR = 'snapshots'
+MAX_BYTES = 2 * 1024 ** 3  # 2 GB sau nén
+
+# Loại trang (cùng tên với fixtures/ và benchmark_parsers.py)
+DETAIL_KINDS = ['mogi_detail', 'nhatot_detail']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest  TEXT PRIMARY KEY,
+    size    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    url         TEXT NOT NULL,
+    fetched_at  TEXT NOT NULL,
+    kind        TEXT,
+    digest      TEXT NOT NULL,
+    PRIMARY KEY (url, fetched_at)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_digest ON snapshots(digest);
+CREATE INDEX IF NOT EXISTS idx_snapshots_time ON snapshots(fetched_at);
+"""
+
+
+def blob_path(root, digest):
+    return os.path.join(root, 'objects', digest[:2], digest + '.html.gz')
+
+
+def read_blob(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+class SnapshotCache:
+    """Cache HTML theo nội dung trên đĩa, chỉ mục SQLite"""
+
+    def __init__(self, root=SNAPSHOT_DIR, max_bytes=MAX_BYTES, compresslevel=6):
+        """
+        Args:
+            root: Thư mục cache
+            max_bytes: Dung lượng tối đa của các file nén (None = không giới hạn)
+            compresslevel: Mức nén gzip (6: cân bằng tốc độ / dung lượng)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        # Thread HTTP (asyncio.to_thread) và event loop có thể ghi cùng lúc
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite3'), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        self.stats = {'stored': 0, 'deduplicated': 0, 'evicted': 0}
+
+    def put(self, url, html, kind=None, fetched_at=None):
+        """
+        Lưu HTML của một lần lấy trang
+
+        Returns:
+            digest (SHA-256 của HTML)
+        """
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        fetched_at = fetched_at or datetime.now().isoformat(timespec='seconds')
+        path = blob_path(self.root, digest)
+
+        with self._lock:
+            known = self.conn.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone()
+            if known:
+                self.stats['deduplicated'] += 1
+            else:
+                # Ghi file tạm rồi os.replace: process chết giữa chừng không để lại file nén dở
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(gzip.compress(data, self.compresslevel))
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+                self.conn.execute('INSERT INTO blobs (digest, size) VALUES (?, ?)', (digest, size))
+                self.total_bytes += size
+                self.stats['stored'] += 1
+            self.conn.execute(
+                'INSERT OR REPLACE INTO snapshots (url, fetched_at, kind, digest) VALUES (?, ?, ?, ?)',
+                (url, fetched_at, kind, digest),
+            )
+            self.conn.commit()
+            if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+                self._evict()
+        return digest
+
+    def _evict(self):
+        """Xóa snapshot cũ nhất cho tới khi dưới giới hạn (bản cũ của URL có bản mới hơn bị xóa trước)"""
+        target = self.max_bytes * 0.9  # Xóa dư một chút để không phải dọn sau mỗi lần ghi
+        rows = self.conn.execute(
+            'SELECT url, fetched_at, digest, '
+            'fetched_at = (SELECT MAX(fetched_at) FROM snapshots s2 WHERE s2.url = s1.url) AS is_latest '
+            'FROM snapshots s1 ORDER BY is_latest, fetched_at'
+        ).fetchall()
+        for url, fetched_at, digest, _ in rows:
+            if self.total_bytes <= target:
+                break
+            self.conn.execute('DELETE FROM snapshots WHERE url = ? AND fetched_at = ?', (url, fetched_at))
+            self.stats['evicted'] += 1
+            if self.conn.execute('SELECT 1 FROM snapshots WHERE digest = ? LIMIT 1', (digest,)).fetchone():
+                continue
+            size = self.conn.execute('SELECT size FROM blobs WHERE digest = ?', (digest,)).fetchone()[0]
+            self.conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+            try:
+                os.remove(blob_path(self.root, digest))
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+        self.conn.commit()
+
+    def get(self, digest):
+        """HTML theo digest, None nếu đã bị xóa"""
+        path = blob_path(self.root, digest)
+        return read_blob(path) if os.path.exists(path) else None
+
+    def latest(self, kinds=None):
+        """
+        Snapshot mới nhất của mỗi URL
+
+        Returns:
+            [(url, fetched_at, kind, digest)] theo thứ tự thời điểm lấy
+        """
+        query = ('SELECT url, MAX(fetched_at), kind, digest FROM snapshots{} GROUP BY url ORDER BY 2')
+        with self._lock:
+            if kinds:
+                where = ' WHERE kind IN ({})'.format(','.join('?' * len(kinds)))
+                return self.conn.execute(query.format(where), list(kinds)).fetchall()
+            return self.conn.execute(query.format('')).fetchall()
+
+    def print_stats(self):
+        with self._lock:
+            count = self.conn.execute('SELECT COUNT(*) FROM snapshots').fetchone()[0]
+        print(f"🗄️  Snapshot cache ({self.root}): {count} snapshot, {self.total_bytes / (1024 * 1024):.1f} MB, "
+              f"lưu mới {self.stats['stored']}, trùng nội dung {self.stats['deduplicated']}, "
+              f"đã xóa {self.stats['evicted']}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_PARSERS = {}
+
+
+def _reparse_one(item):
+    """Parse một snapshot trong process con (đọc file nén ngay trong process con)"""
+    kind, url, path, parser = item
+    scraper = _PARSERS.get((kind, parser))
+    if scraper is None:
+        if kind == 'nhatot_detail':
+            from chotot_scraper import ChoTotScraper
+            scraper = ChoTotScraper(parser=parser)
+        else:
+            from mogi_multi_scraper import MogiMultiCategoryScraper
+            scraper = MogiMultiCategoryScraper(parser=parser)
+        _PARSERS[(kind, parser)] = scraper
+    try:
+        return scraper.parse_detail_page(read_blob(path), url)
+    except Exception as e:
+        print(f"  ❌ Lỗi parse snapshot {url}: {e}")
+        return None
+
+
+def reparse(cache, output=None, dataset_root=None, parser='lxml', processes=None, chunksize=32):
+    """
+    Dựng lại dữ liệu từ snapshot mới nhất của mỗi trang chi tiết bằng parser hiện tại
+
+    Args:
+        output: File CSV/JSONL kết quả (None = không ghi file)
+        dataset_root: Thư mục dataset Parquet để ghi lại (None = không ghi)
+        processes: Số process parse (None = mọi core)
+
+    Returns:
+        Số bản ghi
+    """
+    from crawl_pipeline import make_parse_executor
+
+    snapshots = [row for row in cache.latest(DETAIL_KINDS) if os.path.exists(blob_path(cache.root, row[3]))]
+    items = [(kind, url, blob_path(cache.root, digest), parser) for url, _, kind, digest in snapshots]
+    print(f"🔁 Parse lại {len(items)} trang chi tiết từ {cache.root}")
+
+    sink = RecordSink(output, FIELDNAMES, encoding='utf-8') if output else None
+    # (nguồn, ngày lấy) -> bản ghi, để ghi dataset đúng phân vùng crawl_date
+    by_partition = {}
+    count = 0
+    with make_parse_executor(processes) as executor:
+        records = executor.map(_reparse_one, items, chunksize=chunksize)
+        for (url, fetched_at, kind, _), record in zip(snapshots, records):
+            if record is None:
+                continue
+            count += 1
+            if sink is not None:
+                sink.write(record)
+            if dataset_root is not None:
+                source = 'chotot' if kind == 'nhatot_detail' else 'mogi'
+                by_partition.setdefault((source, fetched_at[:10]), []).append(record)
+    if sink is not None:
+        sink.close()
+        print(f"💾 Đã ghi {count} bản ghi vào: {output}")
+
+    if by_partition:
+        import pandas as pd
+        from dataset_store import write_dataset
+        for (source, crawl_date), rows in sorted(by_partition.items()):
+            write_dataset(pd.DataFrame(rows, columns=FIELDNAMES), source, crawl_date, dataset_root)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache HTML đã crawl và parse lại offline')
+    parser.add_argument('--root', default=SNAPSHOT_DIR, help='Thư mục cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('info', help='Thống kê cache')
+
+    p_reparse = sub.add_parser('reparse', help='Dựng lại dữ liệu từ snapshot bằng parser hiện tại')
+    p_reparse.add_argument('--output', help='File .csv hoặc .jsonl kết quả')
+    p_reparse.add_argument('--dataset', help='Thư mục dataset Parquet để ghi lại (vd dataset)')
+    p_reparse.add_argument('--parser', default='lxml', choices=['lxml', 'html.parser'])
+    p_reparse.add_argument('--processes', type=int, help='Số process parse (mặc định mọi core)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Chưa có cache: {args.root}")
+        return
+    cache = SnapshotCache(args.root, max_bytes=None)
+    try:
+        if args.command == 'info':
+            cache.print_stats()
+        else:
+            if not args.output and not args.dataset:
+                args.output = f"reparsed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            reparse(cache, args.output, args.dataset, args.parser, args.processes)
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Pipeline async: lỗi khi ghi một bài không làm mất các bài sau trong danh mục"""
+
+import asyncio
+import os
+
+from mogi_multi_scraper import MogiMultiCategoryScraper
+from record_sink import RecordSink
+from url_frontier import UrlFrontier, FAILED
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+
+def _read(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeFetcher:
+    """HttpFetcher giả: trang danh sách / chi tiết lấy từ fixtures"""
+
+    rate_limiter = object()
+
+    def __init__(self):
+        self.listing = _read('mogi_listing_1.html')
+        self.detail = _read('mogi_detail_1.html')
+
+    def fetch_with_markup(self, url, class_names):
+        return self.listing
+
+    def fetch_conditional(self, url, class_names, known=None):
+        return 200, self.detail.replace('</body>', f'<p>{url}</p></body>'), None
+
+
+class FakePool:
+    async def release(self, page):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FlakySink(RecordSink):
+    """Sink ném lỗi đúng một lần ở bản ghi thứ fail_at"""
+
+    def __init__(self, path, fail_at):
+        super().__init__(path, batch_size=1)
+        self.fail_at = fail_at
+        self.calls = 0
+
+    def write(self, record):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise OSError('disk full')
+        return super().write(record)
+
+
+def test_sink_error_mid_category_keeps_draining(tmp_path):
+    frontier = UrlFrontier(str(tmp_path / 'frontier.sqlite3'))
+    sink = FlakySink(str(tmp_path / 'out.csv'), fail_at=3)
+    scraper = MogiMultiCategoryScraper(concurrency=3, http_fetcher=FakeFetcher(), frontier=frontier, sink=sink,
+                                       parse_processes=0)
+
+    asyncio.run(scraper.scrape_category_async('/ha-noi/mua-nha-rieng', max_pages=1, max_items_per_page=8,
+                                              browser_pool=FakePool()))
+
+    sink.close()
+    assert scraper.record_count == 7
+    with open(sink.path, encoding='utf-8') as f:
+        assert sum(1 for _ in f) == 1 + 7  # header + 7 bài
+    states = frontier.stats()
+    assert states['fetched'] == 7 and states[FAILED] == 1
+    assert scraper.metrics.outcomes[('detail', 'failure')] == 1
+    frontier.close()
@@ -0,0 +1,28 @@
+"""parse_price: các ví dụ trong docstring, kể cả hàng trăm triệu viết bằng chữ"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from field_normalizer import parse_price
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("2 tỷ 950 triệu", 2950),
+    ("5,5 tỷ", 5500),
+    ("3 tỷ 5", 3500),
+    ("850 triệu", 850),
+    ("1 tỷ 2 trăm triệu", 1200),
+    ("1 tỷ 2 trăm 50 triệu", 1250),
+    ("2 tỷ 5 trăm", 2500),
+    ("5800000000", 5800),
+    ("1.200.000.000", 1200),
+    ("5.800.000.000 đ", 5800),
+    ("120 triệu/m²", 120 * 50),
+])
+def test_parse_price(text, expected):
+    assert parse_price(pd.Series([text]), pd.Series([50.0]))[0] == expected
+
+
+def test_parse_price_negotiable():
+    assert np.isnan(parse_price(pd.Series(["Thỏa thuận"]))[0])
@@ -0,0 +1,68 @@
+"""parse_engine (lxml) phải cho cùng kết quả với BeautifulSoup (html.parser) trên fixtures/"""
+
+import io
+import os
+from contextlib import redirect_stdout
+
+import pytest
+
+from mogi_scraper import MogiScraper
+from mogi_multi_scraper import MogiMultiCategoryScraper
+from chotot_scraper import ChoTotScraper
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+# Các scraper dùng chung parser cho từng site
+SITE_SCRAPERS = {
+    'mogi': [MogiScraper, MogiMultiCategoryScraper],
+    'nhatot': [ChoTotScraper],
+}
+DETAIL_URLS = {
+    'mogi': 'https://mogi.vn/quan-cau-giay/mua-nha-rieng/ban-nha-id22726008',
+    'nhatot': 'https://www.nhatot.com/mua-ban-nha-dat-quan-cau-giay-ha-noi/121000000.htm',
+}
+
+
+def _cases():
+    cases = []
+    for name in sorted(os.listdir(FIXTURES)):
+        if not name.endswith('.html'):
+            continue
+        site, kind = name.split('_')[:2]
+        for scraper_class in SITE_SCRAPERS.get(site, []):
+            cases.append(pytest.param(scraper_class, site, kind, name,
+                                      id=f"{name[:-5]}-{scraper_class.__name__}"))
+    return cases
+
+
+def _parse(scraper_class, engine, site, kind, html):
+    scraper = scraper_class(parser=engine)
+    with redirect_stdout(io.StringIO()):  # Ẩn các dòng print của parse_listing_page
+        if kind == 'listing':
+            return scraper.parse_listing_page(html)
+        return scraper.parse_detail_page(html, DETAIL_URLS[site])
+
+
+def _assert_same(expected, actual, where):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        assert sorted(actual) == sorted(expected), f"{where}: khác tập trường"
+        for field in expected:
+            assert actual[field] == expected[field], f"{where}.{field}"
+    elif isinstance(expected, list) and isinstance(actual, list):
+        assert len(actual) == len(expected), f"{where}: khác số phần tử"
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            _assert_same(a, b, f"{where}[{i}]")
+    else:
+        assert actual == expected, where
+
+
+@pytest.mark.parametrize('scraper_class, site, kind, name', _cases())
+def test_lxml_matches_html_parser(scraper_class, site, kind, name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        html = f.read()
+
+    expected = _parse(scraper_class, 'html.parser', site, kind, html)
+    actual = _parse(scraper_class, 'lxml', site, kind, html)
+
+    assert expected, f"{name}: html.parser không parse được gì"
+    _assert_same(expected, actual, name)
@@ -0,0 +1,270 @@
+"""
+URL Frontier - Lưu trạng thái URL đã crawl qua nhiều lần chạy (SQLite)
+
+seen_urls trong bộ nhớ mất khi process kết thúc, nên mỗi lần chạy qua đêm lại crawl
+lại các bài hôm trước đã lấy. Frontier lưu mỗi bài đăng theo ID số trong URL (-id123)
+cùng trạng thái fetch và thời điểm fetch gần nhất, để lần chạy sau chỉ lấy bài mới.
+
+Khi crawl lại bài đã có (refetch_after_days), frontier cung cấp ETag/Last-Modified để hỏi server
+có điều kiện, cùng hash của HTML và của các trường đã trích xuất: trang không đổi thì không parse lại,
+bản ghi không đổi thì không ghi ra lần nữa.
+
+Frontier cũng lưu high-water mark của từng danh mục (ID bài lớn nhất + ngày đăng mới nhất
+đã crawl) để chế độ crawl tăng dần dừng ngay khi gặp trang toàn bài cũ.
+"""
+
+import re
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+
+LISTING_ID_PATTERN = re.compile(r'-id(\d+)$')
+
+# Trạng thái của một URL trong frontier
+QUEUED = 'queued'    # Đã thấy trên trang danh sách, chưa lấy chi tiết
+FETCHED = 'fetched'  # Đã lấy và parse trang chi tiết
+FAILED = 'failed'    # Lấy chi tiết bị lỗi
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id   INTEGER PRIMARY KEY,
+    url          TEXT NOT NULL,
+    category     TEXT,
+    state        TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    first_seen   TEXT NOT NULL,
+    last_fetched TEXT,
+    last_error   TEXT,
+    etag         TEXT,
+    last_modified TEXT,
+    html_hash    TEXT,
+    fingerprint  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_listings_state ON listings(state, category);
+CREATE TABLE IF NOT EXISTS watermarks (
+    category        TEXT PRIMARY KEY,
+    max_listing_id  INTEGER NOT NULL,
+    max_posted_date TEXT,
+    updated_at      TEXT NOT NULL
+);
+"""
+
+# Cột thêm sau phiên bản đầu - file frontier cũ được ALTER TABLE khi mở
+_ADDED_COLUMNS = [('etag', 'TEXT'), ('last_modified', 'TEXT'), ('html_hash', 'TEXT'), ('fingerprint', 'TEXT')]
+
+
+def listing_id(url):
+    """ID số của bài đăng mogi.vn (phần -id123 cuối URL), None nếu không có"""
+    match = LISTING_ID_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
+
+def html_fingerprint(html):
+    """Hash của HTML đã chuẩn hóa khoảng trắng"""
+    return hashlib.sha1(' '.join(html.split()).encode('utf-8')).hexdigest()
+
+
+def record_fingerprint(record):
+    """Hash của các trường đã trích xuất (trừ url) - chỉ đổi khi nội dung bài đổi"""
+    fields = {k: v for k, v in record.items() if k != 'url'}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class UrlFrontier:
+    """Frontier bền vững trên một file SQLite nhúng"""
+
+    def __init__(self, db_path='mogi_frontier.sqlite3', refetch_after_days=None, max_attempts=3):
+        """
+        Args:
+            db_path: File SQLite
+            refetch_after_days: Crawl lại bài đã lấy sau N ngày (None = không bao giờ)
+            max_attempts: Số lần thử tối đa cho URL bị lỗi
+        """
+        self.db_path = db_path
+        self.refetch_after_days = refetch_after_days
+        self.max_attempts = max_attempts
+        # Worker async và thread HTTP có thể gọi cùng lúc - dùng chung một connection có lock
+        self._lock = threading.Lock()
+        # timeout: file có thể được nhiều process dùng chung (crawl_coordinator.py)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(listings)')}
+        for name, kind in _ADDED_COLUMNS:
+            if name not in columns:
+                self.conn.execute(f'ALTER TABLE listings ADD COLUMN {name} {kind}')
+        self.conn.commit()
+
+    def _needs_fetch(self, row):
+        """Một bản ghi (state, attempts, last_fetched) có cần crawl lại không"""
+        if row is None:
+            return True
+        state, attempts, last_fetched = row
+        if state == QUEUED:
+            return True
+        if state == FAILED:
+            return attempts < self.max_attempts
+        if self.refetch_after_days is not None and last_fetched:
+            age = datetime.now() - datetime.fromisoformat(last_fetched)
+            return age >= timedelta(days=self.refetch_after_days)
+        return False
+
+    def filter_new(self, urls, category=None):
+        """
+        Lọc các URL cần crawl và đánh dấu chúng là đã vào hàng đợi.
+
+        Returns:
+            Danh sách URL (giữ thứ tự) chưa lấy, lỗi chưa quá số lần thử, hoặc đã quá hạn refetch
+        """
+        result = []
+        with self._lock:
+            for url in urls:
+                lid = listing_id(url)
+                if lid is None:
+                    continue
+                row = self.conn.execute(
+                    'SELECT state, attempts, last_fetched FROM listings WHERE listing_id = ?', (lid,)
+                ).fetchone()
+                if not self._needs_fetch(row):
+                    continue
+                if row is None:
+                    self.conn.execute(
+                        'INSERT INTO listings (listing_id, url, category, state, first_seen) VALUES (?, ?, ?, ?, ?)',
+                        (lid, url, category, QUEUED, _now()),
+                    )
+                result.append(url)
+            self.conn.commit()
+        return result
+
+    def fetch_info(self, url):
+        """
+        Thông tin lần lấy trước của bài đã crawl thành công (dùng khi crawl lại)
+        
+        Returns:
+            dict etag, last_modified, html_hash, fingerprint hoặc None nếu bài chưa lấy được lần nào
+        """
+        lid = listing_id(url)
+        if lid is None:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, html_hash, fingerprint FROM listings '
+                'WHERE listing_id = ? AND last_fetched IS NOT NULL AND (html_hash IS NOT NULL OR fingerprint IS NOT NULL)',
+                (lid,),
+            ).fetchone()
+        return dict(zip(('etag', 'last_modified', 'html_hash', 'fingerprint'), row)) if row else None
+
+    def mark_fetched(self, url, fingerprint=None, html_hash=None, validators=None):
+        """
+        Đánh dấu URL đã lấy chi tiết thành công
+        
+        Args:
+            fingerprint: record_fingerprint của bản ghi vừa parse
+            html_hash: html_fingerprint của HTML vừa lấy
+            validators: {'etag', 'last_modified'} từ response HTTP
+        
+        Returns:
+            False nếu fingerprint trùng với lần lấy trước (bài không đổi), True nếu bài mới / đã đổi
+        """
+        lid = listing_id(url)
+        previous = None
+        if lid is not None and fingerprint is not None:
+            with self._lock:
+                row = self.conn.execute('SELECT fingerprint FROM listings WHERE listing_id = ?', (lid,)).fetchone()
+            previous = row[0] if row else None
+        self._set_state(url, FETCHED, None)
+        if lid is not None and (fingerprint or html_hash or validators):
+            validators = validators or {}
+            with self._lock:
+                self.conn.execute(
+                    'UPDATE listings SET fingerprint = COALESCE(?, fingerprint), html_hash = COALESCE(?, html_hash), '
+                    'etag = ?, last_modified = ? WHERE listing_id = ?',
+                    (fingerprint, html_hash, validators.get('etag'), validators.get('last_modified'), lid),
+                )
+                self.conn.commit()
+        return previous is None or previous != fingerprint
+
+    def mark_unchanged(self, url):
+        """Bài crawl lại không đổi (HTTP 304 hoặc cùng hash HTML) - chỉ cập nhật thời điểm lấy"""
+        self._set_state(url, FETCHED, None)
+
+    def mark_failed(self, url, error=None):
+        """Đánh dấu URL lấy chi tiết bị lỗi (sẽ thử lại ở lần chạy sau)"""
+        self._set_state(url, FAILED, str(error) if error is not None else None)
+
+    def _set_state(self, url, state, error):
+        lid = listing_id(url)
+        if lid is None:
+            return
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO listings (listing_id, url, state, first_seen) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(listing_id) DO NOTHING',
+                (lid, url, state, _now()),
+            )
+            self.conn.execute(
+                'UPDATE listings SET state = ?, attempts = attempts + 1, last_fetched = ?, last_error = ? '
+                'WHERE listing_id = ?',
+                (state, _now(), error, lid),
+            )
+            self.conn.commit()
+
+    def pending(self, category=None):
+        """Các URL đã thấy nhưng chưa lấy được chi tiết"""
+        query = 'SELECT url FROM listings WHERE (state = ? OR (state = ? AND attempts < ?))'
+        params = [QUEUED, FAILED, self.max_attempts]
+        if category is not None:
+            query += ' AND category = ?'
+            params.append(category)
+        with self._lock:
+            return [row[0] for row in self.conn.execute(query + ' ORDER BY listing_id', params)]
+
+    def high_water_mark(self, category):
+        """
+        High-water mark của danh mục
+
+        Returns:
+            (max_listing_id, max_posted_date ISO) hoặc (None, None) nếu danh mục chưa crawl xong lần nào
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT max_listing_id, max_posted_date FROM watermarks WHERE category = ?', (category,)
+            ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def update_high_water_mark(self, category, max_listing_id, max_posted_date=None):
+        """Nâng high-water mark của danh mục (không bao giờ hạ xuống)"""
+        if max_listing_id is None:
+            return
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO watermarks (category, max_listing_id, max_posted_date, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(category) DO UPDATE SET '
+                'max_listing_id = MAX(max_listing_id, excluded.max_listing_id), '
+                'max_posted_date = CASE WHEN max_posted_date IS NULL OR excluded.max_posted_date > max_posted_date '
+                'THEN excluded.max_posted_date ELSE max_posted_date END, '
+                'updated_at = excluded.updated_at',
+                (category, max_listing_id, max_posted_date, _now()),
+            )
+            self.conn.commit()
+
+    def stats(self):
+        """Số URL theo trạng thái"""
+        with self._lock:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM listings GROUP BY state').fetchall()
+        return dict(rows)
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"🗂️  Frontier ({self.db_path}): " + ', '.join(f"{k}: {v}" for k, v in sorted(stats.items())))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()